@@ -1,12 +1,16 @@
 from flask import Flask
 from config import config
 from extensions import db, jwt, socketio, cors, limiter
+from app.utils.socketio_queue import get_socketio_queue_options
+from app.utils.db_offload import configure_db_offload
+from app.auth.hashing import configure_password_hasher
+from app.auth.revocation import configure_token_revocation
 
 # Import models to register them with SQLAlchemy
 from app.models import (
     User, Customer, Provider, Job, Booking,
-    Message, Conversation, Rating, LocationUpdate, Notification,
-    CreditTransaction, SavedJob
+    Message, Conversation, Rating, LocationUpdate, LocationTrackSummary, Notification,
+    CreditTransaction, SavedJob, RevokedToken
 )
 
 
@@ -32,12 +36,16 @@ def create_app(config_name='default'):
     if app.config.get('RATELIMIT_ENABLED'):
         limiter.init_app(app)
     
-    # Initialize SocketIO
+    # Initialize SocketIO (with a message queue when running several workers)
     socketio.init_app(
         app,
         cors_allowed_origins=app.config['CORS_ORIGINS'],
-        async_mode='threading'
+        async_mode=app.config['SOCKETIO_ASYNC_MODE'],
+        **get_socketio_queue_options(app.config)
     )
+    configure_db_offload(app)
+    configure_password_hasher(app)
+    configure_token_revocation(app)
     
     # Register blueprints
     from app.auth import auth_bp
@@ -67,7 +75,9 @@ def create_app(config_name='default'):
     app.register_blueprint(messaging_bp, url_prefix='/api/provider/conversations', name_prefix='provider_')
     
     from app.location import location_bp
+    from app.location.tracker import configure_location_tracker
     app.register_blueprint(location_bp, url_prefix='/api/location')
+    configure_location_tracker(app)
     
     from app.ratings import ratings_bp
     app.register_blueprint(ratings_bp, url_prefix='/api/ratings')
@@ -75,13 +85,23 @@ def create_app(config_name='default'):
     from app.admin import admin_bp
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     
+    from app.emergency import emergency_bp
+    app.register_blueprint(emergency_bp, url_prefix='/api/emergency')
+    app.register_blueprint(emergency_bp, url_prefix='/api/provider/emergency', name_prefix='provider_emergency_')
+    
     from app.credits import credits_bp
     app.register_blueprint(credits_bp, url_prefix='/api/credits')
     
     # Optional bot module
     try:
         from app.bot import bot_bp
+        from app.bot.flow_store import configure_flow_store
+        from app.bot.llm_client import configure_llm_client
+        from app.bot.response_cache import configure_response_cache
         app.register_blueprint(bot_bp, url_prefix='/api/bot')
+        configure_flow_store(app)
+        configure_llm_client(app)
+        configure_response_cache(app)
     except ImportError:
         pass
     
@@ -10,6 +10,10 @@ from app.models.booking import Booking
 from app.models.message import Message
 from app.models.conversation import Conversation
 from app.utils.decorators import admin_required
+from app.utils.current_user import invalidate_current_identity
+from app.admin.stats import get_dashboard_counts, invalidate_stats
+from app.auth.hashing import password_hasher
+from app.auth.revocation import token_revocations
 
 
 @admin_bp.route('/dashboard', methods=['GET'])
@@ -17,38 +21,30 @@ from app.utils.decorators import admin_required
 @admin_required
 def get_dashboard():
     """Get admin dashboard statistics"""
-    # User statistics
-    total_users = User.query.count()
-    total_customers = Customer.query.count()
-    total_providers = Provider.query.count()
-    verified_providers = Provider.query.filter_by(verified=True).count()
-    
-    # Job statistics
-    total_jobs = Job.query.count()
-    pending_jobs = Job.query.filter_by(status='pending').count()
-    completed_jobs = Job.query.filter_by(status='completed').count()
-    
-    # Booking statistics
-    total_bookings = Booking.query.count()
-    active_bookings = Booking.query.filter_by(status='in_progress').count()
-    completed_bookings = Booking.query.filter_by(status='completed').count()
+    counts = get_dashboard_counts()
+    users = counts['users']
+    providers = counts['providers']
+    jobs = counts['jobs']
+    bookings = counts['bookings']
     
     stats = {
         'users': {
-            'total': total_users,
-            'customers': total_customers,
-            'providers': total_providers,
-            'verified_providers': verified_providers
+            'total': sum(users.values()),
+            'customers': counts['customers'].get('all', 0),
+            'providers': sum(providers.values()),
+            'verified_providers': providers.get('verified', 0)
         },
         'jobs': {
-            'total': total_jobs,
-            'pending': pending_jobs,
-            'completed': completed_jobs
+            'total': sum(jobs.values()),
+            'pending': jobs.get('pending', 0),
+            'completed': jobs.get('completed', 0),
+            'by_status': jobs
         },
         'bookings': {
-            'total': total_bookings,
-            'active': active_bookings,
-            'completed': completed_bookings
+            'total': sum(bookings.values()),
+            'active': bookings.get('in_progress', 0),
+            'completed': bookings.get('completed', 0),
+            'by_status': bookings
         }
     }
     
@@ -151,6 +147,7 @@ def verify_provider(provider_id):
     try:
         provider.verified = True
         db.session.commit()
+        invalidate_stats()
         
         return jsonify({
             'message': 'Provider verified successfully',
@@ -177,7 +174,11 @@ def suspend_user(user_id):
     
     try:
         user.is_active = not suspend
+        if suspend:
+            # Tokens already issued stop working on the next request, not at expiry
+            token_revocations.revoke_user(user.id)
         db.session.commit()
+        invalidate_current_identity(user.id)
         
         action = 'suspended' if suspend else 'activated'
         return jsonify({
@@ -212,3 +213,18 @@ def flag_job(job_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@admin_bp.route('/password-hashing', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_password_hashing_stats():
+    """Get password hashing pool queue depth and timings (this process)"""
+    return jsonify(password_hasher.stats()), 200
+
+
+@admin_bp.route('/token-revocations', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_token_revocation_stats():
+    """Get revoked token counts and blocklist check stats (this process)"""
+    return jsonify(token_revocations.stats()), 200
@@ -0,0 +1,70 @@
+"""
+Stats Service
+Grouped aggregate counters for the admin dashboard and provider stats, cached for a short TTL
+"""
+from flask import current_app
+from sqlalchemy import case, func, literal, union_all, select
+from extensions import db
+from app.models.user import User
+from app.models.customer import Customer
+from app.models.provider import Provider
+from app.models.job import Job
+from app.models.booking import Booking
+from app.utils.cache import TTLCache
+
+_stats_cache = TTLCache(maxsize=4096, ttl=30)
+
+
+def _cache_ttl():
+    return current_app.config.get('STATS_CACHE_SECONDS', 30)
+
+
+def _load_dashboard_counts():
+    """All dashboard counters in a single UNION ALL of GROUP BY queries"""
+    verified_label = case((Provider.verified.is_(True), 'verified'), else_='unverified')
+    counts_query = union_all(
+        select(literal('users'), User.role, func.count(User.id)).group_by(User.role),
+        select(literal('customers'), literal('all'), func.count(Customer.id)),
+        select(literal('providers'), verified_label, func.count(Provider.id)).group_by(verified_label),
+        select(literal('jobs'), Job.status, func.count(Job.id)).group_by(Job.status),
+        select(literal('bookings'), Booking.status, func.count(Booking.id)).group_by(Booking.status)
+    )
+
+    grouped = {'users': {}, 'customers': {}, 'providers': {}, 'jobs': {}, 'bookings': {}}
+    for table, key, count in db.session.execute(counts_query):
+        grouped[table][key] = count
+    return grouped
+
+
+def get_dashboard_counts(use_cache=True):
+    """
+    Get grouped counters for the admin dashboard
+
+    Returns:
+        dict: {'users': {role: n}, 'customers': {'all': n},
+               'providers': {'verified'|'unverified': n},
+               'jobs': {status: n}, 'bookings': {status: n}}
+    """
+    if not use_cache:
+        return _load_dashboard_counts()
+    return _stats_cache.get_or_set('dashboard', _load_dashboard_counts, ttl=_cache_ttl())
+
+
+def get_provider_booking_counts(provider_id, use_cache=True):
+    """Get {status: count} of a provider's bookings from one GROUP BY query"""
+    def load():
+        rows = db.session.query(Booking.status, func.count(Booking.id)).filter(
+            Booking.provider_id == provider_id
+        ).group_by(Booking.status).all()
+        return dict(rows)
+
+    if not use_cache:
+        return load()
+    return _stats_cache.get_or_set(('provider_bookings', provider_id), load, ttl=_cache_ttl())
+
+
+def invalidate_stats(provider_id=None):
+    """Drop cached counters after a write that must show up immediately"""
+    _stats_cache.pop('dashboard')
+    if provider_id is not None:
+        _stats_cache.pop(('provider_bookings', provider_id))
@@ -3,4 +3,4 @@ from flask import Blueprint
 auth_bp = Blueprint('auth', __name__)
 
 from app.auth import routes
-
+from app.auth import socketio_handlers
@@ -0,0 +1,164 @@
+"""
+Password Hashing Pool
+bcrypt runs in a bounded pool of worker processes so a burst of logins cannot
+stall request threads, greenlets or Socket.IO traffic
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue stays full for longer than the queue timeout"""
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    """Work factor of a bcrypt hash ('$2b$12$...' -> 12), or None if unreadable"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checking on a ProcessPoolExecutor of pool_size workers.
+
+    Callers wait for a free worker in a queue of at most max_pending; a caller
+    finding the queue full, or still waiting after queue_timeout seconds, gets
+    HashingBusy instead of piling up. pool_size=0 hashes inline on the calling
+    thread.
+    """
+
+    def __init__(self, rounds=12, pool_size=2, max_pending=64, queue_timeout=5.0):
+        self._lock = threading.Lock()
+        self._executor = None
+        self.configure(rounds, pool_size, max_pending, queue_timeout)
+
+    def configure(self, rounds, pool_size, max_pending, queue_timeout):
+        """(Re)apply settings; a running pool is replaced when its size changes"""
+        if self._executor is not None and pool_size != self.pool_size:
+            self.shutdown()
+        self.rounds = rounds
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._workers = threading.BoundedSemaphore(max(pool_size, 1))
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.completed = 0
+            self.rejected = 0
+            self.waiting = 0
+            self.running = 0
+            self.peak_waiting = 0
+            self.wait_seconds = 0.0
+            self.run_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # fork: workers only run bcrypt, and need not re-import the application
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size, mp_context=context)
+            return self._executor
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        raise HashingBusy('Password hashing queue is full')
+
+    def _run(self, func, *args):
+        if not self.pool_size:
+            return func(*args)
+
+        with self._lock:
+            full = self.waiting >= self.max_pending
+            if not full:
+                self.waiting += 1
+                self.peak_waiting = max(self.peak_waiting, self.waiting)
+        if full:
+            self._reject()
+
+        queued_at = time.perf_counter()
+        acquired = self._workers.acquire(timeout=self.queue_timeout)
+        started = time.perf_counter()
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.running += 1
+        if not acquired:
+            self._reject()
+
+        try:
+            result = self._get_executor().submit(func, *args).result()
+        finally:
+            finished = time.perf_counter()
+            self._workers.release()
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.wait_seconds += started - queued_at
+                self.run_seconds += finished - started
+        return result
+
+    def hash(self, password, rounds=None):
+        """Hash a password with the configured (or given) work factor"""
+        return self._run(_hashpw, password, rounds or self.rounds)
+
+    def check(self, password, password_hash):
+        """Check a password against a bcrypt hash"""
+        return self._run(_checkpw, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash uses a different work factor than configured"""
+        return hash_rounds(password_hash) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                'rounds': self.rounds,
+                'pool_size': self.pool_size,
+                'max_pending': self.max_pending,
+                'queue_depth': self.waiting,
+                'peak_queue_depth': self.peak_waiting,
+                'running': self.running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_queue_wait_ms': round(self.wait_seconds / completed * 1000, 2),
+                'avg_hash_ms': round(self.run_seconds / completed * 1000, 2)
+            }
+
+
+# Initialize a global hasher instance
+password_hasher = PasswordHasher()
+
+
+def configure_password_hasher(app):
+    """Apply the BCRYPT_* settings to the shared hasher"""
+    config = app.config
+    password_hasher.configure(
+        config.get('BCRYPT_LOG_ROUNDS', 12),
+        config.get('BCRYPT_POOL_SIZE', 2),
+        config.get('BCRYPT_MAX_PENDING', 64),
+        config.get('BCRYPT_QUEUE_TIMEOUT_SECONDS', 5.0)
+    )
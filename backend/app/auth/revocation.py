@@ -0,0 +1,199 @@
+"""
+Token Revocation
+Revoked JWT ids and per-user cutoffs live in an in-memory hash map in front of
+the revoked_tokens table, so the blocklist check on every request is a dict
+lookup; other workers' revocations are picked up by a periodic sync
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db, jwt
+from app.models.revoked_token import RevokedToken
+from app.utils.db_offload import run_db_task
+
+
+def _epoch(value):
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def _load_revocations(since_id, purge):
+    """Revocation rows added after since_id, as plain tuples; optionally deletes lapsed rows first"""
+    if purge:
+        RevokedToken.query.filter(
+            RevokedToken.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return [tuple(row) for row in db.session.query(
+        RevokedToken.id, RevokedToken.jti, RevokedToken.user_id, RevokedToken.revoked_at, RevokedToken.expires_at
+    ).filter(RevokedToken.id > since_id).order_by(RevokedToken.id)]
+
+
+class TokenRevocations:
+    """
+    Revoked tokens of this process, kept in sync with the revoked_tokens table.
+
+    A token is revoked when its jti was revoked (logout), or when its user's
+    tokens were revoked (suspension) at or after the time it was issued.
+    Revocations made in this process apply immediately; those made by other
+    workers within sync_seconds. Entries are dropped once the tokens they
+    cover have expired, from memory on every sync and from the table every
+    purge_seconds.
+    """
+
+    def __init__(self, sync_seconds=5, purge_seconds=3600, token_lifetime=30 * 86400):
+        self.sync_seconds = sync_seconds
+        self.purge_seconds = purge_seconds
+        self.token_lifetime = token_lifetime
+        self._jtis = {}  # jti -> expiry (epoch seconds)
+        self._users = {}  # user_id -> (tokens issued up to this epoch second are revoked, expiry)
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._synced_at = None
+        self._purged_at = time.monotonic()
+        self.checks = 0
+        self.hits = 0
+        self.syncs = 0
+
+    def configure(self, config):
+        self.sync_seconds = config.get('TOKEN_REVOCATION_SYNC_SECONDS', 5)
+        self.purge_seconds = config.get('TOKEN_REVOCATION_PURGE_SECONDS', 3600)
+        # A user cutoff must outlive every token issued before it
+        lifetimes = [config.get('JWT_ACCESS_TOKEN_EXPIRES'), config.get('JWT_REFRESH_TOKEN_EXPIRES')]
+        self.token_lifetime = max(
+            (lifetime.total_seconds() for lifetime in lifetimes if isinstance(lifetime, timedelta)),
+            default=self.token_lifetime
+        )
+
+    def _remember_jti(self, jti, expires):
+        self._jtis[jti] = expires
+
+    def _remember_user(self, user_id, revoked_before, expires):
+        current = self._users.get(user_id)
+        if current is not None:
+            revoked_before, expires = max(revoked_before, current[0]), max(expires, current[1])
+        self._users[user_id] = (revoked_before, expires)
+
+    def _prune(self, now):
+        for jti in [jti for jti, expires in self._jtis.items() if expires < now]:
+            del self._jtis[jti]
+        for user_id in [user_id for user_id, (_, expires) in self._users.items() if expires < now]:
+            del self._users[user_id]
+
+    def sync(self):
+        """Load revocations added since the last sync (by any worker) and drop lapsed ones"""
+        purge = time.monotonic() - self._purged_at >= self.purge_seconds
+        rows = run_db_task(_load_revocations, self._last_id, purge)
+        with self._lock:
+            for row_id, jti, user_id, revoked_at, expires_at in rows:
+                if jti:
+                    self._remember_jti(jti, _epoch(expires_at))
+                elif user_id is not None:
+                    self._remember_user(user_id, int(_epoch(revoked_at)), _epoch(expires_at))
+                self._last_id = max(self._last_id, row_id)
+            self._prune(time.time())
+            self._synced_at = time.monotonic()
+            if purge:
+                self._purged_at = self._synced_at
+            self.syncs += 1
+
+    def _sync_if_due(self):
+        if self._synced_at is not None and time.monotonic() - self._synced_at < self.sync_seconds:
+            return
+        try:
+            self.sync()
+        except Exception as e:
+            # Keep answering from memory; the next check retries
+            self._synced_at = time.monotonic()
+            current_app.logger.warning(f'Token revocation sync failed: {e}')
+
+    def is_revoked(self, jti, user_id, issued_at):
+        """Whether a token (by jti, user id and iat) has been revoked"""
+        self._sync_if_due()
+        self.checks += 1
+        revoked = jti in self._jtis
+        if not revoked:
+            cutoff = self._users.get(user_id)
+            revoked = cutoff is not None and (issued_at or 0) <= cutoff[0]
+        if revoked:
+            self.hits += 1
+        return revoked
+
+    def revoke(self, payload, reason='logout'):
+        """
+        Revoke one decoded token in the current transaction (the caller commits)
+
+        Returns:
+            bool: False if the token was already revoked
+        """
+        jti = payload['jti']
+        if jti in self._jtis:
+            return False
+        expires_at = datetime.utcfromtimestamp(payload['exp']) if payload.get('exp') else (
+            datetime.utcnow() + timedelta(seconds=self.token_lifetime)
+        )
+        db.session.add(RevokedToken(
+            jti=jti,
+            token_type=payload.get('type'),
+            user_id=_identity_user_id(payload),
+            reason=reason,
+            expires_at=expires_at
+        ))
+        with self._lock:
+            self._remember_jti(jti, _epoch(expires_at))
+        return True
+
+    def revoke_user(self, user_id, reason='suspended'):
+        """Revoke every token issued to a user so far, in the current transaction (the caller commits)"""
+        revoked_at = datetime.utcnow()
+        expires_at = revoked_at + timedelta(seconds=self.token_lifetime)
+        db.session.add(RevokedToken(
+            user_id=user_id,
+            reason=reason,
+            revoked_at=revoked_at,
+            expires_at=expires_at
+        ))
+        with self._lock:
+            self._remember_user(user_id, int(_epoch(revoked_at)), _epoch(expires_at))
+
+    def reset(self):
+        with self._lock:
+            self._jtis.clear()
+            self._users.clear()
+            self._last_id = 0
+            self._synced_at = None
+            self.checks = self.hits = self.syncs = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revoked_tokens': len(self._jtis),
+                'revoked_users': len(self._users),
+                'checks': self.checks,
+                'revoked_hits': self.hits,
+                'syncs': self.syncs,
+                'sync_seconds': self.sync_seconds,
+                'last_sync_age_seconds': round(time.monotonic() - self._synced_at, 1) if self._synced_at else None
+            }
+
+
+def _identity_user_id(payload):
+    identity = payload.get(current_app.config.get('JWT_IDENTITY_CLAIM', 'sub'))
+    return identity.get('id') if isinstance(identity, dict) else identity
+
+
+# Initialize a global revocation store
+token_revocations = TokenRevocations()
+
+
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    return token_revocations.is_revoked(
+        jwt_payload.get('jti'), _identity_user_id(jwt_payload), jwt_payload.get('iat')
+    )
+
+
+def configure_token_revocation(app):
+    """Apply the TOKEN_REVOCATION_* settings and start from an empty in-memory store"""
+    token_revocations.configure(app.config)
+    token_revocations.reset()
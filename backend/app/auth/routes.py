@@ -1,9 +1,13 @@
 from flask import request, jsonify
 from app.auth import auth_bp
-from app.auth.utils import create_user, check_password, generate_tokens
+from app.auth.utils import create_user, check_password, upgrade_password_hash, generate_tokens
+from app.auth.hashing import HashingBusy
+from app.auth.revocation import token_revocations
 from extensions import db
 from app.models.user import User
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from app.utils.current_user import load_current_user
+from app.providers.geo_index import parse_coordinate
+from flask_jwt_extended import jwt_required, get_jwt
 
 
 @auth_bp.route('/register', methods=['POST'])
@@ -34,9 +38,15 @@ def register():
         return jsonify({'error': 'Password must be at least 6 characters'}), 400
     
     # Additional validation for provider
+    latitude = longitude = None
     if role == 'provider':
         if not data.get('category'):
             return jsonify({'error': 'Category is required for providers'}), 400
+        try:
+            latitude = parse_coordinate(data.get('latitude'), 'latitude', 90)
+            longitude = parse_coordinate(data.get('longitude'), 'longitude', 180)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
     try:
         # Create user
@@ -50,7 +60,9 @@ def register():
             category=data.get('category'),
             description=data.get('description'),
             service_area=data.get('service_area'),
-            hourly_rate=data.get('hourly_rate')
+            hourly_rate=data.get('hourly_rate'),
+            latitude=latitude,
+            longitude=longitude
         )
         
         # Generate tokens
@@ -63,6 +75,10 @@ def register():
             'user': user.to_dict()
         }), 201
     
+    except HashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy, please try again'}), 503, {'Retry-After': '1'}
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -82,11 +98,20 @@ def login():
     # Find user
     user = User.query.filter_by(email=email).first()
     
-    if not user or not check_password(password, user.password_hash):
-        return jsonify({'error': 'Invalid email or password'}), 401
+    try:
+        if not user or not check_password(password, user.password_hash):
+            return jsonify({'error': 'Invalid email or password'}), 401
+        
+        if not user.is_active:
+            return jsonify({'error': 'Account is deactivated'}), 403
+        
+        # Move the stored hash to the configured work factor while we have the password
+        if upgrade_password_hash(user, password):
+            db.session.commit()
     
-    if not user.is_active:
-        return jsonify({'error': 'Account is deactivated'}), 403
+    except HashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy, please try again'}), 503, {'Retry-After': '1'}
     
     # Generate tokens
     access_token, refresh_token = generate_tokens(user)
@@ -103,8 +128,7 @@ def login():
 @jwt_required(refresh=True)
 def refresh():
     """Refresh access token"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user or not user.is_active:
         return jsonify({'error': 'User not found or inactive'}), 401
@@ -117,20 +141,24 @@ def refresh():
 
 
 @auth_bp.route('/logout', methods=['POST'])
-@jwt_required()
+@jwt_required(verify_type=False)
 def logout():
-    """Logout user (token blacklisting can be added here)"""
-    # In a production app, you would add the token to a blacklist
-    # For now, we'll just return success
-    return jsonify({'message': 'Logged out successfully'}), 200
+    """Logout user: revoke the presented token (call once with the access and once with the refresh token)"""
+    try:
+        token_revocations.revoke(get_jwt())
+        db.session.commit()
+        return jsonify({'message': 'Logged out successfully'}), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
     """Get current authenticated user"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
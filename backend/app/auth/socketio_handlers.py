@@ -0,0 +1,32 @@
+from flask import request
+from extensions import socketio
+from app.utils.socket_auth import connect_socket, disconnect_socket
+
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    """Verify the JWT once per connection and cache the resolved identity"""
+    token = auth.get('token') if isinstance(auth, dict) else None
+    token = token or request.args.get('token')
+    
+    # Older clients connect anonymously and send the token with each event
+    if not token:
+        return True
+    
+    try:
+        identity = connect_socket(request.sid, token)
+        if identity is None:
+            return False
+        
+        # Providers join their personal room, where emergency jobs are sent
+        if identity.provider_id:
+            socketio.server.enter_room(request.sid, f'provider_{identity.user_id}')
+    except Exception:
+        return False
+    return True
+
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    """Drop the connection's cached identity"""
+    disconnect_socket(request.sid)
@@ -1,19 +1,33 @@
-import bcrypt
 from flask_jwt_extended import create_access_token, create_refresh_token
 from extensions import db
 from app.models.user import User
 from app.models.customer import Customer
 from app.models.provider import Provider
+from app.providers.geo_index import update_provider_position, parse_coordinate
+from app.providers.search_index import update_provider_document
+from app.auth.hashing import password_hasher
+from app.admin.stats import invalidate_stats
 
 
 def hash_password(password):
-    """Hash a password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    """Hash a password using bcrypt (BCRYPT_LOG_ROUNDS, on the hashing pool)"""
+    return password_hasher.hash(password)
 
 
 def check_password(password, password_hash):
-    """Check if password matches hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    """Check if password matches hash (on the hashing pool)"""
+    return password_hasher.check(password, password_hash)
+
+
+def upgrade_password_hash(user, password):
+    """
+    Rehash a just-verified password when its stored work factor differs from
+    BCRYPT_LOG_ROUNDS. Returns True if the hash was replaced (caller commits).
+    """
+    if not password_hasher.needs_rehash(user.password_hash):
+        return False
+    user.password_hash = hash_password(password)
+    return True
 
 
 def create_user(email, password, role, **kwargs):
@@ -45,11 +59,20 @@ def create_user(email, password, role, **kwargs):
             category=kwargs.get('category', ''),
             description=kwargs.get('description'),
             service_area=kwargs.get('service_area'),
-            hourly_rate=kwargs.get('hourly_rate')
+            hourly_rate=kwargs.get('hourly_rate'),
+            # ValueError for a coordinate that is not a number in range
+            latitude=parse_coordinate(kwargs.get('latitude'), 'latitude', 90),
+            longitude=parse_coordinate(kwargs.get('longitude'), 'longitude', 180)
         )
         db.session.add(provider)
     
     db.session.commit()
+    invalidate_stats()
+    
+    if role == 'provider':
+        update_provider_document(provider)
+        update_provider_position(provider.id, provider.latitude, provider.longitude)
+    
     return user
 
 
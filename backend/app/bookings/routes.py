@@ -1,21 +1,22 @@
 from flask import request, jsonify
 from app.bookings import bookings_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
 from datetime import datetime
-from app.models.user import User
 from app.models.booking import Booking
 from app.models.job import Job
 from app.models.provider import Provider
 from app.utils.decorators import customer_required, provider_required
+from app.utils.current_user import load_current_user
+from app.admin.stats import invalidate_stats
+from app.location.tracker import location_tracker
 
 
 @bookings_bp.route('', methods=['GET'], endpoint='get_bookings')
 @jwt_required()
 def get_bookings():
     """Get bookings (customer or provider view)"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     status_filter = request.args.get('status')
     
@@ -64,8 +65,7 @@ def get_booking(booking_id):
     """Get booking details"""
     booking = Booking.query.get_or_404(booking_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Authorization check
     if user.role == 'customer' and booking.customer_id != user.customer.id:
@@ -89,8 +89,7 @@ def update_booking_status(booking_id):
     """Update booking status"""
     booking = Booking.query.get_or_404(booking_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     data = request.get_json()
     new_status = data.get('status')
@@ -117,6 +116,8 @@ def update_booking_status(booking_id):
                 booking.job.status = 'completed'
                 booking.job.completed_at = datetime.utcnow()
         db.session.commit()
+        invalidate_stats(booking.provider_id)
+        location_tracker.invalidate_subscribers(booking.provider_id)
         
         return jsonify({
             'message': 'Booking status updated',
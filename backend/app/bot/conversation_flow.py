@@ -4,7 +4,8 @@ Handles the structured conversation between user and chatbot for problem diagnos
 """
 from enum import Enum
 from datetime import datetime
-from app.bot.gemini_service import get_gemini_service
+from app.bot.llm_client import llm_client
+from app.bot.response_cache import response_cache
 
 
 class ConversationStage(Enum):
@@ -200,7 +201,6 @@ class ConversationFlow:
         
         try:
             # Use AI to generate contextual follow-up questions
-            gemini = get_gemini_service()
             category_info = ServiceCategory.get_category(self.service_category)
             
             prompt = f"""You are QuickFix AI Assistant. A user needs {category_info['name']} service.
@@ -216,7 +216,10 @@ Make questions practical and focused on:
 Respond ONLY with a JSON array of questions:
 ["Question 1?", "Question 2?", "Question 3?", "Question 4?"]"""
 
-            ai_response = gemini.get_quick_response(prompt)
+            # Recurring problems in this category reuse an earlier answer instead of spending quota
+            cached_response = response_cache.get('questions', self.service_category, description)
+            # Bounded wait: on LLMTimeout/LLMError the category's standard questions are used
+            ai_response = cached_response or llm_client.generate(prompt)
             
             # Try to parse questions
             import json
@@ -225,6 +228,9 @@ Respond ONLY with a JSON array of questions:
                     json_start = ai_response.index('[')
                     json_end = ai_response.rindex(']') + 1
                     questions = json.loads(ai_response[json_start:json_end])
+                    if cached_response is None:
+                        response_cache.set('questions', self.service_category, description,
+                                           ai_response[json_start:json_end])
                 else:
                     questions = self._get_details_needed()
             except:
@@ -306,9 +312,6 @@ Respond ONLY with a JSON array of questions:
         self.current_stage = ConversationStage.SOLUTIONS
         
         try:
-            # Get Gemini service
-            gemini = get_gemini_service()
-            
             # Get category info
             category_info = ServiceCategory.get_category(self.service_category)
             
@@ -343,8 +346,11 @@ Guidelines:
 
 Respond ONLY with valid JSON."""
 
-            # Get AI response
-            ai_response = gemini.get_quick_response(prompt)
+            # Near-duplicate problem + details in this category reuse an earlier analysis
+            cache_text = f"{self.problem_description} {self.detailed_situation}"
+            cached_response = response_cache.get('analysis', self.service_category, cache_text)
+            # Get AI response (raises LLMTimeout/LLMError -> rule-based fallback below)
+            ai_response = cached_response or llm_client.generate(prompt)
             
             # Parse JSON response
             import json
@@ -355,6 +361,8 @@ Respond ONLY with valid JSON."""
                     json_end = ai_response.rindex('}') + 1
                     json_str = ai_response[json_start:json_end]
                     ai_data = json.loads(json_str)
+                    if cached_response is None:
+                        response_cache.set('analysis', self.service_category, cache_text, json_str)
                 else:
                     # Fallback to rule-based if JSON parsing fails
                     raise ValueError("No JSON found in response")
@@ -560,5 +568,19 @@ Respond ONLY with valid JSON."""
             'service_category': self.service_category,
             'problem_description': self.problem_description,
             'detailed_situation': self.detailed_situation,
+            'conversation_history': self.conversation_history,
             'created_at': self.created_at.isoformat()
         }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a flow from to_dict() output"""
+        flow = cls(data['user_id'], data['session_id'])
+        flow.current_stage = ConversationStage(data.get('current_stage', ConversationStage.GREETING.value))
+        flow.service_category = data.get('service_category')
+        flow.problem_description = data.get('problem_description')
+        flow.detailed_situation = data.get('detailed_situation')
+        flow.conversation_history = list(data.get('conversation_history') or [])
+        if data.get('created_at'):
+            flow.created_at = datetime.fromisoformat(data['created_at'])
+        return flow
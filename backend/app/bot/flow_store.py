@@ -0,0 +1,244 @@
+"""
+Conversation Flow Store
+Diagnosis flows persisted per chat session (database table or local JSON files),
+with a bounded LRU + TTL cache of rebuilt ConversationFlow objects in front, so
+any worker can continue a session and idle sessions leave memory
+"""
+import json
+import os
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from extensions import db
+from app.models.chat_session import ChatFlowState
+from app.bot.conversation_flow import ConversationFlow
+from app.utils.cache import TTLCache
+
+PENDING_FLOW_SAVES = 'pending_flow_saves'  # Session.info key: save key -> callable run once the transaction commits
+
+
+def _after_commit(key, callback):
+    """Run callback() once the current transaction commits, never on rollback; the last callback per key wins"""
+    db.session.info.setdefault(PENDING_FLOW_SAVES, {})[key] = callback
+
+
+class DatabaseFlowBackend:
+    """Flow state in the chat_flow_states table, shared by every worker on the database"""
+
+    name = 'database'
+
+    def revision(self, session_id):
+        row = db.session.query(ChatFlowState.revision).filter(ChatFlowState.session_id == session_id).first()
+        return row.revision if row else None
+
+    def load(self, session_id):
+        """(revision, state dict), or None"""
+        row = db.session.query(ChatFlowState.revision, ChatFlowState.state).filter(
+            ChatFlowState.session_id == session_id
+        ).first()
+        return (row.revision, row.state) if row else None
+
+    def save(self, session_id, state, on_saved=None):
+        """
+        Store the state in the current transaction (the caller commits) and call
+        on_saved(revision) once it commits; returns the new revision
+        """
+        revision = ChatFlowState.save_state(session_id, state)
+        if on_saved is not None:
+            _after_commit((self.name, session_id), lambda: on_saved(revision))
+        return revision
+
+    def delete(self, session_id):
+        ChatFlowState.query.filter_by(session_id=session_id).delete(synchronize_session=False)
+
+
+class FileFlowBackend:
+    """Flow state as one JSON file per session, shared by workers on the same host"""
+
+    name = 'file'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f'flow_{int(session_id)}.json')
+
+    @staticmethod
+    def _revision(stat):
+        # Every save replaces the file, so the inode changes even within one mtime tick
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def revision(self, session_id):
+        try:
+            return self._revision(os.stat(self._path(session_id)))
+        except FileNotFoundError:
+            return None
+
+    def load(self, session_id):
+        try:
+            with open(self._path(session_id), encoding='utf-8') as f:
+                return self._revision(os.fstat(f.fileno())), json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, session_id, state, on_saved=None):
+        """
+        Write the file once the request's transaction commits (nothing on rollback),
+        then call on_saved(revision); returns None as the revision is not known yet
+        """
+        def write():
+            revision = self.write(session_id, state)
+            if on_saved is not None:
+                on_saved(revision)
+        _after_commit(self._path(session_id), write)
+        return None
+
+    def write(self, session_id, state):
+        path = self._path(session_id)
+        partial = f'{path}.{os.getpid()}.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(partial, path)  # readers never see a half-written file
+        return self._revision(os.stat(path))
+
+    def delete(self, session_id):
+        """Remove the file once the request's transaction commits"""
+        _after_commit(self._path(session_id), lambda: self.remove(session_id))
+
+    def remove(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_pending_flow_saves(session):
+    for callback in session.info.pop(PENDING_FLOW_SAVES, {}).values():
+        callback()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_pending_flow_saves(session, transaction):
+    # Rolled back or closed without a commit: the flow changes are discarded with it
+    if transaction.parent is None:
+        session.info.pop(PENDING_FLOW_SAVES, None)
+
+
+def _copy(flow):
+    return ConversationFlow.from_dict(flow.to_dict())
+
+
+class FlowStore:
+    """
+    Loads and saves ConversationFlow objects by chat session id.
+
+    Every save is written through to the backend with the caller's
+    transaction (files once it commits) and bumps the session's revision;
+    the cache takes the saved flow only after that commit. A cached flow is
+    reused only while the backend still has the same revision (a one-column
+    primary key lookup, or a stat() for files), so a flow advanced by another
+    worker is reloaded rather than served stale, and concurrent requests for
+    the same stale or missing entry share one reload. Callers get their own
+    copy to change. At most maxsize flows stay in memory, each for ttl
+    seconds after its last use.
+    """
+
+    def __init__(self, backend=None, maxsize=1000, ttl=1800):
+        self.backend = backend or DatabaseFlowBackend()
+        self._flows = TTLCache(maxsize=maxsize, ttl=ttl)  # session_id -> (revision, flow)
+        self._lock = threading.Lock()
+        self._loading = {}  # session_id -> [lock, waiting callers]
+        self.loads = 0
+        self.saves = 0
+        self.coalesced = 0
+
+    def configure(self, config):
+        directory = config.get('FLOW_STORE_DIR')
+        if config.get('FLOW_STORE_BACKEND', 'database') == 'file' and directory:
+            self.backend = FileFlowBackend(directory)
+        else:
+            self.backend = DatabaseFlowBackend()
+        self._flows = TTLCache(
+            maxsize=config.get('FLOW_STORE_MAX_SESSIONS', 1000),
+            ttl=config.get('FLOW_STORE_TTL_SECONDS', 1800)
+        )
+
+    def get(self, session_id):
+        """The session's flow, rehydrated from the backend if needed; None if it was never started"""
+        revision = self.backend.revision(session_id)
+        if revision is None:
+            self._flows.pop(session_id)
+            return None
+
+        cached = self._flows.get(session_id)
+        if cached is not None and cached[0] == revision:
+            return _copy(cached[1])
+
+        with self._lock:
+            entry = self._loading.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                # Another request may have reloaded it while this one waited
+                cached = self._flows.get(session_id)
+                if cached is not None and cached[0] == revision:
+                    self.coalesced += 1
+                    return _copy(cached[1])
+
+                loaded = self.backend.load(session_id)
+                if loaded is None:
+                    return None
+                revision, state = loaded
+                flow = ConversationFlow.from_dict(state)
+                self._flows.set(session_id, (revision, flow))
+                self.loads += 1
+                return _copy(flow)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._loading[session_id]
+
+    def create(self, user_id, session_id):
+        """Start a new flow for a session and save it"""
+        flow = ConversationFlow(user_id, session_id)
+        self.save(flow)
+        return flow
+
+    def get_or_create(self, user_id, session_id):
+        return self.get(session_id) or self.create(user_id, session_id)
+
+    def save(self, flow):
+        """Persist a flow after changing it, as part of the caller's transaction"""
+        session_id = flow.session_id
+        saved = _copy(flow)  # later changes by the caller stay out of the cache
+        self.backend.save(
+            session_id, saved.to_dict(),
+            on_saved=lambda revision: self._flows.set(session_id, (revision, saved))
+        )
+        self._flows.pop(session_id)  # cached again once the transaction commits
+        self.saves += 1
+
+    def delete(self, session_id):
+        self.backend.delete(session_id)
+        self._flows.pop(session_id)
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'loads': self.loads,
+            'saves': self.saves,
+            'coalesced_loads': self.coalesced,
+            'memory': self._flows.stats()
+        }
+
+
+# Initialize a global flow store
+flow_store = FlowStore()
+
+
+def configure_flow_store(app):
+    """Apply the FLOW_STORE_* settings"""
+    flow_store.configure(app.config)
@@ -5,6 +5,8 @@ Service to handle communication with Google's Gemini API
 import os
 import google.generativeai as genai
 from datetime import datetime
+from app.bot.llm_client import llm_client, LLMTimeout, LLMBusy, LLMRateLimited
+from app.bot.rate_limiter import PRIORITY_QUICK
 
 
 class GeminiChatService:
@@ -62,12 +64,13 @@ class GeminiChatService:
             self._system_prompt = None
         return self.chat
     
-    def send_message(self, user_message):
+    def send_message(self, user_message, history=None):
         """
         Send a message to Gemini and get response
         
         Args:
             user_message (str): The user's message
+            history (list, optional): Earlier turns, as ChatSession.get_conversation_history()
             
         Returns:
             dict: Response containing:
@@ -76,24 +79,21 @@ class GeminiChatService:
                 - error (str): Error message if failed
         """
         try:
-            if not hasattr(self, 'chat'):
-                self.start_chat()
-            
-            # Send message and get response
-            response = self.chat.send_message(user_message)
+            # Runs on the shared LLM client: rate budget, bounded concurrency and a deadline
+            response_text = llm_client.generate(user_message, history=history)
             
             return {
                 'success': True,
-                'response': response.text,
+                'response': response_text,
                 'timestamp': datetime.utcnow().isoformat()
             }
         except Exception as e:
             error_msg = str(e)
             # Handle common free tier errors
-            if 'quota' in error_msg.lower() or 'rate limit' in error_msg.lower():
+            if isinstance(e, LLMTimeout):
+                error_msg = "The assistant is taking too long to respond. Please try again."
+            elif isinstance(e, LLMRateLimited):
                 error_msg = "Rate limit exceeded. Please wait a moment and try again."
-            elif '429' in error_msg:
-                error_msg = "Too many requests. Please wait a few seconds and try again."
             elif 'api key' in error_msg.lower():
                 error_msg = "API key configuration error. Please contact support."
             
@@ -104,28 +104,33 @@ class GeminiChatService:
                 'timestamp': datetime.utcnow().isoformat()
             }
     
-    def get_quick_response(self, prompt):
+    def get_quick_response(self, prompt, timeout=None):
         """
         Get a quick response without maintaining chat history
         Useful for one-off queries
         
         Args:
             prompt (str): The prompt to send
+            timeout (float, optional): Deadline in seconds (default LLM_TIMEOUT_SECONDS)
             
         Returns:
             str: The AI response
+            
+        Raises:
+            LLMTimeout: no answer within the deadline
+            LLMRateLimited: no rate budget in time (callers answer 429)
+            LLMBusy: too many calls already waiting (callers answer 503)
         """
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            # Identical prompts already in flight share one model call; queued behind
+            # live diagnosis calls, and refused quickly when the rate budget is spent
+            return llm_client.generate(prompt, timeout=timeout, priority=PRIORITY_QUICK)
+        except (LLMTimeout, LLMRateLimited, LLMBusy):
+            raise
         except Exception as e:
             error_msg = str(e)
             # Handle common free tier errors
-            if 'quota' in error_msg.lower() or 'rate limit' in error_msg.lower():
-                return "Rate limit exceeded. Please wait a moment and try again."
-            elif '429' in error_msg:
-                return "Too many requests. Please wait a few seconds and try again."
-            elif 'safety' in error_msg.lower():
+            if 'safety' in error_msg.lower():
                 return "Response blocked due to safety settings. Please rephrase your question."
             return f"Error: {error_msg}"
     
@@ -180,7 +185,8 @@ def initialize_gemini(app):
         try:
             _chat_service = GeminiChatService(api_key)
             print("✓ Gemini API service initialized successfully (gemini-2.5-flash)")
-            print("✓ Free tier: 15 requests/min, optimized for performance")
+            print(f"✓ Rate budget: {app.config.get('LLM_RATE_LIMIT_RPM', 15)} requests/min, "
+                  f"{app.config.get('LLM_RATE_LIMIT_TPM', 1000000)} tokens/min")
         except Exception as e:
             print(f"✗ Failed to initialize Gemini service: {e}")
     else:
@@ -0,0 +1,449 @@
+"""
+Async LLM Client
+Gemini generateContent calls run on an asyncio event loop in a background thread:
+a bounded number at a time, each with a deadline, and identical in-flight prompts
+share one upstream call. Each call first takes RPM/TPM budget from the rate
+limiter. Request threads only wait for the result, and stop waiting
+(cancelling the call) when their deadline passes.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import ssl
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from urllib.parse import urlsplit
+from extensions import socketio
+from app.utils.db_offload import COOPERATIVE_MODES
+from app.bot.rate_limiter import RateLimiter, PRIORITY_DIAGNOSIS, estimate_tokens
+
+DEFAULT_BASE_URL = 'https://generativelanguage.googleapis.com'
+DEFAULT_GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'topP': 0.95,
+    'topK': 40,
+    'maxOutputTokens': 2048
+}
+
+
+class LLMError(Exception):
+    """The model call failed (HTTP error, bad response, not configured)"""
+
+
+class LLMTimeout(LLMError):
+    """The model did not answer before the deadline"""
+
+
+class LLMBusy(LLMError):
+    """Too many distinct calls are already waiting"""
+
+
+class LLMRateLimited(LLMBusy):
+    """No RPM/TPM budget in time (locally, or the model answered 429)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _async_mode():
+    # socketio has no async_mode until init_app (e.g. scripts using the client directly)
+    return getattr(socketio, 'async_mode', 'threading')
+
+
+def _native_thread(target, name):
+    """An OS thread even when eventlet/gevent patched threading"""
+    thread_class = threading.Thread
+    if _async_mode() == 'eventlet':
+        from eventlet.patcher import original
+        thread_class = original('threading').Thread
+    elif _async_mode() == 'gevent':
+        from gevent.monkey import get_original
+        thread_class = get_original('threading', 'Thread')
+    return thread_class(target=target, name=name, daemon=True)
+
+
+def _green_wait(call, timeout):
+    """
+    Park the calling greenlet until a call is done (or timeout) without holding
+    an OS thread: the call's done-callback, running on the client's loop thread,
+    writes to a pipe the eventlet/gevent hub watches
+    """
+    os_module = os
+    if _async_mode() == 'eventlet':
+        from eventlet.patcher import original
+        os_module = original('os')
+    read_fd, write_fd = os.pipe()
+
+    def wake():
+        # Only the callback touches write_fd, so it is never reused while a call is pending
+        try:
+            os_module.write(write_fd, b'x')
+        except OSError:
+            pass  # the waiter already gave up and closed its end
+        finally:
+            os_module.close(write_fd)
+
+    try:
+        call.add_done_callback(wake)
+        if _async_mode() == 'eventlet':
+            from eventlet.hubs import trampoline
+            trampoline(read_fd, read=True, timeout=timeout, timeout_exc=FutureTimeoutError)
+        else:
+            from gevent.socket import wait_read
+            wait_read(read_fd, timeout, timeout_exc=FutureTimeoutError)
+    except FutureTimeoutError:
+        pass  # result() below cancels this caller's share and raises LLMTimeout
+    finally:
+        os.close(read_fd)
+    return call.result(0)
+
+
+class GeminiRestBackend:
+    """
+    Gemini generateContent over plain HTTP/1.1 on asyncio streams, so a
+    cancelled call closes its connection. base_url can point at a local
+    fake model server (see fake_llm_server.py).
+    """
+
+    def __init__(self, api_key, model='gemini-2.5-flash', base_url=DEFAULT_BASE_URL, generation_config=None):
+        self.api_key = api_key
+        self.model = model
+        self.generation_config = generation_config or DEFAULT_GENERATION_CONFIG
+        url = urlsplit(base_url)
+        self.secure = url.scheme == 'https'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.secure else 80)
+        self.base_path = url.path.rstrip('/')
+
+    def request_body(self, prompt, history=None):
+        contents = []
+        for turn in history or []:
+            parts = [part if isinstance(part, dict) else {'text': part} for part in turn['parts']]
+            contents.append({'role': turn['role'], 'parts': parts})
+        contents.append({'role': 'user', 'parts': [{'text': prompt}]})
+        return {'contents': contents, 'generationConfig': self.generation_config}
+
+    async def _post(self, path, payload):
+        """POST JSON with the API key header, returning (status, parsed body)"""
+        body = json.dumps(payload).encode('utf-8')
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.secure else None
+        )
+        try:
+            writer.write(
+                f'POST {path} HTTP/1.1\r\n'
+                f'Host: {self.host}\r\n'
+                f'Content-Type: application/json\r\n'
+                f'x-goog-api-key: {self.api_key}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+
+        head, _, data = raw.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            status = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            raise LLMError('Malformed response from model server')
+        headers = dict(line.split(':', 1) for line in lines[1:] if ':' in line)
+        headers = {name.strip().lower(): value.strip() for name, value in headers.items()}
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = self._dechunk(data)
+        try:
+            return status, json.loads(data or b'{}')
+        except ValueError:
+            raise LLMError(f'Model server returned {status} with a non-JSON body')
+
+    @staticmethod
+    def _dechunk(data):
+        chunks = []
+        while data:
+            size_line, _, data = data.partition(b'\r\n')
+            size = int(size_line.split(b';')[0] or b'0', 16)
+            if size == 0:
+                break
+            chunks.append(data[:size])
+            data = data[size + 2:]
+        return b''.join(chunks)
+
+    @staticmethod
+    def _retry_delay(data):
+        """Seconds from a 429's RetryInfo detail ("17s"), if it has one"""
+        details = (data.get('error') or {}).get('details', []) if isinstance(data, dict) else []
+        for detail in details:
+            delay = str(detail.get('retryDelay', '')).rstrip('s') if isinstance(detail, dict) else ''
+            try:
+                return float(delay)
+            except ValueError:
+                continue
+        return None
+
+    async def generate(self, prompt, history=None):
+        path = f'{self.base_path}/v1beta/models/{self.model}:generateContent'
+        status, data = await self._post(path, self.request_body(prompt, history))
+        if status == 429:
+            raise LLMRateLimited('The model rate limit was exceeded', retry_after=self._retry_delay(data))
+        if status != 200:
+            message = (data.get('error') or {}).get('message', '') if isinstance(data, dict) else ''
+            raise LLMError(f'{status} {message}'.strip())
+        try:
+            parts = data['candidates'][0]['content']['parts']
+        except (KeyError, IndexError, TypeError):
+            reason = (data.get('promptFeedback') or {}).get('blockReason')
+            raise LLMError(f'Response blocked by safety settings ({reason})' if reason else 'Empty model response')
+        return ''.join(part.get('text', '') for part in parts)
+
+
+class LLMCall:
+    """One caller's share of a (possibly coalesced) model call"""
+
+    def __init__(self, client, key, future):
+        self._client = client
+        self._key = key
+        self._future = future
+        self._released = False
+
+    def done(self):
+        return self._future.done()
+
+    def add_done_callback(self, fn):
+        """Call fn() (on the client's loop thread) once the call finishes"""
+        self._future.add_done_callback(lambda future: fn())
+
+    def result(self, timeout=None):
+        """
+        Wait for the model's text
+
+        Raises:
+            LLMTimeout: no answer within timeout (this caller's share is cancelled)
+            LLMError: the call failed or was cancelled
+        """
+        try:
+            return self._future.result(timeout)
+        except FutureTimeoutError:
+            self.cancel()
+            raise LLMTimeout('The AI assistant took too long to answer')
+        except CancelledError:
+            raise LLMError('Model call cancelled')
+        finally:
+            if self._future.done():
+                self._release()
+
+    def cancel(self):
+        """Stop waiting; the upstream call is cancelled once no caller waits for it"""
+        if self._release():
+            self._client._cancel_if_unwanted(self._key, self._future)
+
+    def _release(self):
+        if self._released:
+            return False
+        self._released = True
+        self._client._release(self._key, self._future)
+        return True
+
+
+class LLMClient:
+    """
+    Runs backend.generate() coroutines on a private event loop thread.
+
+    At most max_concurrency calls reach the model at once; the rest queue on
+    a semaphore, and the deadline (timeout seconds) covers queueing too.
+    Submitting the same prompt and history while an identical call is in
+    flight joins that call instead of starting another. More than
+    max_pending distinct calls in flight raise LLMBusy. Calls that get no
+    rate limiter budget within their priority's maximum wait raise
+    LLMRateLimited.
+    """
+
+    def __init__(self, backend=None, max_concurrency=4, timeout=20.0, max_pending=100, rate_limiter=None):
+        self.backend = backend
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._loop = None
+        self._semaphore = None
+        self._inflight = {}  # key -> [future, waiting callers]
+        self.reset_stats()
+
+    def configure(self, config, backend=None):
+        api_key = config.get('GEMINI_API_KEY')
+        self.backend = backend or (GeminiRestBackend(
+            api_key,
+            model=config.get('LLM_MODEL', 'gemini-2.5-flash'),
+            base_url=config.get('LLM_BASE_URL') or DEFAULT_BASE_URL
+        ) if api_key else None)
+        self.max_concurrency = config.get('LLM_MAX_CONCURRENCY', 4)
+        self.timeout = config.get('LLM_TIMEOUT_SECONDS', 20.0)
+        self.max_pending = config.get('LLM_MAX_PENDING', 100)
+        self.rate_limiter.configure(config)
+        with self._lock:
+            self._semaphore = None  # recreated with the new size on the loop thread
+
+    def reset_stats(self):
+        with self._lock:
+            self.submitted = 0
+            self.coalesced = 0
+            self.completed = 0
+            self.failed = 0
+            self.timeouts = 0
+            self.cancelled = 0
+            self.rate_limited = 0
+            self.running = 0
+            self.call_seconds = 0.0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = _native_thread(loop.run_forever, 'llm-client-loop')
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def _key(prompt, history):
+        material = json.dumps([prompt, history or []], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    async def _call(self, prompt, history, timeout, priority):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._semaphore
+        limiter = self.rate_limiter
+        reserved = limiter.reserve(prompt, history)
+
+        async def limited():
+            if not await limiter.acquire(priority, reserved, min(timeout, limiter.max_wait.get(priority, timeout))):
+                raise LLMRateLimited('The AI assistant is at its request limit, please try again shortly')
+            async with semaphore:
+                started = time.perf_counter()
+                with self._lock:
+                    self.running += 1
+                try:
+                    text = await self.backend.generate(prompt, history)
+                    limiter.settle(reserved, estimate_tokens(prompt, history) + estimate_tokens(text))
+                    return text
+                except LLMRateLimited as e:
+                    limiter.pause(e.retry_after or 60.0 / max(limiter.rpm, 1))
+                    raise
+                finally:
+                    with self._lock:
+                        self.running -= 1
+                        self.call_seconds += time.perf_counter() - started
+
+        try:
+            return await asyncio.wait_for(limited(), timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeout('The AI assistant took too long to answer')
+        except (OSError, ssl.SSLError) as e:
+            raise LLMError(f'Could not reach the model server: {e}')
+
+    def submit(self, prompt, history=None, timeout=None, priority=PRIORITY_DIAGNOSIS):
+        """
+        Start (or join) a model call without waiting for it
+
+        Returns:
+            LLMCall: call .result() to wait, .cancel() to give up
+        """
+        if self.backend is None:
+            raise LLMError('GEMINI_API_KEY is not configured')
+        timeout = timeout or self.timeout
+        key = self._key(prompt, history)
+        loop = self._ensure_loop()
+        with self._lock:
+            self.submitted += 1
+            entry = self._inflight.get(key)
+            if entry is not None and not entry[0].done():
+                entry[1] += 1
+                self.coalesced += 1
+                return LLMCall(self, key, entry[0])
+            if len(self._inflight) >= self.max_pending:
+                raise LLMBusy('Too many AI requests in progress, please try again shortly')
+            future = asyncio.run_coroutine_threadsafe(self._call(prompt, history, timeout, priority), loop)
+            self._inflight[key] = [future, 1]
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return LLMCall(self, key, future)
+
+    def generate(self, prompt, history=None, timeout=None, priority=PRIORITY_DIAGNOSIS):
+        """Submit a call and wait for its text (raises LLMTimeout / LLMRateLimited / LLMBusy / LLMError)"""
+        call = self.submit(prompt, history, timeout, priority)
+        wait = (timeout or self.timeout) + 1  # the call's own deadline normally fires first
+        if _async_mode() in COOPERATIVE_MODES:
+            # Blocking on the future would stall the event hub, and waiting on the DB
+            # offload pool would hold one of its threads for the whole model call
+            return _green_wait(call, wait)
+        return call.result(wait)
+
+    def _finished(self, key, future):
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and entry[0] is future:
+                del self._inflight[key]
+            if future.cancelled():
+                self.cancelled += 1
+                return
+            error = future.exception()
+            if error is None:
+                self.completed += 1
+            elif isinstance(error, LLMTimeout):
+                self.timeouts += 1
+            elif isinstance(error, LLMRateLimited):
+                self.rate_limited += 1
+            else:
+                self.failed += 1
+
+    def _release(self, key, future):
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and entry[0] is future:
+                entry[1] -= 1
+
+    def _cancel_if_unwanted(self, key, future):
+        with self._lock:
+            entry = self._inflight.get(key)
+            unwanted = entry is None or entry[0] is not future or entry[1] <= 0
+        if unwanted:
+            future.cancel()  # cancels the task on the loop, closing its connection
+
+    def shutdown(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+            self._semaphore = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed + self.timeouts
+            return {
+                'max_concurrency': self.max_concurrency,
+                'timeout_seconds': self.timeout,
+                'in_flight': len(self._inflight),
+                'running': self.running,
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'cancelled': self.cancelled,
+                'rate_limited': self.rate_limited,
+                'avg_call_ms': round(self.call_seconds / finished * 1000, 1) if finished else 0.0
+            }
+
+
+# Initialize a global client instance
+llm_client = LLMClient()
+
+
+def configure_llm_client(app):
+    """Apply GEMINI_API_KEY and the LLM_* settings to the shared client"""
+    llm_client.configure(app.config)
@@ -0,0 +1,235 @@
+"""
+Gemini Rate Limiter
+Client-side RPM/TPM token buckets in front of the model: calls wait in a
+priority queue for budget (live diagnosis ahead of quick responses), and a
+call that could not get budget within its allowed wait is refused up front
+so the caller can fall back instead of waiting for a 429.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+PRIORITY_DIAGNOSIS = 0  # session chat, follow-up questions, analysis, ask-question
+PRIORITY_QUICK = 1      # /quick-response
+PRIORITY_NAMES = {PRIORITY_DIAGNOSIS: 'diagnosis', PRIORITY_QUICK: 'quick'}
+
+
+def estimate_tokens(prompt, history=None):
+    """Rough token count of a request (about 4 characters per token)"""
+    chars = len(prompt or '')
+    for turn in history or []:
+        for part in turn.get('parts', []):
+            chars += len(part.get('text', '') if isinstance(part, dict) else str(part))
+    return chars // 4 + 1
+
+
+class TokenBucket:
+    """Refills `per_minute` units over a minute, holding at most one minute's worth"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount, now):
+        """Seconds until `amount` units are available (0 if they are now)"""
+        self.refill(now)
+        if amount <= self.available:
+            return 0.0
+        return (amount - self.available) / self.rate if self.rate else float('inf')
+
+    def take(self, amount):
+        self.available -= amount
+
+    def give_back(self, amount):
+        self.available = min(self.capacity, self.available + amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets for one model.
+
+    acquire() runs on the LLM client's event loop. Waiters are granted
+    strictly by (priority, arrival), so a quick response never takes budget
+    a queued diagnosis call could use, and lower priorities leave
+    `reserved_share` of both buckets unspent for diagnosis bursts. A call
+    is refused immediately when the budget needed by everything queued
+    ahead of it (plus itself) will not refill within its maximum wait. A
+    429 from the model pauses all grants for the retry delay it asked for.
+
+    The buckets live in this process only: configure() gives each of
+    LLM_RATE_LIMIT_WORKERS processes an equal share of the API key's
+    limits, so N workers together stay within them.
+    """
+
+    def __init__(self, rpm=15, tpm=1000000, output_tokens=512, max_wait=None, reserved_share=0.2):
+        self._lock = threading.Lock()
+        self._queue = []  # (priority, seq, tokens, enqueued_at, future)
+        self._seq = itertools.count()
+        self._timer = None
+        self.workers = 1
+        self.configure_limits(rpm, tpm, output_tokens, max_wait, reserved_share)
+        self.reset_stats()
+
+    def configure(self, config):
+        workers = max(1, config.get('LLM_RATE_LIMIT_WORKERS', 1))
+        self.workers = workers
+        self.configure_limits(
+            config.get('LLM_RATE_LIMIT_RPM', 15) / workers,
+            config.get('LLM_RATE_LIMIT_TPM', 1000000) / workers,
+            config.get('LLM_RATE_LIMIT_OUTPUT_TOKENS', 512),
+            {
+                PRIORITY_DIAGNOSIS: config.get('LLM_DIAGNOSIS_MAX_WAIT_SECONDS', 5.0),
+                PRIORITY_QUICK: config.get('LLM_QUICK_MAX_WAIT_SECONDS', 1.0)
+            },
+            config.get('LLM_DIAGNOSIS_RESERVED_SHARE', 0.2)
+        )
+
+    def configure_limits(self, rpm, tpm, output_tokens=512, max_wait=None, reserved_share=0.2):
+        with self._lock:
+            self.reserved_share = reserved_share
+            self.rpm = rpm
+            self.tpm = tpm
+            self.output_tokens = output_tokens
+            self.max_wait = max_wait or {PRIORITY_DIAGNOSIS: 5.0, PRIORITY_QUICK: 1.0}
+            self._requests = TokenBucket(rpm)
+            self._tokens = TokenBucket(tpm)
+            self._paused_until = 0.0
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats_by_priority = {
+                priority: {'granted': 0, 'rejected': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                           'peak_queued': 0}
+                for priority in PRIORITY_NAMES
+            }
+            self.upstream_rate_limited = 0
+
+    def reserve(self, prompt, history=None):
+        """Tokens to take for a call: its input plus the expected answer"""
+        return estimate_tokens(prompt, history) + self.output_tokens
+
+    def _floor(self, priority, bucket):
+        """Units a priority must leave in the bucket (diagnosis may use all of it)"""
+        return 0.0 if priority == PRIORITY_DIAGNOSIS else bucket.capacity * self.reserved_share
+
+    def _depth(self, priority):
+        return sum(1 for item in self._queue if item[0] == priority and not item[4].done())
+
+    def _estimated_wait(self, priority, tokens, now):
+        # Everything queued at this priority or above is granted first
+        ahead = [item for item in self._queue if item[0] <= priority and not item[4].done()]
+        requests_wait = self._requests.wait_for(len(ahead) + 1 + self._floor(priority, self._requests), now)
+        tokens_wait = self._tokens.wait_for(
+            sum(item[2] for item in ahead) + tokens + self._floor(priority, self._tokens), now
+        )
+        return max(requests_wait, tokens_wait, self._paused_until - now)
+
+    async def acquire(self, priority, tokens, max_wait=None):
+        """
+        Wait for budget for one call
+
+        Returns:
+            bool: False when the budget is not there within max_wait
+                  (default: this priority's configured maximum wait)
+        """
+        now = time.monotonic()
+        tokens = min(tokens, self.tpm)  # an oversized request waits for a full bucket
+        if max_wait is None:
+            max_wait = self.max_wait.get(priority, 0.0)
+        with self._lock:
+            if self._estimated_wait(priority, tokens, now) > max_wait:
+                self.stats_by_priority[priority]['rejected'] += 1
+                return False
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (priority, next(self._seq), tokens, now, future))
+            stats = self.stats_by_priority[priority]
+            stats['peak_queued'] = max(stats['peak_queued'], self._depth(priority))
+        self._dispatch()
+        try:
+            # Higher priorities arriving later can still push this call past its wait
+            await asyncio.wait_for(future, max_wait)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats_by_priority[priority]['rejected'] += 1
+            return False
+        return True
+
+    def _dispatch(self):
+        """Grant budget to the queue head(s), or wake up when the head's budget refills"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with self._lock:
+            while self._queue:
+                priority, _, tokens, enqueued_at, future = self._queue[0]
+                if future.done():
+                    heapq.heappop(self._queue)
+                    continue
+                now = time.monotonic()
+                wait = max(self._requests.wait_for(1 + self._floor(priority, self._requests), now),
+                           self._tokens.wait_for(tokens + self._floor(priority, self._tokens), now),
+                           self._paused_until - now)
+                if wait > 0:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                    return
+                heapq.heappop(self._queue)
+                self._requests.take(1)
+                self._tokens.take(tokens)
+                waited = now - enqueued_at
+                stats = self.stats_by_priority[priority]
+                stats['granted'] += 1
+                stats['wait_seconds'] += waited
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+                future.set_result(None)
+
+    def settle(self, reserved, used):
+        """Correct the token bucket once a call's real size is known"""
+        with self._lock:
+            if used < reserved:
+                self._tokens.give_back(reserved - used)
+            else:
+                self._tokens.take(used - reserved)
+
+    def pause(self, seconds):
+        """The model answered 429: grant nothing for `seconds`"""
+        with self._lock:
+            self.upstream_rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._requests.available = min(self._requests.available, 0.0)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            by_priority = {}
+            for priority, name in PRIORITY_NAMES.items():
+                stats = self.stats_by_priority[priority]
+                by_priority[name] = {
+                    'queued': self._depth(priority),
+                    'peak_queued': stats['peak_queued'],
+                    'granted': stats['granted'],
+                    'rejected': stats['rejected'],
+                    'avg_wait_ms': round(stats['wait_seconds'] / stats['granted'] * 1000, 1) if stats['granted'] else 0.0,
+                    'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 1),
+                    'max_wait_seconds': self.max_wait.get(priority)
+                }
+            return {
+                'rpm_limit': self.rpm,  # this process's share
+                'tpm_limit': self.tpm,
+                'workers': self.workers,
+                'diagnosis_reserved_share': self.reserved_share,
+                'requests_available': round(self._requests.available, 2),
+                'tokens_available': int(self._tokens.available),
+                'paused_seconds': round(max(0.0, self._paused_until - now), 1),
+                'upstream_rate_limited': self.upstream_rate_limited,
+                'priorities': by_priority
+            }
@@ -0,0 +1,233 @@
+"""
+Chatbot Response Cache
+AI answers to diagnosis prompts, keyed on service category plus normalized problem
+text. Near-duplicate problem descriptions ("water leaking under my kitchen sink
+cabinet" / "water leaking under the kitchen sink cabinet again") reuse earlier
+follow-up questions instead of spending model quota; analyses only match exactly.
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from app.utils.cache import TTLCache
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from has have i i'm im in is it its
+it's me my of on or our so some that the their there this to too very was we were what when
+where which with would you your please help need get got just really also still now
+""".split())
+MIN_SIMILAR_TOKENS = 3  # shorter texts only match exactly
+FUZZY_KINDS = ('questions',)  # kinds that may reuse a near-duplicate's answer
+
+
+def _stem(token):
+    for suffix, replacement in (('ies', 'y'), ('ing', ''), ('ed', ''), ('es', ''), ('s', '')):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)] + replacement
+    return token
+
+
+def differs_in_safety(a, b):
+    """Whether two token sets disagree on a negation or safety-relevant word"""
+    return any(token in NEGATIONS or token in SAFETY_TERMS for token in a ^ b)
+
+
+def normalize(text):
+    """Lowercased, stemmed content words of a text, as a frozenset"""
+    words = re.findall(r"[a-z0-9']+", (text or '').lower())
+    return frozenset(_stem(word.strip("'")) for word in words if word not in STOPWORDS and word.strip("'"))
+
+
+# A near-duplicate may not differ in any of these: "no sparks" is not "sparks", and
+# "smell gas" is not "smell smoke"
+NEGATIONS = frozenset("""
+no not never none nothing without don't dont doesn't doesnt didn't didnt isn't isnt
+wasn't wasnt can't cant cannot won't wont aren't arent haven't havent
+""".split())
+SAFETY_TERMS = frozenset(_stem(word) for word in """
+gas propane spark smoke fire flame burning smell odor fumes carbon monoxide shock
+electrocuted flood flooding overflowing sewage mold hot melting sizzling buzzing
+collapse cracked sagging emergency danger injured child baby
+""".split())
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of parsed AI answers, by (kind, category, token set).
+
+    get() first tries the exact normalized key, then (for FUZZY_KINDS only)
+    the most similar entry of the same kind and category whose token-set
+    Jaccard similarity is at least `similarity` and which does not differ
+    in a negation or safety term. Entries are saved to a JSON file at most every
+    save_seconds (merged with what other workers wrote) and loaded on start.
+    """
+
+    def __init__(self, maxsize=2000, ttl=7 * 86400, similarity=0.8, path=None, save_seconds=60):
+        self.similarity = similarity
+        self.path = path
+        self.save_seconds = save_seconds
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)  # key -> (tokens, value, expires epoch)
+        self._buckets = {}  # (kind, category) -> {key: tokens}, to scan for near-duplicates
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._exit_hook = False
+        self.reset_stats()
+
+    def configure(self, config):
+        self.similarity = config.get('RESPONSE_CACHE_SIMILARITY', 0.8)
+        self.path = config.get('RESPONSE_CACHE_PATH') or None
+        self.save_seconds = config.get('RESPONSE_CACHE_SAVE_SECONDS', 60)
+        self._entries = TTLCache(
+            maxsize=config.get('RESPONSE_CACHE_MAX_ENTRIES', 2000),
+            ttl=config.get('RESPONSE_CACHE_TTL_SECONDS', 7 * 86400)
+        )
+        with self._lock:
+            self._buckets = {}
+        self.reset_stats()
+        if self.path:
+            self.load()
+            if not self._exit_hook:
+                atexit.register(self.save)
+                self._exit_hook = True
+
+    def reset_stats(self):
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _key(kind, category, tokens):
+        return f"{kind}|{category}|{' '.join(sorted(tokens))}"
+
+    def get(self, kind, category, text):
+        """The cached answer for this text or a near-duplicate of it, or None"""
+        tokens = normalize(text)
+        if not tokens:
+            self.misses += 1
+            return None
+
+        entry = self._entries.get(self._key(kind, category, tokens))
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        if kind in FUZZY_KINDS and len(tokens) >= MIN_SIMILAR_TOKENS:
+            best_key, best_score = None, self.similarity
+            with self._lock:
+                bucket = self._buckets.get((kind, category), {})
+                for key, candidate in list(bucket.items()):
+                    if key not in self._entries:
+                        del bucket[key]  # evicted or expired
+                        continue
+                    score = jaccard(tokens, candidate)
+                    if score >= best_score and not differs_in_safety(tokens, candidate):
+                        best_key, best_score = key, score
+            entry = self._entries.get(best_key) if best_key else None
+            if entry is not None:
+                self.similar_hits += 1
+                return entry[1]
+
+        self.misses += 1
+        return None
+
+    def set(self, kind, category, text, value):
+        """Cache a (JSON-serializable) answer for this text"""
+        tokens = normalize(text)
+        if not tokens:
+            return
+        ttl = self._entries.ttl
+        self._store(kind, category, tokens, value, time.time() + ttl if ttl else None)
+        self.stores += 1
+        self._save_if_due()
+
+    def _store(self, kind, category, tokens, value, expires_at):
+        key = self._key(kind, category, tokens)
+        self._entries.set(key, (tokens, value, expires_at), ttl=expires_at - time.time() if expires_at else 0)
+        with self._lock:
+            if kind in FUZZY_KINDS:
+                self._buckets.setdefault((kind, category), {})[key] = tokens
+            self._dirty = True
+
+    def _save_if_due(self):
+        if self.path and self._dirty and time.monotonic() - self._saved_at >= self.save_seconds:
+            try:
+                self.save()
+            except OSError:
+                pass  # retried on the next store and at exit
+
+    def _read_file(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('entries', [])
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def load(self):
+        """Add the unexpired entries of the cache file"""
+        loaded = 0
+        now = time.time()
+        for item in self._read_file():
+            expires_at = item.get('expires_at')
+            if expires_at is not None and expires_at <= now:
+                continue
+            kind, category, words = item['key'].split('|', 2)
+            self._store(kind, category, frozenset(words.split()), item['value'], expires_at)
+            loaded += 1
+        with self._lock:
+            self._dirty = False
+        return loaded
+
+    def save(self):
+        """Write the cache file (if anything was stored since), keeping entries other workers added"""
+        if not self.path or not self._dirty:
+            return
+        now = time.time()
+        ours = {key: {'key': key, 'value': value, 'expires_at': expires_at}
+                for key, (tokens, value, expires_at) in self._entries.items()}
+        for item in self._read_file():
+            if item['key'] not in ours and (item.get('expires_at') is None or item['expires_at'] > now):
+                ours[item['key']] = item
+        entries = sorted(ours.values(), key=lambda item: item.get('expires_at') or float('inf'))
+        entries = entries[-self._entries.maxsize:]
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        partial = f'{self.path}.{os.getpid()}.partial'
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'entries': entries}, f)
+        os.replace(partial, self.path)
+        with self._lock:
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def stats(self):
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'maxsize': self._entries.maxsize,
+            'similarity': self.similarity,
+            'hits': self.hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self._entries.evictions,
+            'hit_rate': round((self.hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            'persisted_to': self.path
+        }
+
+
+# Initialize a global response cache
+response_cache = ResponseCache()
+
+
+def configure_response_cache(app):
+    """Apply the RESPONSE_CACHE_* settings and load the cache file"""
+    response_cache.configure(app.config)
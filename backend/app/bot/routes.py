@@ -5,17 +5,18 @@ from app.models.chat_session import ChatSession, ChatMessage
 from app.models.user import User
 from app.bot.gemini_service import get_gemini_service, GeminiChatService
 from app.bot.conversation_flow import ConversationFlow, ConversationStage, ServiceCategory
-from app.utils.decorators import get_user_id_from_jwt
+from app.bot.flow_store import flow_store
+from app.bot.llm_client import llm_client, LLMError, LLMTimeout, LLMBusy, LLMRateLimited
+from app.bot.response_cache import response_cache
+from app.utils.decorators import get_user_id_from_jwt, admin_required
 from datetime import datetime
 import os
 import json
 
 bot_bp = Blueprint('bot', __name__)
 
-# Store active chat instances per session
-_active_chats = {}
-# Store conversation flows per session
-_conversation_flows = {}
+# Diagnosis flows live in flow_store, shared between workers; chat history is
+# replayed from the ChatSession on every message
 
 
 def get_user_or_404(user_id):
@@ -51,8 +52,7 @@ def start_diagnosis():
         db.session.flush()
         
         # Create conversation flow
-        flow = ConversationFlow(user_id, session.id)
-        _conversation_flows[session.id] = flow
+        flow = flow_store.create(user_id, session.id)
         
         # Get greeting
         greeting = flow.get_greeting_message()
@@ -91,11 +91,9 @@ def get_categories(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         # Get or create flow
-        if session_id not in _conversation_flows:
-            _conversation_flows[session_id] = ConversationFlow(user_id, session_id)
-        
-        flow = _conversation_flows[session_id]
+        flow = flow_store.get_or_create(user_id, session_id)
         category_options = flow.get_category_options()
+        db.session.commit()
         
         return jsonify({
             'success': True,
@@ -132,16 +130,15 @@ def set_category(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         # Get or create flow
-        if session_id not in _conversation_flows:
-            _conversation_flows[session_id] = ConversationFlow(user_id, session_id)
-        
-        flow = _conversation_flows[session_id]
+        flow = flow_store.get_or_create(user_id, session_id)
         result = flow.set_category(data.get('category'))
         
         if 'error' in result:
+            db.session.commit()
             return jsonify(result), 400
         
         # Save to session
+        flow_store.save(flow)
         session.add_message('user', f"I need help with: {data.get('category')}")
         session.add_message('assistant', result['message'])
         db.session.commit()
@@ -182,13 +179,14 @@ def set_problem(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         # Get flow
-        if session_id not in _conversation_flows:
+        flow = flow_store.get(session_id)
+        if flow is None:
             return jsonify({'error': 'Session not initialized'}), 400
         
-        flow = _conversation_flows[session_id]
         result = flow.set_problem_description(data.get('description'))
         
         # Save to session
+        flow_store.save(flow)
         session.add_message('user', data.get('description'))
         session.add_message('assistant', result['message'])
         db.session.commit()
@@ -229,13 +227,14 @@ def analyze_situation(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         # Get flow
-        if session_id not in _conversation_flows:
+        flow = flow_store.get(session_id)
+        if flow is None:
             return jsonify({'error': 'Session not initialized'}), 400
         
-        flow = _conversation_flows[session_id]
         analysis = flow.set_detailed_situation(data.get('details'))
         
         # Save to session
+        flow_store.save(flow)
         session.add_message('user', data.get('details'))
         
         # Create analysis message
@@ -289,14 +288,15 @@ def get_recommendation(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         # Get flow
-        if session_id not in _conversation_flows:
+        flow = flow_store.get(session_id)
+        if flow is None:
             return jsonify({'error': 'Session not initialized'}), 400
         
-        flow = _conversation_flows[session_id]
         recommendation = flow.get_recommendation()
         offer = flow.get_provider_offer()
         
         # Save to session
+        flow_store.save(flow)
         session.add_message('assistant', recommendation['message'])
         session.add_message('assistant', offer['message'])
         db.session.commit()
@@ -337,14 +337,10 @@ def ask_question(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         # Get flow context
-        if session_id not in _conversation_flows:
+        flow = flow_store.get(session_id)
+        if flow is None:
             return jsonify({'error': 'Session not initialized'}), 400
         
-        flow = _conversation_flows[session_id]
-        
-        # Use AI to answer with context
-        gemini_service = get_gemini_service()
-        
         # Create context-aware prompt
         context_prompt = f"""You are QuickFix AI Assistant helping with a {flow.service_category} issue.
 
@@ -357,7 +353,20 @@ User's question: {question}
 Provide a helpful, concise answer (2-3 sentences) based on the context. Be friendly and professional. 
 If the question is about pricing, timing, or finding providers, mention that they can hire a verified professional through the QuickFix platform."""
 
-        response_text = gemini_service.get_quick_response(context_prompt)
+        try:
+            response_text = llm_client.generate(context_prompt)
+        except LLMTimeout as e:
+            return jsonify({'success': False, 'error': str(e)}), 504
+        except LLMRateLimited as e:
+            response = jsonify({'success': False, 'error': str(e)})
+            response.headers['Retry-After'] = str(int(e.retry_after or 5))
+            return response, 429
+        except LLMBusy as e:
+            response = jsonify({'success': False, 'error': str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        except LLMError as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
         
         # Save to session
         session.add_message('user', question)
@@ -396,6 +405,25 @@ def health_check():
         }), 503
 
 
+@bot_bp.route('/response-cache', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_response_cache_stats():
+    """Get diagnosis response cache size and hit rates (this process)"""
+    return jsonify(response_cache.stats()), 200
+
+
+@bot_bp.route('/rate-limit', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_rate_limit_stats():
+    """Get model rate budget, queue depth and wait times per priority (this process)"""
+    return jsonify({
+        'rate_limiter': llm_client.rate_limiter.stats(),
+        'llm_client': llm_client.stats()
+    }), 200
+
+
 @bot_bp.route('/sessions', methods=['GET'])
 @jwt_required()
 def get_sessions():
@@ -517,13 +545,11 @@ def send_message(session_id):
                 'details': str(e)
             }), 503
         
-        # Start or get existing chat
-        if session_id not in _active_chats:
-            chat_instance = gemini_service.start_chat()
-            _active_chats[session_id] = chat_instance
-        
-        # Send message to Gemini
-        response_data = gemini_service.send_message(user_message)
+        # Send message to Gemini with this session's earlier turns
+        response_data = gemini_service.send_message(
+            user_message,
+            history=session.get_conversation_history()
+        )
         
         if not response_data['success']:
             return jsonify({
@@ -583,9 +609,8 @@ def delete_session(session_id):
         # Soft delete
         session.is_active = False
         
-        # Clear from active chats cache
-        if session_id in _active_chats:
-            del _active_chats[session_id]
+        # Drop the diagnosis flow
+        flow_store.delete(session_id)
         
         db.session.commit()
         
@@ -618,6 +643,17 @@ def quick_response():
             'success': True,
             'response': response
         }), 200
+    except LLMTimeout as e:
+        return jsonify({'success': False, 'error': str(e)}), 504
+    except LLMRateLimited as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = str(int(e.retry_after or 5))
+        return response, 429
+    except LLMBusy as e:
+        # After LLMRateLimited, which is a kind of LLMBusy
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except ValueError as e:
         return jsonify({
             'error': 'Gemini API is not configured',
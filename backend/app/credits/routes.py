@@ -1,17 +1,17 @@
 from flask import request, jsonify
 from app.credits import credits_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
 from app.models.user import User
 from app.models.customer import Customer
+from app.utils.current_user import load_current_user
 
 
 @credits_bp.route('/balance', methods=['GET'])
 @jwt_required()
 def get_balance():
     """Get current customer credit balance"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -31,8 +31,7 @@ def get_balance():
 @jwt_required()
 def purchase_credits():
     """Purchase credits using bank transfer (simulated)"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -3,3 +3,4 @@ from flask import Blueprint
 emergency_bp = Blueprint('emergency', __name__)
 
 from app.emergency import routes
+from app.emergency import socketio_handlers
@@ -0,0 +1,253 @@
+"""
+Emergency Dispatcher
+Nearest-first wave broadcasting of new emergency jobs to online providers
+"""
+import threading
+import time
+from collections import deque
+import numpy as np
+from flask import current_app
+from extensions import db, socketio
+from app.providers.geo_index import get_provider_geo_index
+from app.providers.scoring import batch_haversine
+from app.utils.db_offload import run_db_task
+
+
+class Dispatch:
+    """Progress of one emergency job through its waves"""
+
+    def __init__(self, job_id, category, latitude, longitude):
+        self.job_id = job_id
+        self.category = category
+        self.latitude = latitude
+        self.longitude = longitude
+        self.started_at = time.monotonic()
+        self.first_wave_at = None
+        self.waves = 0
+        self.notified = {}  # provider_id -> wave number (1-based)
+        self.accepted = threading.Event()
+        self.accepted_at = None
+        self.accepted_wave = None
+
+    @property
+    def located(self):
+        return self.latitude is not None and self.longitude is not None
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0, 'avg': None, 'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'avg': round(sum(ordered) / len(ordered), 2),
+        'p50': round(ordered[len(ordered) // 2], 2),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max': round(ordered[-1], 2)
+    }
+
+
+class DispatchMetrics:
+    """Counters and recent samples of dispatch latency, waves and time-to-accept"""
+
+    def __init__(self, history=1000):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.accepted = 0
+        self.expired = 0
+        self.closed = 0
+        self._dispatch_latency_ms = deque(maxlen=history)
+        self._time_to_accept_s = deque(maxlen=history)
+        self._waves = deque(maxlen=history)
+        self._notified = deque(maxlen=history)
+        self._accepted_wave = deque(maxlen=history)
+
+    def record_start(self, dispatch):
+        with self._lock:
+            self.started += 1
+            self._dispatch_latency_ms.append((dispatch.first_wave_at - dispatch.started_at) * 1000)
+
+    def record_finish(self, dispatch, outcome):
+        with self._lock:
+            if outcome == 'accepted':
+                self.accepted += 1
+                self._time_to_accept_s.append(dispatch.accepted_at - dispatch.started_at)
+                if dispatch.accepted_wave is not None:
+                    self._accepted_wave.append(dispatch.accepted_wave)
+            elif outcome == 'expired':
+                self.expired += 1
+            else:
+                self.closed += 1
+            self._waves.append(dispatch.waves)
+            self._notified.append(len(dispatch.notified))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'dispatches_started': self.started,
+                'accepted': self.accepted,
+                'expired': self.expired,
+                'closed': self.closed,
+                'dispatch_latency_ms': _summary(list(self._dispatch_latency_ms)),
+                'time_to_accept_seconds': _summary(list(self._time_to_accept_s)),
+                'waves_per_dispatch': _summary(list(self._waves)),
+                'providers_notified_per_dispatch': _summary(list(self._notified)),
+                'accepted_in_wave': _summary(list(self._accepted_wave))
+            }
+
+
+def _emergency_providers(category):
+    """Get [(provider_id, user_id)] of emergency-active, available providers in a category"""
+    from app.models.provider import Provider
+
+    return db.session.query(Provider.id, Provider.user_id).filter(
+        Provider.category == category,
+        Provider.emergency_active.is_(True),
+        Provider.is_available.is_(True)
+    ).all()
+
+
+def provider_room(user_id):
+    """Socket.IO room of every connection of a provider user, on any worker"""
+    return f'provider_{user_id}'
+
+
+def notify_emergency_providers(category, event, data):
+    """Emit to every emergency-active, available provider in a category"""
+    for _, user_id in _emergency_providers(category):
+        socketio.emit(event, data, room=provider_room(user_id))
+
+
+def _job_is_open(job_id):
+    from app.models.job import Job
+
+    row = db.session.query(Job.status, Job.provider_id).filter(Job.id == job_id).first()
+    return row is not None and row.status == 'OPEN' and row.provider_id is None
+
+
+class EmergencyDispatcher:
+    """
+    Sends a new emergency job to the nearest online providers first.
+
+    Wave n reaches the next wave_size * 2**(n-1) providers by distance (from
+    their latest location in the provider geo index); if nobody accepts
+    within the wave timeout the next, wider wave goes out. The last wave
+    reaches every remaining listening provider, as do jobs without
+    coordinates. Providers who turn emergency service on during a dispatch
+    join the following waves.
+
+    Candidates are the emergency-active, available providers of the category
+    in the database, with one worker or several: each is notified in its
+    provider_{user_id} room, which the message queue (SOCKETIO_MESSAGE_QUEUE)
+    delivers on whichever worker holds its sockets.
+    """
+
+    def __init__(self):
+        self._active = {}  # job_id -> Dispatch
+        self._lock = threading.Lock()
+        self.metrics = DispatchMetrics()
+
+    def _rank(self, dispatch):
+        """Get [(provider_id, user_id, distance_km or None)] not yet notified, nearest first"""
+        candidates = dict(run_db_task(_emergency_providers, dispatch.category))
+        listening = {
+            provider_id: user_id
+            for provider_id, user_id in candidates.items()
+            if provider_id not in dispatch.notified
+        }
+        if not listening:
+            return []
+        if not dispatch.located:
+            return [(provider_id, user_id, None) for provider_id, user_id in sorted(listening.items())]
+
+        index = get_provider_geo_index()
+        located, unlocated = [], []
+        for provider_id in sorted(listening):
+            position = index.get_position(provider_id)
+            (located if position else unlocated).append((provider_id, position))
+
+        ranked = []
+        if located:
+            ids = [provider_id for provider_id, _ in located]
+            lats = np.array([position[0] for _, position in located])
+            lngs = np.array([position[1] for _, position in located])
+            distances = batch_haversine(dispatch.latitude, dispatch.longitude, lats, lngs)
+            for i in np.argsort(distances, kind='stable'):
+                ranked.append((ids[i], listening[ids[i]], round(float(distances[i]), 2)))
+        # Providers without a known position go after everyone who has one
+        ranked.extend((provider_id, listening[provider_id], None) for provider_id, _ in unlocated)
+        return ranked
+
+    def _send_wave(self, dispatch, job_data, targets):
+        dispatch.waves += 1
+        for provider_id, user_id, distance_km in targets:
+            dispatch.notified[provider_id] = dispatch.waves
+            socketio.emit('emergency_job_created', {
+                **job_data,
+                'distance_km': distance_km,
+                'dispatch_wave': dispatch.waves
+            }, room=provider_room(user_id))
+
+    def _run(self, app, dispatch, job_data, wave_size, wave_timeout, max_waves):
+        with app.app_context():
+            try:
+                outcome = 'expired'
+                for wave in range(1, max_waves + 1):
+                    ranked = self._rank(dispatch)
+                    last_wave = wave == max_waves or not dispatch.located
+                    targets = ranked if last_wave else ranked[:wave_size * 2 ** (wave - 1)]
+                    self._send_wave(dispatch, job_data, targets)
+                    if dispatch.first_wave_at is None:
+                        dispatch.first_wave_at = time.monotonic()
+                        self.metrics.record_start(dispatch)
+
+                    if dispatch.accepted.wait(wave_timeout):
+                        break
+                    # Accepted through another worker, or cancelled
+                    if not run_db_task(_job_is_open, dispatch.job_id):
+                        outcome = 'closed'
+                        break
+                    if last_wave:
+                        break
+                if dispatch.accepted.is_set():
+                    outcome = 'accepted'
+                self.metrics.record_finish(dispatch, outcome)
+            finally:
+                with self._lock:
+                    self._active.pop(dispatch.job_id, None)
+
+    def dispatch(self, job_data):
+        """Start the wave broadcast of a newly created emergency job in the background"""
+        config = current_app.config
+        dispatch = Dispatch(job_data['id'], job_data['category'], job_data.get('latitude'), job_data.get('longitude'))
+        with self._lock:
+            self._active[dispatch.job_id] = dispatch
+        socketio.start_background_task(
+            self._run,
+            current_app._get_current_object(),
+            dispatch,
+            job_data,
+            config.get('EMERGENCY_WAVE_SIZE', 5),
+            config.get('EMERGENCY_WAVE_TIMEOUT_SECONDS', 20),
+            max(1, config.get('EMERGENCY_MAX_WAVES', 3))
+        )
+        return dispatch
+
+    def record_accept(self, job_id, provider_id):
+        """Stop the job's dispatch and record its time-to-accept"""
+        with self._lock:
+            dispatch = self._active.get(job_id)
+        if dispatch is None or dispatch.accepted.is_set():
+            return
+        dispatch.accepted_at = time.monotonic()
+        dispatch.accepted_wave = dispatch.notified.get(provider_id)
+        dispatch.accepted.set()
+
+    def stats(self):
+        with self._lock:
+            active = len(self._active)
+        return {'active_dispatches': active, **self.metrics.snapshot()}
+
+
+# Initialize a global dispatcher instance
+emergency_dispatcher = EmergencyDispatcher()
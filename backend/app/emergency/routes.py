@@ -1,16 +1,18 @@
 from flask import request, jsonify
 from app.emergency import emergency_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db, socketio
+from flask_jwt_extended import jwt_required
+from extensions import db
 from datetime import datetime
-from app.models.user import User
 from app.models.customer import Customer
 from app.models.provider import Provider
 from app.models.job import Job
 from app.models.booking import Booking
 from app.models.provider_credit_transaction import ProviderCreditTransaction
-from app.models.credit_transaction import CreditTransaction
-from app.utils.decorators import customer_required, provider_required
+from app.utils.decorators import customer_required, provider_required, admin_required
+from app.utils.current_user import load_current_user
+from app.admin.stats import invalidate_stats
+from app.jobs import claims
+from app.emergency.dispatcher import emergency_dispatcher, notify_emergency_providers
 
 
 # Customer Emergency Service Routes
@@ -19,8 +21,7 @@ from app.utils.decorators import customer_required, provider_required
 @customer_required
 def create_emergency_job():
     """Create an emergency job request"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.customer:
         return jsonify({'error': 'Customer profile not found'}), 404
@@ -51,21 +52,12 @@ def create_emergency_job():
         )
         db.session.add(job)
         db.session.commit()
-        
-        # Broadcast to matching providers via WebSocket
-        # CRITICAL: Only send to providers who are available AND have emergency active
-        matching_providers = Provider.query.filter_by(
-            category=data['category'],
-            emergency_active=True,
-            is_available=True
-        ).all()
+        invalidate_stats()
         
         job_data = job.to_dict(include_customer=True)
         
-        # Emit to each matching provider (use user_id for room)
-        for provider in matching_providers:
-            room = f'provider_{provider.user_id}'
-            socketio.emit('emergency_job_created', job_data, room=room)
+        # Notify online emergency providers in the category, nearest first, in waves
+        emergency_dispatcher.dispatch(job_data)
         
         return jsonify({
             'message': 'Emergency job created successfully',
@@ -83,8 +75,7 @@ def create_emergency_job():
 @provider_required
 def toggle_emergency():
     """Toggle emergency service activation"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -108,8 +99,7 @@ def toggle_emergency():
 @provider_required
 def get_emergency_requests():
     """Get emergency job requests for provider (only if emergency_active=true and category matches)"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -146,9 +136,8 @@ def get_emergency_requests():
 @jwt_required()
 @provider_required
 def accept_emergency_job(job_id):
-    """Accept an emergency job (atomic, first-accept-wins)"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    """Accept an emergency job (compare-and-swap, first-accept-wins)"""
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -159,128 +148,37 @@ def accept_emergency_job(job_id):
     if not provider.emergency_active:
         return jsonify({'error': 'Emergency service is not active'}), 400
     
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Verify it's an emergency job
+    if not job.is_emergency:
+        return jsonify({'error': 'This is not an emergency job'}), 400
+    
+    # Verify category matches
+    if job.category != provider.category:
+        return jsonify({'error': 'Job category does not match your category'}), 403
+    
+    if not job.offered_price or job.offered_price <= 0:
+        return jsonify({'error': 'Job has no valid offered price'}), 400
+    
     try:
-        # Use database lock to ensure atomicity - lock job, customer, and provider
-        job = db.session.query(Job).filter_by(id=job_id).with_for_update().first()
-        provider_locked = db.session.query(Provider).filter_by(id=provider.id).with_for_update().first()
-        
-        if not job:
-            return jsonify({'error': 'Job not found'}), 404
-        
-        # Get customer and lock for update
-        customer_locked = db.session.query(Customer).filter_by(id=job.customer_id).with_for_update().first()
-        if not customer_locked:
-            return jsonify({'error': 'Customer not found'}), 404
-        
-        # Verify it's an emergency job
-        if not job.is_emergency:
-            return jsonify({'error': 'This is not an emergency job'}), 400
-        
-        # Verify category matches
-        if job.category != provider.category:
-            return jsonify({'error': 'Job category does not match your category'}), 403
-        
-        # Check if job is still OPEN
-        if job.status != 'OPEN':
-            return jsonify({
-                'error': 'Job is no longer available',
-                'status': job.status
-            }), 400
-        
-        # Check if job already has a provider (double-check)
-        if job.provider_id is not None:
-            return jsonify({'error': 'Job has already been accepted by another provider'}), 409
-        
-        # Calculate emergency credit cost (5% of offered price)
-        if not job.offered_price or job.offered_price <= 0:
-            return jsonify({'error': 'Job has no valid offered price'}), 400
-        
-        emergency_credit_cost = job.offered_price * 0.05
-        
-        # Check if customer has sufficient credits (CRITICAL - must check before accepting)
-        if customer_locked.credits < emergency_credit_cost:
-            return jsonify({
-                'error': 'CUSTOMER_INSUFFICIENT_CREDITS',
-                'message': f'Customer has insufficient credits. Required: {emergency_credit_cost:.2f}, Available: {customer_locked.credits:.2f}',
-                'required_credits': emergency_credit_cost,
-                'available_credits': customer_locked.credits
-            }), 400
-        
-        # ATOMIC TRANSACTION: Deduct from customer and add to provider
-        # Convert to int for customer credits (customer.credits is Integer)
-        emergency_credit_cost_int = int(round(emergency_credit_cost))
-        
-        # Deduct credits from customer
-        customer_locked.credits -= emergency_credit_cost_int
-        
-        # Ensure customer credits never go negative (safety check)
-        if customer_locked.credits < 0:
-            customer_locked.credits = 0
-        
-        # Add credits to provider (same amount)
-        provider_locked.credits += emergency_credit_cost
-        
-        # Accept the job atomically
-        job.status = 'ACCEPTED'
-        job.provider_id = provider.id
-        job.price = job.offered_price
-        
-        # Create booking
-        booking = Booking(
-            job_id=job.id,
-            customer_id=job.customer_id,
-            provider_id=provider.id,
-            price=job.offered_price or 0.0,
-            status='confirmed'
-        )
-        db.session.add(booking)
-        
-        # Create customer credit transaction record (deduction)
-        customer_transaction = CreditTransaction(
-            customer_id=job.customer_id,
-            transaction_type='emergency_service_fee',
-            amount=-emergency_credit_cost_int,  # Negative for deduction
-            description=f'Emergency service fee (5% of ${job.offered_price:.2f})',
-            provider_id=provider.id,
-            job_id=job.id
-        )
-        db.session.add(customer_transaction)
-        
-        # Create provider credit transaction record (earning)
-        provider_transaction = ProviderCreditTransaction(
-            provider_id=provider.id,
-            job_id=job.id,
-            transaction_type='emergency_service_earning',
-            amount=emergency_credit_cost,  # Positive for earning
-            status='completed',
-            description=f'Emergency service earning (5% of ${job.offered_price:.2f})'
-        )
-        db.session.add(provider_transaction)
-        
-        db.session.commit()
-        
-        # Refresh provider and customer to get updated credits
-        db.session.refresh(provider_locked)
-        db.session.refresh(customer_locked)
-        
-        # Broadcast to all matching providers that job was accepted
-        # CRITICAL: Only notify available providers with emergency active
-        matching_providers = Provider.query.filter_by(
-            category=job.category,
-            emergency_active=True,
-            is_available=True
-        ).all()
+        # Compare-and-swap accept (first accept wins), then move the fee in the same transaction
+        booking, emergency_credit_cost = claims.accept_emergency_job(job, provider.id)
         
+        emergency_dispatcher.record_accept(job.id, provider.id)
         job_data = job.to_dict(include_customer=True)
-        
-        # Emit to each matching provider (they should remove it from their list)
-        for matching_provider in matching_providers:
-            room = f'provider_{matching_provider.user_id}'
-            socketio.emit('emergency_job_accepted', {
-                'job_id': job.id,
-                'accepted_by_provider_id': provider.id,
-                'job': job_data
-            }, room=room)
+        customer_credits = db.session.query(Customer.credits).filter_by(id=job.customer_id).scalar()
+        provider_credits = db.session.query(Provider.credits).filter_by(id=provider.id).scalar()
+        
+        # Notify all matching providers that job was accepted, the same way
+        # the dispatcher sent it (they should remove it from their list)
+        notify_emergency_providers(job.category, 'emergency_job_accepted', {
+            'job_id': job.id,
+            'accepted_by_provider_id': provider.id,
+            'job': job_data
+        })
         
         return jsonify({
             'message': 'Emergency job accepted successfully',
@@ -288,11 +186,14 @@ def accept_emergency_job(job_id):
             'booking': booking.to_dict(),
             'emergency_credit_cost': emergency_credit_cost,
             'customer_credits_deducted': emergency_credit_cost,
-            'customer_remaining_credits': customer_locked.credits,
+            'customer_remaining_credits': customer_credits,
             'provider_credits_earned': emergency_credit_cost,
-            'provider_remaining_credits': provider_locked.credits
+            'provider_remaining_credits': provider_credits
         }), 200
     
+    except claims.ClaimError as e:
+        return jsonify(e.payload), e.status_code
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -303,8 +204,7 @@ def accept_emergency_job(job_id):
 @provider_required
 def get_emergency_jobs():
     """Get provider's accepted emergency jobs"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -342,3 +242,13 @@ def get_emergency_jobs():
         'jobs': jobs_data,
         'count': len(jobs_data)
     }), 200
+
+
+@emergency_bp.route('/dispatch/metrics', methods=['GET'], endpoint='get_dispatch_metrics')
+@jwt_required()
+@admin_required
+def get_dispatch_metrics():
+    """Get emergency dispatch latency, wave and time-to-accept metrics (this process)"""
+    return jsonify({
+        'dispatch': emergency_dispatcher.stats()
+    }), 200
@@ -0,0 +1,153 @@
+"""
+Optimistic (compare-and-swap) job acceptance
+SQLite ignores SELECT ... FOR UPDATE, so a job is claimed with a conditional UPDATE
+and exactly one of any number of concurrent accepts sees a row count of 1
+"""
+import random
+import time
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from extensions import db
+from app.models.customer import Customer
+from app.models.provider import Provider
+from app.models.job import Job
+from app.models.booking import Booking
+from app.models.saved_job import SavedJob
+from app.models.credit_transaction import CreditTransaction
+from app.models.provider_credit_transaction import ProviderCreditTransaction
+from app.admin.stats import invalidate_stats
+
+EMERGENCY_FEE_RATE = 0.05  # 5% of the offered price moves from customer to provider credits
+
+
+class ClaimError(Exception):
+    """An accept that cannot go through, with the JSON body and status to return"""
+
+    def __init__(self, status_code, error, **details):
+        super().__init__(error)
+        self.status_code = status_code
+        self.payload = {'error': error, **details}
+
+
+def _is_lock_error(error):
+    message = str(error.orig).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def run_claim(func, *args, **kwargs):
+    """
+    Run an accept transaction, retrying with jittered backoff when SQLite
+    reports the database as locked. Each attempt starts with the job claim,
+    so a retried attempt either wins the job again or loses it; credits
+    can never move twice for one job.
+    """
+    retries = current_app.config.get('JOB_CLAIM_RETRIES', 5)
+    delay = current_app.config.get('JOB_CLAIM_RETRY_DELAY', 0.05)
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except ClaimError:
+            db.session.rollback()
+            raise
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_error(e) or attempt == retries:
+                raise
+            time.sleep(delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _claim(job, provider_id):
+    """Claim the job or raise the ClaimError explaining why another accept won"""
+    if Job.claim(job.id, provider_id):
+        return
+    db.session.rollback()
+    status = db.session.query(Job.status).filter_by(id=job.id).scalar()
+    if status != 'OPEN':
+        raise ClaimError(400, 'Job is no longer available', status=status)
+    raise ClaimError(409, 'Job has already been accepted by another provider')
+
+
+def _accept_job(job, provider_id):
+    _claim(job, provider_id)
+
+    booking = Booking(
+        job_id=job.id,
+        customer_id=job.customer_id,
+        provider_id=provider_id,
+        price=job.offered_price or 0.0,
+        status='confirmed',
+        scheduled_at=job.preferred_date
+    )
+    db.session.add(booking)
+
+    # Remove from saved jobs if it was saved
+    SavedJob.query.filter_by(
+        provider_id=provider_id,
+        service_request_id=job.id
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    invalidate_stats(provider_id)
+    return booking
+
+
+def accept_job(job, provider_id):
+    """Accept an OPEN job for a provider; returns the new booking"""
+    return run_claim(_accept_job, job, provider_id)
+
+
+def _accept_emergency_job(job, provider_id):
+    fee = job.offered_price * EMERGENCY_FEE_RATE
+    fee_credits = int(round(fee))  # customer credits are whole numbers
+
+    _claim(job, provider_id)
+
+    # Conditional deduction: the balance is checked and charged in one statement
+    if not Customer.spend_credits(job.customer_id, fee_credits, required=fee):
+        db.session.rollback()
+        available = db.session.query(Customer.credits).filter_by(id=job.customer_id).scalar()
+        raise ClaimError(
+            400, 'CUSTOMER_INSUFFICIENT_CREDITS',
+            message=f'Customer has insufficient credits. Required: {fee:.2f}, Available: {available:.2f}',
+            required_credits=fee,
+            available_credits=available
+        )
+    Provider.add_credits(provider_id, fee)
+
+    booking = Booking(
+        job_id=job.id,
+        customer_id=job.customer_id,
+        provider_id=provider_id,
+        price=job.offered_price or 0.0,
+        status='confirmed'
+    )
+    db.session.add(booking)
+
+    db.session.add(CreditTransaction(
+        customer_id=job.customer_id,
+        transaction_type='emergency_service_fee',
+        amount=-fee_credits,  # Negative for deduction
+        description=f'Emergency service fee (5% of ${job.offered_price:.2f})',
+        provider_id=provider_id,
+        job_id=job.id
+    ))
+    db.session.add(ProviderCreditTransaction(
+        provider_id=provider_id,
+        job_id=job.id,
+        transaction_type='emergency_service_earning',
+        amount=fee,  # Positive for earning
+        status='completed',
+        description=f'Emergency service earning (5% of ${job.offered_price:.2f})'
+    ))
+
+    db.session.commit()
+    invalidate_stats(provider_id)
+    return booking, fee
+
+
+def accept_emergency_job(job, provider_id):
+    """
+    Accept an OPEN emergency job and move the service fee from the customer's
+    credits to the provider's in the same transaction; returns (booking, fee)
+    """
+    return run_claim(_accept_emergency_job, job, provider_id)
@@ -1,9 +1,13 @@
 from flask import request, jsonify
 from app.jobs import jobs_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
 from datetime import datetime
-from app.models.user import User
+from collections import defaultdict
+import math
+import numpy as np
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import joinedload
 from app.models.customer import Customer
 from app.models.provider import Provider
 from app.models.job import Job
@@ -11,6 +15,40 @@ from app.models.offer import Offer
 from app.models.booking import Booking
 from app.models.saved_job import SavedJob
 from app.utils.decorators import customer_required, provider_required
+from app.utils.pagination import encode_cursor, decode_cursor, parse_cursor_datetime, get_page_size, InvalidCursor
+from app.utils.current_user import load_current_user
+from app.admin.stats import invalidate_stats
+from app.providers.geo_index import KM_PER_DEGREE
+from app.providers.scoring import batch_haversine
+from app.jobs import claims
+
+# Distance-filtered job board pages scan at most this many rows per request
+OPEN_JOBS_MAX_SCAN = 500
+
+
+def load_offers_by_job(job_ids):
+    """Load offers and their providers for many jobs in one query, grouped by job id"""
+    offers_by_job = defaultdict(list)
+    if not job_ids:
+        return offers_by_job
+    
+    offers = Offer.query.options(joinedload(Offer.provider)).filter(
+        Offer.job_id.in_(job_ids)
+    ).order_by(Offer.id).all()
+    for offer in offers:
+        offers_by_job[offer.job_id].append(offer)
+    return offers_by_job
+
+
+def load_offer_summaries(job_ids):
+    """Get {job_id: (offer_count, best_price)} with a single GROUP BY query"""
+    if not job_ids:
+        return {}
+    
+    rows = db.session.query(
+        Offer.job_id, func.count(Offer.id), func.min(Offer.price)
+    ).filter(Offer.job_id.in_(job_ids)).group_by(Offer.job_id).all()
+    return {job_id: (count, best_price) for job_id, count, best_price in rows}
 
 
 # Customer service request routes
@@ -19,8 +57,7 @@ from app.utils.decorators import customer_required, provider_required
 @customer_required
 def create_service_request():
     """Create a new service request"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.customer:
         return jsonify({'error': 'Customer profile not found'}), 404
@@ -56,6 +93,7 @@ def create_service_request():
         )
         db.session.add(job)
         db.session.commit()
+        invalidate_stats()
         
         return jsonify({
             'message': 'Service request created successfully',
@@ -72,22 +110,35 @@ def create_service_request():
 @customer_required
 def get_my_requests():
     """Get customer's service requests"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.customer:
         return jsonify({'error': 'Customer profile not found'}), 404
     
+    include_offers = request.args.get('include_offers', 'full')  # full or summary
+    
     requests = Job.query.filter_by(customer_id=user.customer.id).order_by(Job.created_at.desc()).all()
+    job_ids = [req.id for req in requests]
     
     requests_data = []
-    for req in requests:
-        req_data = req.to_dict()
-        # Get offers for this request
-        offers = Offer.query.filter_by(job_id=req.id).all()
-        req_data['offers'] = [offer.to_dict(include_provider=True) for offer in offers]
-        req_data['offer_count'] = len(offers)
-        requests_data.append(req_data)
+    if include_offers == 'summary':
+        # Only counts and best price, aggregated in SQL
+        summaries = load_offer_summaries(job_ids)
+        for req in requests:
+            req_data = req.to_dict()
+            offer_count, best_price = summaries.get(req.id, (0, None))
+            req_data['offer_count'] = offer_count
+            req_data['best_price'] = best_price
+            requests_data.append(req_data)
+    else:
+        # All offers (with providers) for all requests in one query
+        offers_by_job = load_offers_by_job(job_ids)
+        for req in requests:
+            req_data = req.to_dict()
+            offers = offers_by_job.get(req.id, [])
+            req_data['offers'] = [offer.to_dict(include_provider=True) for offer in offers]
+            req_data['offer_count'] = len(offers)
+            requests_data.append(req_data)
     
     return jsonify({
         'requests': requests_data,
@@ -102,8 +153,7 @@ def get_request(request_id):
     job = Job.query.get_or_404(request_id)
     
     # Check authorization
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Customer can see their own requests, providers can see requests in their category
     if user.role == 'customer':
@@ -116,7 +166,7 @@ def get_request(request_id):
     job_data = job.to_dict()
     
     # Get offers
-    offers = Offer.query.filter_by(job_id=request_id).all()
+    offers = load_offers_by_job([request_id]).get(request_id, [])
     job_data['offers'] = [offer.to_dict(include_provider=True) for offer in offers]
     
     return jsonify(job_data), 200
@@ -129,14 +179,13 @@ def get_offers(request_id):
     """Get offers for a service request"""
     job = Job.query.get_or_404(request_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Check if request belongs to customer
     if job.customer_id != user.customer.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    offers = Offer.query.filter_by(job_id=request_id).order_by(Offer.created_at.desc()).all()
+    offers = Offer.query.options(joinedload(Offer.provider)).filter_by(job_id=request_id).order_by(Offer.created_at.desc()).all()
     
     return jsonify({
         'offers': [offer.to_dict(include_provider=True) for offer in offers],
@@ -152,8 +201,7 @@ def accept_offer(request_id, offer_id):
     job = Job.query.get_or_404(request_id)
     offer = Offer.query.get_or_404(offer_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Check if request belongs to customer
     if job.customer_id != user.customer.id:
@@ -191,6 +239,7 @@ def accept_offer(request_id, offer_id):
         )
         db.session.add(booking)
         db.session.commit()
+        invalidate_stats(offer.provider_id)
         
         return jsonify({
             'message': 'Offer accepted, booking created',
@@ -209,8 +258,7 @@ def get_job(job_id):
     """Get job details"""
     job = Job.query.get_or_404(job_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Authorization check
     if user.role == 'customer' and job.customer_id != user.customer.id:
@@ -227,8 +275,7 @@ def update_job_status(job_id):
     """Update job status"""
     job = Job.query.get_or_404(job_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     data = request.get_json()
     new_status = data.get('status')
@@ -251,6 +298,7 @@ def update_job_status(job_id):
         if new_status == 'completed':
             job.completed_at = datetime.utcnow()
         db.session.commit()
+        invalidate_stats()
         
         return jsonify({
             'message': 'Job status updated',
@@ -267,35 +315,123 @@ def update_job_status(job_id):
 @jwt_required()
 @provider_required
 def get_open_jobs():
-    """Get all OPEN jobs for provider's job board"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    """
+    Get OPEN jobs for provider's job board (keyset paginated, filterable by category and distance)
+    
+    A distance-filtered page stops after OPEN_JOBS_MAX_SCAN rows; it can then hold fewer than
+    limit jobs while has_more is true, and next_cursor continues after the last row read.
+    """
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
     
     provider = user.provider
     
-    # Get all OPEN jobs (visible to all providers)
-    open_jobs = Job.query.filter_by(status='OPEN').order_by(Job.created_at.desc()).all()
+    category = request.args.get('category')
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius = request.args.get('radius', type=float, default=50)  # km
+    limit = get_page_size()
+    
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), size=2)
+        if cursor is not None:
+            cursor_created_at, cursor_id = parse_cursor_datetime(cursor[0]), int(cursor[1])
+    except (InvalidCursor, TypeError, ValueError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # OPEN jobs (visible to all providers), newest first, customers eager-loaded
+    query = Job.query.options(joinedload(Job.customer)).filter(Job.status == 'OPEN')
+    
+    if category:
+        query = query.filter(Job.category == category)
+    
+    if lat is not None and lng is not None:
+        # Bounding box in SQL, exact haversine check below
+        dlat = radius / KM_PER_DEGREE
+        dlng = radius / (KM_PER_DEGREE * max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6))
+        query = query.filter(
+            Job.latitude.between(lat - dlat, lat + dlat),
+            Job.longitude.between(lng - dlng, lng + dlng)
+        )
+    
+    # Rows in the corners of the box fail the haversine check, so keep reading
+    # keyset batches until the page is full, the jobs run out or the scan cap is hit
+    geo = lat is not None and lng is not None
+    batch_size = max(limit + 1, 50) if geo else limit + 1
+    open_jobs = []
+    distances = {}
+    scanned = 0
+    exhausted = False
+    last = (cursor_created_at, cursor_id) if cursor is not None else None
+    while len(open_jobs) <= limit and scanned < OPEN_JOBS_MAX_SCAN:
+        batch_query = query
+        if last is not None:
+            batch_query = batch_query.filter(or_(
+                Job.created_at < last[0],
+                and_(Job.created_at == last[0], Job.id < last[1])
+            ))
+        batch = batch_query.order_by(Job.created_at.desc(), Job.id.desc()).limit(batch_size).all()
+        if geo and batch:
+            job_distances = batch_haversine(
+                lat, lng,
+                np.array([job.latitude for job in batch], dtype=np.float64),
+                np.array([job.longitude for job in batch], dtype=np.float64)
+            ).tolist()
+        for position, job in enumerate(batch):
+            scanned += 1
+            last = (job.created_at, job.id)
+            if geo:
+                if job_distances[position] > radius:
+                    continue
+                distances[job.id] = round(job_distances[position], 2)
+            open_jobs.append(job)
+            if len(open_jobs) > limit:
+                break
+        if len(batch) < batch_size:
+            exhausted = True
+            break
+    
+    if len(open_jobs) > limit:
+        # One match past the page proves there is more
+        open_jobs = open_jobs[:limit]
+        has_more = True
+        next_cursor = encode_cursor(open_jobs[-1].created_at, open_jobs[-1].id)
+    elif not exhausted:
+        # Scan cap reached with a short page: continue after the last row read
+        has_more = True
+        next_cursor = encode_cursor(last[0], last[1])
+    else:
+        has_more = False
+        next_cursor = None
+    
+    # Saved flags for the whole page from one query
+    saved_job_ids = set()
+    if open_jobs:
+        saved_job_ids = {
+            job_id for (job_id,) in db.session.query(SavedJob.service_request_id).filter(
+                SavedJob.provider_id == provider.id,
+                SavedJob.service_request_id.in_([job.id for job in open_jobs])
+            )
+        }
     
     jobs_data = []
     for job in open_jobs:
         job_data = job.to_dict(include_customer=True)
         # Add provider's availability status
         job_data['provider_availability'] = provider.is_available
-        # Check if job is saved by this provider
-        saved = SavedJob.query.filter_by(
-            provider_id=provider.id,
-            service_request_id=job.id
-        ).first()
-        job_data['is_saved'] = saved is not None
+        job_data['is_saved'] = job.id in saved_job_ids
+        if job.id in distances:
+            job_data['distance_km'] = distances[job.id]
         jobs_data.append(job_data)
     
     return jsonify({
         'jobs': jobs_data,
         'count': len(jobs_data),
-        'provider_availability': provider.is_available
+        'provider_availability': provider.is_available,
+        'next_cursor': next_cursor,
+        'has_more': has_more
     }), 200
 
 
@@ -304,8 +440,7 @@ def get_open_jobs():
 @provider_required
 def accept_job(job_id):
     """Accept a job (transaction-safe, ensures exclusivity)"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -316,48 +451,13 @@ def accept_job(job_id):
     if not provider.is_available:
         return jsonify({'error': 'You must be available to accept jobs'}), 400
     
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
     try:
-        # Use database lock to ensure atomicity
-        # Lock the job row for update
-        job = db.session.query(Job).filter_by(id=job_id).with_for_update().first()
-        
-        if not job:
-            return jsonify({'error': 'Job not found'}), 404
-        
-        # Check if job is still OPEN
-        if job.status != 'OPEN':
-            return jsonify({
-                'error': 'Job is no longer available',
-                'status': job.status
-            }), 400
-        
-        # Check if job already has a provider (double-check)
-        if job.provider_id is not None:
-            return jsonify({'error': 'Job has already been accepted by another provider'}), 409
-        
-        # Accept the job atomically
-        job.status = 'ACCEPTED'
-        job.provider_id = provider.id
-        job.price = job.offered_price  # Use offered price as agreed price
-        
-        # Create booking
-        booking = Booking(
-            job_id=job.id,
-            customer_id=job.customer_id,
-            provider_id=provider.id,
-            price=job.offered_price or 0.0,
-            status='confirmed',
-            scheduled_at=job.preferred_date
-        )
-        db.session.add(booking)
-        
-        # Remove from saved jobs if it was saved
-        SavedJob.query.filter_by(
-            provider_id=provider.id,
-            service_request_id=job.id
-        ).delete()
-        
-        db.session.commit()
+        # Compare-and-swap accept: only one concurrent accept can win the OPEN job
+        booking = claims.accept_job(job, provider.id)
         
         return jsonify({
             'message': 'Job accepted successfully',
@@ -365,6 +465,9 @@ def accept_job(job_id):
             'booking': booking.to_dict()
         }), 200
     
+    except claims.ClaimError as e:
+        return jsonify(e.payload), e.status_code
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -375,8 +478,7 @@ def accept_job(job_id):
 @provider_required
 def save_job(job_id):
     """Save a job for later"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -427,8 +529,7 @@ def save_job(job_id):
 @provider_required
 def get_saved_jobs():
     """Get provider's saved jobs"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -469,8 +570,7 @@ def get_saved_jobs():
 @provider_required
 def get_accepted_jobs():
     """Get provider's accepted jobs"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
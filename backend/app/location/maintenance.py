@@ -0,0 +1,240 @@
+"""
+Location Maintenance
+Compacts location_updates rows past the retention window into per-track polyline
+summaries, optionally archives the raw points to compressed files, and deletes
+them in bounded batches
+"""
+import bisect
+import csv
+import gzip
+import os
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from app.models.booking import Booking
+from app.models.location_update import LocationUpdate
+from app.models.location_track_summary import LocationTrackSummary
+from app.providers.geo_index import haversine_distance
+
+TRACK_GAP = timedelta(minutes=30)  # a pause this long outside a booking starts a new track
+MAX_TRACK_POINTS = 5000
+OPEN_BOOKING_STATUSES = ('pending', 'confirmed', 'in_progress')
+
+
+def encode_polyline(points):
+    """Encode [(lat, lng)] with the Google polyline algorithm (1e-5 degree precision)"""
+    encoded = []
+    previous_lat = previous_lng = 0
+    for lat, lng in points:
+        lat_e5, lng_e5 = int(round(lat * 1e5)), int(round(lng * 1e5))
+        for delta in (lat_e5 - previous_lat, lng_e5 - previous_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat, previous_lng = lat_e5, lng_e5
+    return ''.join(encoded)
+
+
+def decode_polyline(polyline):
+    """Decode a Google encoded polyline back to [(lat, lng)]"""
+    points = []
+    index = lat = lng = 0
+    while index < len(polyline):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(polyline[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / 1e5, lng / 1e5))
+    return points
+
+
+class BookingWindows:
+    """Time windows of a provider's bookings, to attribute points to bookings"""
+
+    def __init__(self, provider_id, before):
+        rows = db.session.query(
+            Booking.id, Booking.status, Booking.created_at, Booking.updated_at, Booking.completed_at
+        ).filter(
+            Booking.provider_id == provider_id,
+            Booking.created_at < before
+        ).order_by(Booking.created_at, Booking.id).all()
+        self._starts = [row.created_at for row in rows]
+        self._windows = []
+        for row in rows:
+            if row.completed_at:
+                end = row.completed_at
+            elif row.status in OPEN_BOOKING_STATUSES:
+                end = datetime.max
+            else:
+                end = row.updated_at or row.created_at
+            self._windows.append((row.created_at, end, row.id))
+
+    def booking_for(self, timestamp):
+        """Id of the latest booking whose window contains timestamp, or None"""
+        for i in range(bisect.bisect_right(self._starts, timestamp) - 1, -1, -1):
+            start, end, booking_id = self._windows[i]
+            if end >= timestamp:
+                return booking_id
+        return None
+
+
+class LocationMaintenance:
+    """One maintenance run; counters describe what it did"""
+
+    def __init__(self, cutoff, batch_size=500, archive_dir=None, compact=True):
+        self.cutoff = cutoff
+        self.batch_size = batch_size
+        self.archive_dir = archive_dir
+        self.compact = compact
+        self.providers = 0
+        self.summaries = 0
+        self.deleted = 0
+        self.archived_files = 0
+
+    def _archive(self, provider_id, booking_id, points):
+        """Write a track's raw points to a gzip'd CSV; returns its path"""
+        directory = os.path.join(self.archive_dir, f'provider_{provider_id}')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{points[0].timestamp:%Y-%m-%d}_{points[0].id}-{points[-1].id}.csv.gz')
+        partial = path + '.partial'
+        with gzip.open(partial, 'wt', newline='') as archive:
+            writer = csv.writer(archive)
+            writer.writerow(['id', 'provider_id', 'booking_id', 'latitude', 'longitude', 'timestamp'])
+            for point in points:
+                writer.writerow([point.id, provider_id, booking_id, point.latitude, point.longitude,
+                                 point.timestamp.isoformat()])
+        os.replace(partial, path)  # a rerun after a crash overwrites the same file
+        self.archived_files += 1
+        return path
+
+    def _delete_ids(self, ids):
+        for start in range(0, len(ids), self.batch_size):
+            self.deleted += LocationUpdate.query.filter(
+                LocationUpdate.id.in_(ids[start:start + self.batch_size])
+            ).delete(synchronize_session=False)
+
+    def _finish_track(self, provider_id, booking_id, points):
+        """Store the track's summary and delete its raw points in the same transaction"""
+        archive_path = self._archive(provider_id, booking_id, points) if self.archive_dir else None
+        distance_km = sum(
+            haversine_distance(a.latitude, a.longitude, b.latitude, b.longitude)
+            for a, b in zip(points, points[1:])
+        )
+        db.session.add(LocationTrackSummary(
+            provider_id=provider_id,
+            booking_id=booking_id,
+            started_at=points[0].timestamp,
+            ended_at=points[-1].timestamp,
+            point_count=len(points),
+            distance_km=round(distance_km, 3),
+            polyline=encode_polyline([(point.latitude, point.longitude) for point in points]),
+            first_location_id=points[0].id,
+            last_location_id=points[-1].id,
+            archive_path=archive_path
+        ))
+        self._delete_ids([point.id for point in points])
+        db.session.commit()
+        self.summaries += 1
+
+    def compact_provider(self, provider_id):
+        """Compact one provider's expired points, paging through them by id"""
+        windows = BookingWindows(provider_id, self.cutoff)
+        track_booking_id, track = None, []
+        last_id = 0
+        while True:
+            page = db.session.query(
+                LocationUpdate.id, LocationUpdate.latitude, LocationUpdate.longitude, LocationUpdate.timestamp
+            ).filter(
+                LocationUpdate.provider_id == provider_id,
+                LocationUpdate.timestamp < self.cutoff,
+                LocationUpdate.id > last_id
+            ).order_by(LocationUpdate.id).limit(self.batch_size).all()
+            if not page:
+                break
+            last_id = page[-1].id
+
+            for point in page:
+                booking_id = windows.booking_for(point.timestamp)
+                if track and (
+                    booking_id != track_booking_id or
+                    point.timestamp - track[-1].timestamp > TRACK_GAP or
+                    len(track) >= MAX_TRACK_POINTS
+                ):
+                    self._finish_track(provider_id, track_booking_id, track)
+                    track = []
+                if not track:
+                    track_booking_id = booking_id
+                track.append(point)
+
+        if track:
+            self._finish_track(provider_id, track_booking_id, track)
+
+    def delete_provider(self, provider_id):
+        """Delete one provider's expired points without keeping a summary"""
+        while True:
+            ids = [location_id for location_id, in db.session.query(LocationUpdate.id).filter(
+                LocationUpdate.provider_id == provider_id,
+                LocationUpdate.timestamp < self.cutoff
+            ).order_by(LocationUpdate.id).limit(self.batch_size)]
+            if not ids:
+                break
+            self._delete_ids(ids)
+            db.session.commit()
+
+    def run(self):
+        provider_ids = [provider_id for provider_id, in db.session.query(LocationUpdate.provider_id).filter(
+            LocationUpdate.timestamp < self.cutoff
+        ).distinct()]
+        for provider_id in provider_ids:
+            if self.compact:
+                self.compact_provider(provider_id)
+            else:
+                self.delete_provider(provider_id)
+            self.providers += 1
+        return self
+
+
+def run_location_maintenance(retention_days=None, batch_size=None, archive_dir=None, compact=None):
+    """
+    Compact (or just delete) location points older than the retention window
+
+    Defaults come from LOCATION_RETENTION_DAYS, LOCATION_MAINTENANCE_BATCH_SIZE,
+    LOCATION_ARCHIVE_DIR and LOCATION_COMPACT_TRACKS. Needs an app context.
+
+    Returns:
+        dict: providers processed, summaries written, rows deleted, archive files, seconds
+    """
+    config = current_app.config
+    retention_days = config.get('LOCATION_RETENTION_DAYS', 14) if retention_days is None else retention_days
+    batch_size = batch_size or config.get('LOCATION_MAINTENANCE_BATCH_SIZE', 500)
+    archive_dir = config.get('LOCATION_ARCHIVE_DIR') if archive_dir is None else archive_dir
+    compact = config.get('LOCATION_COMPACT_TRACKS', True) if compact is None else compact
+
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    try:
+        maintenance = LocationMaintenance(cutoff, batch_size, archive_dir or None, compact).run()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {
+        'cutoff': cutoff.isoformat(),
+        'providers': maintenance.providers,
+        'summaries': maintenance.summaries,
+        'deleted': maintenance.deleted,
+        'archived_files': maintenance.archived_files,
+        'remaining': LocationUpdate.query.count(),
+        'seconds': round(time.perf_counter() - started, 2)
+    }
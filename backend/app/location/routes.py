@@ -5,6 +5,7 @@ from extensions import db
 from app.models.user import User
 from app.models.provider import Provider
 from app.models.location_update import LocationUpdate
+from app.location.tracker import location_tracker
 from app.utils.decorators import provider_required
 
 
@@ -14,8 +15,14 @@ def get_provider_location(provider_id):
     """Get current provider location"""
     provider = Provider.query.get_or_404(provider_id)
     
-    # Get latest location update
-    location = LocationUpdate.query.filter_by(provider_id=provider_id).order_by(LocationUpdate.timestamp.desc()).first()
+    # Latest ping seen by this process, else the newest stored point
+    # (ids grow with time, so the provider_id index serves this without a sort).
+    # Same keys either way; a ping has no row id until it is flushed
+    latest = location_tracker.latest(provider_id)
+    if latest:
+        return jsonify({'id': None, **latest}), 200
+    
+    location = LocationUpdate.query.filter_by(provider_id=provider_id).order_by(LocationUpdate.id.desc()).first()
     
     if not location:
         return jsonify({'error': 'Location not available'}), 404
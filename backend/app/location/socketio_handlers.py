@@ -1,100 +1,88 @@
 from flask import request
-from flask_jwt_extended import decode_token
 from extensions import socketio, db
-from app.models.user import User
-from app.models.provider import Provider
-from app.models.location_update import LocationUpdate
 from app.models.booking import Booking
-from datetime import datetime
+from app.providers.geo_index import update_provider_position, parse_coordinate
+from app.location.tracker import location_tracker
+from app.utils.socket_auth import get_socket_identity
+from app.utils.db_offload import run_db_task
 
 
 @socketio.on('update_location')
 def handle_location_update(data):
     """Handle provider location update"""
-    latitude = data.get('latitude')
-    longitude = data.get('longitude')
-    token = data.get('token')
+    if data.get('latitude') is None or data.get('longitude') is None:
+        return {'error': 'latitude and longitude are required'}
     
-    if not latitude or not longitude or not token:
-        return {'error': 'latitude, longitude, and token are required'}
+    try:
+        latitude = parse_coordinate(data.get('latitude'), 'latitude', 90)
+        longitude = parse_coordinate(data.get('longitude'), 'longitude', 180)
+    except ValueError as e:
+        return {'error': str(e)}
     
     try:
-        decoded = decode_token(token)
-        user_id = decoded['sub']['id']
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'provider':
+        identity = get_socket_identity(data)
+        if not identity or identity.role != 'provider':
             return {'error': 'Provider access required'}
         
-        if not user.provider:
+        if not identity.provider_id:
             return {'error': 'Provider profile not found'}
         
-        # Create location update
-        location_update = LocationUpdate(
-            provider_id=user.provider.id,
-            latitude=latitude,
-            longitude=longitude
-        )
-        db.session.add(location_update)
-        db.session.commit()
+        # Latest position is kept in memory; moved/heartbeat points are stored in batches
+        location, _ = location_tracker.record(identity.provider_id, latitude, longitude)
+        update_provider_position(identity.provider_id, latitude, longitude)
         
-        # Get active bookings for this provider
-        active_bookings = Booking.query.filter_by(
-            provider_id=user.provider.id,
-            status='in_progress'
-        ).all()
+        # Customers with in-progress bookings (cached per provider)
+        customer_user_ids = location_tracker.subscribers(identity.provider_id)
         
         # Broadcast location to customers with active bookings
-        for booking in active_bookings:
-            if booking.customer and booking.customer.user:
-                room = f'customer_{booking.customer.user_id}'
-                socketio.emit('location_update', {
-                    'provider_id': user.provider.id,
-                    'provider_name': user.provider.name,
-                    'latitude': latitude,
-                    'longitude': longitude,
-                    'timestamp': location_update.timestamp.isoformat()
-                }, room=room)
+        for customer_user_id in customer_user_ids:
+            room = f'customer_{customer_user_id}'
+            socketio.emit('location_update', {
+                'provider_id': identity.provider_id,
+                'provider_name': identity.name,
+                'latitude': latitude,
+                'longitude': longitude,
+                'timestamp': location['timestamp']
+            }, room=room)
         
-        return {'status': 'updated', 'location': location_update.to_dict()}
+        return {'status': 'updated', 'location': location}
     
     except Exception as e:
         db.session.rollback()
         return {'error': str(e)}
 
 
+def has_active_booking(customer_id, provider_id):
+    """Whether the customer has an in-progress booking with the provider"""
+    return db.session.query(Booking.id).filter_by(
+        customer_id=customer_id,
+        provider_id=provider_id,
+        status='in_progress'
+    ).first() is not None
+
+
 @socketio.on('subscribe_location')
 def handle_subscribe_location(data):
     """Customer subscribes to provider location updates"""
     provider_id = data.get('provider_id')
-    token = data.get('token')
     
-    if not provider_id or not token:
-        return {'error': 'provider_id and token are required'}
+    if not provider_id:
+        return {'error': 'provider_id is required'}
     
     try:
-        decoded = decode_token(token)
-        user_id = decoded['sub']['id']
-        user = User.query.get(user_id)
-        
-        if not user or user.role != 'customer':
+        identity = get_socket_identity(data)
+        if not identity or identity.role != 'customer':
             return {'error': 'Customer access required'}
         
         # Check if customer has active booking with provider
-        if not user.customer:
+        if not identity.customer_id:
             return {'error': 'Customer profile not found'}
         
-        active_booking = Booking.query.filter_by(
-            customer_id=user.customer.id,
-            provider_id=provider_id,
-            status='in_progress'
-        ).first()
-        
-        if not active_booking:
+        if not run_db_task(has_active_booking, identity.customer_id, provider_id):
             return {'error': 'No active booking with this provider'}
         
         # Join room for location updates
-        room = f'customer_{user_id}'
+        room = f'customer_{identity.user_id}'
         socketio.server.enter_room(request.sid, room)
         
         return {'status': 'subscribed', 'provider_id': provider_id}
@@ -0,0 +1,238 @@
+"""
+Provider Location Tracker
+Latest-position map, downsampled and batched LocationUpdate writes, and a cached
+set of customers following each provider
+"""
+import atexit
+import math
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, StatementError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from extensions import db, socketio
+from app.models.customer import Customer
+from app.models.booking import Booking
+from app.models.location_update import LocationUpdate
+from app.providers.geo_index import parse_coordinate
+from app.utils.cache import TTLCache
+from app.utils.db_offload import run_db_task
+
+METERS_PER_DEGREE = 111320
+
+# Database errors a later flush can get past (locked or unreachable database); a batch
+# failing with any other error is retried row by row and the rejected rows are dropped
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError)
+
+
+def distance_meters(lat1, lng1, lat2, lng2):
+    """Equirectangular distance, accurate to well under a meter over downsampling ranges"""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6371000
+
+
+def _load_subscribers(provider_id):
+    """User ids of customers with an in-progress booking with the provider"""
+    return tuple(user_id for user_id, in db.session.query(Customer.user_id).join(
+        Booking, Booking.customer_id == Customer.id
+    ).filter(
+        Booking.provider_id == provider_id,
+        Booking.status == 'in_progress'
+    ).distinct())
+
+
+class LocationTracker:
+    """
+    Keeps every provider's latest ping in memory and writes a LocationUpdate
+    row only when the provider moved at least min_distance_m, or heartbeat
+    seconds passed, since its last stored point. Stored points are queued and
+    inserted in batches by a background flush every flush_seconds, or as soon
+    as batch_size points are waiting.
+
+    The latest-position map is per process; readers on other workers fall
+    back to the newest stored row.
+    """
+
+    def __init__(self, min_distance_m=25, heartbeat=300, flush_seconds=5, batch_size=500,
+                 subscriber_ttl=30):
+        self.min_distance_m = min_distance_m
+        self.heartbeat = heartbeat
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._latest = {}  # provider_id -> location dict of the latest ping
+        self._last_stored = {}  # provider_id -> (lat, lng, monotonic time) of the last queued point
+        self._pending = []  # LocationUpdate rows waiting for the next flush
+        self._subscribers = TTLCache(maxsize=10000, ttl=subscriber_ttl)
+        self._lock = threading.Lock()
+        self._flusher_started = False
+        self.pings = 0
+        self.stored = 0
+        self.flushes = 0
+        self.dropped = 0
+
+    def configure(self, config):
+        self.min_distance_m = config.get('LOCATION_MIN_DISTANCE_METERS', 25)
+        self.heartbeat = config.get('LOCATION_HEARTBEAT_SECONDS', 300)
+        self.flush_seconds = config.get('LOCATION_FLUSH_SECONDS', 5)
+        self.batch_size = config.get('LOCATION_FLUSH_BATCH_SIZE', 500)
+        self._subscribers.ttl = config.get('LOCATION_SUBSCRIBER_CACHE_SECONDS', 30)
+
+    def _should_store(self, provider_id, lat, lng, now):
+        last = self._last_stored.get(provider_id)
+        if last is None:
+            return True
+        last_lat, last_lng, stored_at = last
+        return (
+            now - stored_at >= self.heartbeat or
+            distance_meters(last_lat, last_lng, lat, lng) >= self.min_distance_m
+        )
+
+    def record(self, provider_id, lat, lng):
+        """
+        Take a location ping
+
+        Returns:
+            tuple: (location dict, whether the point will be stored)
+
+        Raises:
+            ValueError: a coordinate is missing, not a number or out of range
+        """
+        lat = parse_coordinate(lat, 'latitude', 90)
+        lng = parse_coordinate(lng, 'longitude', 180)
+        if lat is None or lng is None:
+            raise ValueError('latitude and longitude are required')
+        now = time.monotonic()
+        timestamp = datetime.utcnow()
+        location = {
+            'provider_id': provider_id,
+            'latitude': lat,
+            'longitude': lng,
+            'timestamp': timestamp.isoformat()
+        }
+        with self._lock:
+            self.pings += 1
+            self._latest[provider_id] = location
+            store = self._should_store(provider_id, lat, lng, now)
+            if store:
+                self.stored += 1
+                self._last_stored[provider_id] = (lat, lng, now)
+                self._pending.append({
+                    'provider_id': provider_id,
+                    'latitude': lat,
+                    'longitude': lng,
+                    'timestamp': timestamp
+                })
+            flush_now = len(self._pending) >= self.batch_size
+
+        if flush_now:
+            run_db_task(self.flush)
+        else:
+            self._start_flusher()
+        return location, store
+
+    def latest(self, provider_id):
+        """Latest ping seen by this process, or None"""
+        return self._latest.get(provider_id)
+
+    def subscribers(self, provider_id):
+        """Cached user ids of customers following the provider's location"""
+        user_ids = self._subscribers.get(provider_id)
+        if user_ids is None:
+            user_ids = run_db_task(_load_subscribers, provider_id)
+            self._subscribers.set(provider_id, user_ids)
+        return user_ids
+
+    def invalidate_subscribers(self, provider_id):
+        """Forget the cached subscribers after a booking of the provider changes status"""
+        self._subscribers.pop(provider_id)
+
+    def flush(self):
+        """Insert all queued points in one batch; returns how many were written"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            db.session.execute(LocationUpdate.__table__.insert(), batch)
+            db.session.commit()
+            written = len(batch)
+        except TRANSIENT_DB_ERRORS:
+            db.session.rollback()
+            with self._lock:
+                self._pending = batch + self._pending
+            raise
+        except StatementError:
+            # Retrying the batch would fail on the same rows forever
+            db.session.rollback()
+            written = self._insert_each(batch)
+        with self._lock:
+            self.flushes += 1
+        return written
+
+    def _insert_each(self, batch):
+        """Insert a rejected batch one row at a time, dropping the rows the database refuses"""
+        written = 0
+        for position, row in enumerate(batch):
+            try:
+                db.session.execute(LocationUpdate.__table__.insert(), [row])
+                db.session.commit()
+                written += 1
+            except TRANSIENT_DB_ERRORS:
+                db.session.rollback()
+                with self._lock:
+                    self._pending = batch[position:] + self._pending
+                raise
+            except StatementError as e:
+                db.session.rollback()
+                with self._lock:
+                    self.dropped += 1
+                current_app.logger.warning(f'Dropped location point of provider {row["provider_id"]}: {e}')
+        return written
+
+    def _flush_loop(self, app):
+        while True:
+            socketio.sleep(self.flush_seconds)
+            with app.app_context():
+                try:
+                    run_db_task(self.flush)
+                except Exception as e:
+                    app.logger.warning(f'Location flush failed, retrying next cycle: {e}')
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher_started:
+                return
+            self._flusher_started = True
+        app = current_app._get_current_object()
+        socketio.start_background_task(self._flush_loop, app)
+        atexit.register(self._flush_at_exit, app)
+
+    def _flush_at_exit(self, app):
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pings': self.pings,
+                'stored': self.stored,
+                'pending': len(self._pending),
+                'flushes': self.flushes,
+                'dropped': self.dropped,
+                'tracked_providers': len(self._latest),
+                'subscriber_cache': self._subscribers.stats()
+            }
+
+
+# Initialize a global tracker instance
+location_tracker = LocationTracker()
+
+
+def configure_location_tracker(app):
+    """Apply the LOCATION_* settings to the tracker"""
+    location_tracker.configure(app.config)
@@ -1,14 +1,19 @@
 from flask import request, jsonify
 from app.messaging import messaging_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db, socketio
 from datetime import datetime
-from app.models.user import User
 from app.models.customer import Customer
 from app.models.provider import Provider
 from app.models.conversation import Conversation
 from app.models.message import Message
 from app.utils.decorators import customer_required, provider_required
+from app.utils.pagination import (
+    encode_cursor, decode_cursor, parse_cursor_datetime, check_cursor_numbers, get_page_size, InvalidCursor
+)
+from app.utils.current_user import load_current_user, get_current_identity
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 
 
 @messaging_bp.route('', methods=['POST'], endpoint='start_conversation')
@@ -16,8 +21,7 @@ from app.utils.decorators import customer_required, provider_required
 @customer_required
 def start_conversation():
     """Start a conversation with a provider"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.customer:
         return jsonify({'error': 'Customer profile not found'}), 404
@@ -66,35 +70,47 @@ def start_conversation():
 @jwt_required()
 def get_conversations():
     """Get user's conversations"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    # Polled inbox: role and profile ids come from the cached identity, not the users table
+    user = get_current_identity()
     
-    conversations = []
+    if user and user.role == 'customer' and user.customer_id:
+        query = Conversation.query.filter_by(customer_id=user.customer_id).options(
+            joinedload(Conversation.provider)
+        )
+    elif user and user.role == 'provider' and user.provider_id:
+        query = Conversation.query.filter_by(provider_id=user.provider_id).options(
+            joinedload(Conversation.customer)
+        )
+    else:
+        return jsonify({'conversations': [], 'count': 0, 'next_cursor': None, 'has_more': False}), 200
     
-    if user.role == 'customer' and user.customer:
-        conversations = Conversation.query.filter_by(
-            customer_id=user.customer.id
-        ).order_by(Conversation.last_message_at.desc()).all()
+    limit = get_page_size()
+    try:
+        cursor = decode_cursor(request.args.get('cursor'), size=2)
+        if cursor:
+            cursor_at = parse_cursor_datetime(cursor[0])
+            cursor_id, = check_cursor_numbers(cursor[1:])
+            query = query.filter(or_(
+                Conversation.last_message_at < cursor_at,
+                and_(Conversation.last_message_at == cursor_at, Conversation.id < cursor_id)
+            ))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    elif user.role == 'provider' and user.provider:
-        conversations = Conversation.query.filter_by(
-            provider_id=user.provider.id
-        ).order_by(Conversation.last_message_at.desc()).all()
+    # Inbox summary and unread counters live on the conversation row: one query per page
+    conversations = query.order_by(
+        Conversation.last_message_at.desc(), Conversation.id.desc()
+    ).limit(limit + 1).all()
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
     
     conversations_data = []
     for conv in conversations:
         conv_data = conv.to_dict()
-        # Get last message
-        last_message = Message.query.filter_by(conversation_id=conv.id).order_by(Message.created_at.desc()).first()
+        last_message = conv.last_message_summary()
         if last_message:
-            conv_data['last_message'] = last_message.to_dict()
-        # Get unread count
-        unread_count = Message.query.filter_by(
-            conversation_id=conv.id,
-            receiver_id=user.id,
-            is_read=False
-        ).count()
-        conv_data['unread_count'] = unread_count
+            conv_data['last_message'] = last_message
+        conv_data['unread_count'] = conv.unread_count_for(user.role)
         
         # Add provider/customer info based on role
         if user.role == 'customer' and conv.provider:
@@ -104,44 +120,85 @@ def get_conversations():
         
         conversations_data.append(conv_data)
     
+    next_cursor = None
+    if has_more and conversations:
+        last = conversations[-1]
+        next_cursor = encode_cursor(last.last_message_at, last.id)
+    
     return jsonify({
         'conversations': conversations_data,
-        'count': len(conversations_data)
+        'count': len(conversations_data),
+        'next_cursor': next_cursor,
+        'has_more': has_more
     }), 200
 
 
 @messaging_bp.route('/<int:conversation_id>/messages', methods=['GET'], endpoint='get_messages')
 @jwt_required()
 def get_messages(conversation_id):
-    """Get messages in a conversation"""
+    """Get a page of messages in a conversation (?before= / ?after= cursors, oldest first)"""
     conversation = Conversation.query.get_or_404(conversation_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = get_current_identity()
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     
     # Authorization check
-    if user.role == 'customer' and conversation.customer_id != user.customer.id:
+    if user.role == 'customer' and conversation.customer_id != user.customer_id:
         return jsonify({'error': 'Unauthorized'}), 403
-    elif user.role == 'provider' and conversation.provider_id != user.provider.id:
+    elif user.role == 'provider' and conversation.provider_id != user.provider_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at.asc()).all()
+    limit = get_page_size(default=50, maximum=200)
+    query = Message.query.filter_by(conversation_id=conversation_id)
+    try:
+        before = decode_cursor(request.args.get('before'), size=2)
+        after = decode_cursor(request.args.get('after'), size=2)
+        if before:
+            before_at = parse_cursor_datetime(before[0])
+            before_id, = check_cursor_numbers(before[1:])
+            query = query.filter(or_(
+                Message.created_at < before_at,
+                and_(Message.created_at == before_at, Message.id < before_id)
+            ))
+        if after:
+            after_at = parse_cursor_datetime(after[0])
+            after_id, = check_cursor_numbers(after[1:])
+            query = query.filter(or_(
+                Message.created_at > after_at,
+                and_(Message.created_at == after_at, Message.id > after_id)
+            ))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Mark messages as read
-    unread_messages = Message.query.filter_by(
-        conversation_id=conversation_id,
-        receiver_id=user.id,
-        is_read=False
-    ).all()
+    # ?after= walks forward from the cursor; otherwise take the newest page before it
+    if after and not before:
+        messages = query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    else:
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit][::-1]
     
-    for msg in unread_messages:
-        msg.is_read = True
+    messages_data = [msg.to_dict() for msg in messages]
     
-    db.session.commit()
+    # Mark messages as read up to the newest one shown, in one UPDATE
+    if messages and user.role in ('customer', 'provider'):
+        up_to_message_id = max(msg.id for msg in messages)
+        read_count = Message.mark_read_up_to(conversation_id, user.user_id, up_to_message_id)
+        Conversation.mark_read(conversation_id, user.role, up_to_message_id, read_count)
+        db.session.commit()
+        for msg_data in messages_data:
+            if msg_data['receiver_id'] == user.user_id:
+                msg_data['is_read'] = True
     
     return jsonify({
-        'messages': [msg.to_dict() for msg in messages],
-        'count': len(messages)
+        'messages': messages_data,
+        'count': len(messages_data),
+        'before_cursor': encode_cursor(messages[0].created_at, messages[0].id) if messages else None,
+        'after_cursor': encode_cursor(messages[-1].created_at, messages[-1].id) if messages else None,
+        'has_more': has_more
     }), 200
 
 
@@ -167,8 +224,7 @@ def send_message(conversation_id):
     """Send a message in a conversation"""
     conversation = Conversation.query.get_or_404(conversation_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Authorization check
     if user.role == 'customer' and conversation.customer_id != user.customer.id:
@@ -228,9 +284,10 @@ def send_message(conversation_id):
             content=content
         )
         db.session.add(message)
+        db.session.flush()
         
-        # Update conversation last_message_at
-        conversation.last_message_at = datetime.utcnow()
+        # Update conversation last message and the receiver's unread counter
+        Conversation.record_message(message, user.role)
         
         db.session.commit()
         
@@ -1,10 +1,10 @@
 from flask import request
-from flask_jwt_extended import decode_token
 from extensions import socketio, db
 from app.models.conversation import Conversation
 from app.models.message import Message
-from app.models.user import User
 from app.models.customer import Customer
+from app.utils.socket_auth import get_socket_identity
+from app.utils.db_offload import run_db_task
 from datetime import datetime
 
 
@@ -22,33 +22,35 @@ def calculate_credits_for_message(provider_rating):
         return 1
 
 
+def check_conversation_access(identity, conversation_id):
+    """None when the identity may join the conversation, else the error to return"""
+    conversation = Conversation.query.get(conversation_id)
+    if not conversation:
+        return {'error': 'Conversation not found'}
+    
+    # Check authorization
+    if not identity.can_access_conversation(conversation):
+        return {'error': 'Unauthorized'}
+    return None
+
+
 @socketio.on('join_conversation')
 def handle_join_conversation(data):
     """Handle joining a conversation room"""
     conversation_id = data.get('conversation_id')
-    token = data.get('token')
     
-    if not conversation_id or not token:
-        return {'error': 'conversation_id and token are required'}
+    if not conversation_id:
+        return {'error': 'conversation_id is required'}
     
     try:
-        decoded = decode_token(token)
-        user_id = decoded['sub']['id']
+        identity = get_socket_identity(data)
+        if not identity:
+            return {'error': 'Authentication required'}
         
         # Verify user has access to conversation
-        conversation = Conversation.query.get(conversation_id)
-        if not conversation:
-            return {'error': 'Conversation not found'}
-        
-        user = User.query.get(user_id)
-        if not user:
-            return {'error': 'User not found'}
-        
-        # Check authorization
-        if user.role == 'customer' and conversation.customer_id != user.customer.id:
-            return {'error': 'Unauthorized'}
-        elif user.role == 'provider' and conversation.provider_id != user.provider.id:
-            return {'error': 'Unauthorized'}
+        error = run_db_task(check_conversation_access, identity, conversation_id)
+        if error:
+            return error
         
         # Join room
         room = f'conversation_{conversation_id}'
@@ -60,102 +62,117 @@ def handle_join_conversation(data):
         return {'error': str(e)}
 
 
+def save_message(identity, conversation_id, content):
+    """
+    Check access, charge credits and store a message in one transaction
+    
+    Returns:
+        dict: {'error': ...} or the stored message with receiver_id, the
+            receiver's unread_count and the credits charged
+    """
+    conversation = Conversation.query.get(conversation_id)
+    if not conversation:
+        return {'error': 'Conversation not found'}
+    
+    # Authorization check
+    if not identity.can_access_conversation(conversation):
+        return {'error': 'Unauthorized'}
+    
+    # Determine receiver
+    if identity.role == 'customer':
+        receiver_id = conversation.provider.user_id
+    else:
+        receiver_id = conversation.customer.user_id
+    
+    # Credit deduction logic (only for customer messages)
+    credits_deducted = 0
+    remaining_credits = None
+    if identity.role == 'customer':
+        customer = Customer.query.get(identity.customer_id) if identity.customer_id else None
+        if not customer:
+            return {'error': 'Customer profile not found'}
+        
+        # Get provider rating
+        provider = conversation.provider
+        provider_rating = provider.rating_avg if provider else None
+        
+        # Calculate credits needed
+        credits_needed = calculate_credits_for_message(provider_rating)
+        
+        # Check if customer has enough credits
+        if customer.credits < credits_needed:
+            return {
+                'error': 'Insufficient credits',
+                'required': credits_needed,
+                'available': customer.credits
+            }
+        
+        # Deduct credits (round 2.5 to 3 for integer storage)
+        credits_to_deduct = int(round(credits_needed))
+        customer.credits -= credits_to_deduct
+        
+        # Ensure credits never go negative (safety check)
+        if customer.credits < 0:
+            customer.credits = 0
+        
+        credits_deducted = credits_to_deduct
+        remaining_credits = customer.credits
+    
+    # Create message
+    message = Message(
+        conversation_id=conversation_id,
+        sender_id=identity.user_id,
+        receiver_id=receiver_id,
+        content=content
+    )
+    db.session.add(message)
+    db.session.flush()
+    Conversation.record_message(message, identity.role)
+    db.session.commit()
+    
+    receiver_role = 'provider' if identity.role == 'customer' else 'customer'
+    return {
+        'message': message.to_dict(),
+        'receiver_id': receiver_id,
+        'unread_count': conversation.unread_count_for(receiver_role),
+        'credits_deducted': credits_deducted,
+        'remaining_credits': remaining_credits
+    }
+
+
 @socketio.on('send_message')
 def handle_send_message(data):
     """Handle sending a message via Socket.IO with credit deduction"""
     conversation_id = data.get('conversation_id')
     content = data.get('content')
-    token = data.get('token')
     
-    if not conversation_id or not content or not token:
-        return {'error': 'conversation_id, content, and token are required'}
+    if not conversation_id or not content:
+        return {'error': 'conversation_id and content are required'}
     
     try:
-        decoded = decode_token(token)
-        user_id = decoded['sub']['id']
-        user = User.query.get(user_id)
-        
-        if not user:
-            return {'error': 'User not found'}
-        
-        conversation = Conversation.query.get(conversation_id)
-        if not conversation:
-            return {'error': 'Conversation not found'}
+        identity = get_socket_identity(data)
+        if not identity:
+            return {'error': 'Authentication required'}
         
-        # Authorization check
-        if user.role == 'customer' and conversation.customer_id != user.customer.id:
-            return {'error': 'Unauthorized'}
-        elif user.role == 'provider' and conversation.provider_id != user.provider.id:
-            return {'error': 'Unauthorized'}
-        
-        # Determine receiver
-        if user.role == 'customer':
-            receiver_id = conversation.provider.user_id
-        else:
-            receiver_id = conversation.customer.user_id
-        
-        # Credit deduction logic (only for customer messages)
-        credits_deducted = 0
-        remaining_credits = None
-        if user.role == 'customer':
-            if not user.customer:
-                return {'error': 'Customer profile not found'}
-            
-            # Get provider rating
-            provider = conversation.provider
-            provider_rating = provider.rating_avg if provider else None
-            
-            # Calculate credits needed
-            credits_needed = calculate_credits_for_message(provider_rating)
-            
-            # Check if customer has enough credits
-            if user.customer.credits < credits_needed:
-                return {
-                    'error': 'Insufficient credits',
-                    'required': credits_needed,
-                    'available': user.customer.credits
-                }
-            
-            # Deduct credits (round 2.5 to 3 for integer storage)
-            credits_to_deduct = int(round(credits_needed))
-            user.customer.credits -= credits_to_deduct
-            
-            # Ensure credits never go negative (safety check)
-            if user.customer.credits < 0:
-                user.customer.credits = 0
-            
-            credits_deducted = credits_to_deduct
-            remaining_credits = user.customer.credits
-        
-        # Create message
-        message = Message(
-            conversation_id=conversation_id,
-            sender_id=user.id,
-            receiver_id=receiver_id,
-            content=content
-        )
-        db.session.add(message)
-        conversation.last_message_at = datetime.utcnow()
-        db.session.commit()
+        result = run_db_task(save_message, identity, conversation_id, content)
+        if 'error' in result:
+            return result
         
         # Broadcast message to room
         room = f'conversation_{conversation_id}'
-        message_data = message.to_dict()
+        message_data = result['message']
+        credits_deducted = result['credits_deducted']
+        remaining_credits = result['remaining_credits']
         if credits_deducted > 0:
             message_data['credits_deducted'] = credits_deducted
             message_data['remaining_credits'] = remaining_credits
         socketio.emit('message', message_data, room=room)
         
         # Broadcast unread count update to receiver
-        receiver_room = f'user_{receiver_id}'
-        unread_count = Message.query.filter_by(
-            conversation_id=conversation_id,
-            receiver_id=receiver_id,
-            is_read=False
-        ).count()
+        receiver_room = f"user_{result['receiver_id']}"
         socketio.emit('unread_count_update', {
             'conversation_id': conversation_id,
-            'unread_count': unread_count
+            'unread_count': result['unread_count']
         }, room=receiver_room)
         
         return {
@@ -173,20 +190,16 @@ def handle_send_message(data):
 @socketio.on('join_user_room')
 def handle_join_user_room(data):
     """Handle joining user's personal room for unread count updates"""
-    token = data.get('token')
-    
-    if not token:
-        return {'error': 'token is required'}
-    
     try:
-        decoded = decode_token(token)
-        user_id = decoded['sub']['id']
+        identity = get_socket_identity(data)
+        if not identity:
+            return {'error': 'Authentication required'}
         
         # Join user's personal room
-        room = f'user_{user_id}'
+        room = f'user_{identity.user_id}'
         socketio.server.enter_room(request.sid, room)
         
-        return {'status': 'joined', 'user_id': user_id}
+        return {'status': 'joined', 'user_id': identity.user_id}
     
     except Exception as e:
         return {'error': str(e)}
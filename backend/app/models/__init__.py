@@ -8,9 +8,11 @@ from app.models.message import Message
 from app.models.conversation import Conversation
 from app.models.rating import Rating
 from app.models.location_update import LocationUpdate
+from app.models.location_track_summary import LocationTrackSummary
 from app.models.notification import Notification
 from app.models.credit_transaction import CreditTransaction
 from app.models.saved_job import SavedJob
+from app.models.revoked_token import RevokedToken
 
 __all__ = [
     'User',
@@ -23,8 +25,10 @@ __all__ = [
     'Conversation',
     'Rating',
     'LocationUpdate',
+    'LocationTrackSummary',
     'Notification',
     'CreditTransaction',
-    'SavedJob'
+    'SavedJob',
+    'RevokedToken'
 ]
 
@@ -1,5 +1,6 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 import json
 
 
@@ -71,12 +72,11 @@ class ChatSession(db.Model):
                     'role': 'user',
                     'parts': [msg['content']]
                 })
-            else:
-                if 'response' in msg:
-                    history.append({
-                        'role': 'model',
-                        'parts': [msg['response']]
-                    })
+            if 'response' in msg:
+                history.append({
+                    'role': 'model',
+                    'parts': [msg['response']]
+                })
         return history
 
 
@@ -108,3 +108,37 @@ class ChatMessage(db.Model):
             'tokens_used': self.tokens_used,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class ChatFlowState(db.Model):
+    """Serialized ConversationFlow of a diagnosis session (see app/bot/flow_store.py)"""
+    __tablename__ = 'chat_flow_states'
+    
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_sessions.id'), primary_key=True)
+    state = db.Column(db.JSON, nullable=False)  # ConversationFlow.to_dict()
+    revision = db.Column(db.Integer, default=1, nullable=False)  # bumped on every save
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    @classmethod
+    def save_state(cls, session_id, state):
+        """
+        Store a flow's state and bump its revision with a single atomic UPDATE
+        (inserting revision 1 for a new session). Returns the new revision.
+        Runs in the caller's transaction; the caller commits.
+        """
+        updated = cls.query.filter_by(session_id=session_id).update({
+            cls.state: state,
+            cls.revision: cls.revision + 1,
+            cls.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(session_id=session_id, state=state, revision=1))
+            except IntegrityError:
+                # Another worker stored the session's first revision meanwhile
+                return cls.save_state(session_id, state)
+        return db.session.query(cls.revision).filter(cls.session_id == session_id).scalar()
+    
+    def __repr__(self):
+        return f'<ChatFlowState session {self.session_id} r{self.revision}>'
@@ -1,10 +1,17 @@
 from extensions import db
 from datetime import datetime
 
+MESSAGE_PREVIEW_LENGTH = 200
+
 
 class Conversation(db.Model):
     """Conversation model for customer-provider messaging"""
     __tablename__ = 'conversations'
+    __table_args__ = (
+        # Inbox pages are keyset-paginated on (last_message_at, id) per participant
+        db.Index('ix_conversations_customer_inbox', 'customer_id', 'last_message_at', 'id'),
+        db.Index('ix_conversations_provider_inbox', 'provider_id', 'last_message_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False, index=True)
@@ -12,12 +19,76 @@ class Conversation(db.Model):
     last_message_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
+    # Denormalized inbox summary, maintained by record_message / mark_read
+    last_message_id = db.Column(db.Integer, nullable=True)
+    last_message_sender_id = db.Column(db.Integer, nullable=True)
+    last_message_preview = db.Column(db.String(MESSAGE_PREVIEW_LENGTH), nullable=True)
+    customer_unread_count = db.Column(db.Integer, default=0, nullable=False)
+    provider_unread_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Per-participant read watermarks: every message up to this id has been read
+    customer_last_read_message_id = db.Column(db.Integer, nullable=True)
+    provider_last_read_message_id = db.Column(db.Integer, nullable=True)
+    
     # Relationships
     messages = db.relationship('Message', backref='conversation', lazy='dynamic', cascade='all, delete-orphan', order_by='Message.created_at')
     
     def __repr__(self):
         return f'<Conversation {self.id}>'
     
+    @classmethod
+    def record_message(cls, message, sender_role):
+        """
+        Update the inbox summary for a newly flushed message with a single atomic
+        UPDATE and bump the receiver's unread counter.
+        Runs in the caller's transaction; the caller commits.
+        """
+        unread_column = cls.provider_unread_count if sender_role == 'customer' else cls.customer_unread_count
+        return cls.query.filter_by(id=message.conversation_id).update({
+            cls.last_message_id: message.id,
+            cls.last_message_sender_id: message.sender_id,
+            cls.last_message_preview: message.content[:MESSAGE_PREVIEW_LENGTH],
+            cls.last_message_at: message.created_at,
+            unread_column: unread_column + 1
+        }, synchronize_session=False)
+    
+    @classmethod
+    def mark_read(cls, conversation_id, reader_role, up_to_message_id, read_count):
+        """
+        Advance the reader's read watermark to up_to_message_id (never backwards)
+        and take the newly read messages off their unread counter.
+        Runs in the caller's transaction; the caller commits.
+        """
+        if reader_role == 'customer':
+            unread_column, watermark_column = cls.customer_unread_count, cls.customer_last_read_message_id
+        else:
+            unread_column, watermark_column = cls.provider_unread_count, cls.provider_last_read_message_id
+        return cls.query.filter_by(id=conversation_id).update({
+            unread_column: db.case((unread_column > read_count, unread_column - read_count), else_=0),
+            watermark_column: db.case(
+                (db.or_(watermark_column.is_(None), watermark_column < up_to_message_id), up_to_message_id),
+                else_=watermark_column
+            )
+        }, synchronize_session=False)
+    
+    def unread_count_for(self, role):
+        """Get the unread counter of the 'customer' or 'provider' participant"""
+        if role == 'customer':
+            return self.customer_unread_count or 0
+        return self.provider_unread_count or 0
+    
+    def last_message_summary(self):
+        """Get the stored last-message preview, or None for an empty thread"""
+        if self.last_message_id is None:
+            return None
+        return {
+            'id': self.last_message_id,
+            'conversation_id': self.id,
+            'sender_id': self.last_message_sender_id,
+            'content': self.last_message_preview,
+            'created_at': self.last_message_at.isoformat() if self.last_message_at else None
+        }
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -26,4 +97,3 @@ class Conversation(db.Model):
             'last_message_at': self.last_message_at.isoformat() if self.last_message_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
-
@@ -12,6 +12,7 @@ class CreditTransaction(db.Model):
     amount = db.Column(db.Integer, nullable=False)  # Positive for purchase/refund, negative for deduction
     description = db.Column(db.String(200), nullable=True)  # e.g., 'Message to provider', 'Call reveal', 'Credit purchase'
     provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), nullable=True, index=True)  # For provider-related transactions
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=True, index=True)  # For job-related fees
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Relationships
@@ -29,6 +30,7 @@ class CreditTransaction(db.Model):
             'amount': self.amount,
             'description': self.description,
             'provider_id': self.provider_id,
+            'job_id': self.job_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
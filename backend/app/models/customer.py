@@ -24,6 +24,18 @@ class Customer(db.Model):
     def __repr__(self):
         return f'<Customer {self.name}>'
     
+    @classmethod
+    def spend_credits(cls, customer_id, amount, required=None):
+        """
+        Deduct amount credits only if the balance covers required (default amount),
+        with a single conditional UPDATE. Returns the row count (0 if insufficient).
+        Runs in the caller's transaction; the caller commits.
+        """
+        required = amount if required is None else required
+        return cls.query.filter(cls.id == customer_id, cls.credits >= required).update({
+            cls.credits: cls.credits - amount
+        }, synchronize_session=False)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -13,6 +13,7 @@ class Job(db.Model):
     description = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), nullable=False, index=True)
     status = db.Column(db.String(20), default='OPEN', nullable=False, index=True)  # OPEN, ACCEPTED, CLOSED, in_progress, completed, cancelled
+    is_emergency = db.Column(db.Boolean, default=False, nullable=False, index=True)
     offered_price = db.Column(db.Float, nullable=True)  # Price offered by customer
     price = db.Column(db.Float, nullable=True)  # Agreed price (after acceptance)
     location_address = db.Column(db.String(200), nullable=True)
@@ -23,6 +24,9 @@ class Job(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     
+    # Job board pages through OPEN jobs by (created_at, id)
+    __table_args__ = (db.Index('ix_jobs_status_created_at_id', 'status', 'created_at', 'id'),)
+    
     # Relationships
     bookings = db.relationship('Booking', backref='job', lazy='dynamic', cascade='all, delete-orphan')
     ratings = db.relationship('Rating', backref='job', lazy='dynamic', cascade='all, delete-orphan')
@@ -30,6 +34,24 @@ class Job(db.Model):
     def __repr__(self):
         return f'<Job {self.title}>'
     
+    @classmethod
+    def claim(cls, job_id, provider_id):
+        """
+        Compare-and-swap accept: assign the provider only if the job is still
+        OPEN and unassigned. Returns the row count (1 for the single winner).
+        Runs in the caller's transaction; the caller commits.
+        """
+        return cls.query.filter(
+            cls.id == job_id,
+            cls.status == 'OPEN',
+            cls.provider_id.is_(None)
+        ).update({
+            cls.status: 'ACCEPTED',
+            cls.provider_id: provider_id,
+            cls.price: cls.offered_price,
+            cls.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+    
     def to_dict(self, include_customer=False):
         data = {
             'id': self.id,
@@ -40,6 +62,7 @@ class Job(db.Model):
             'description': self.description,
             'category': self.category,
             'status': self.status,
+            'is_emergency': self.is_emergency,
             'offered_price': self.offered_price,
             'price': self.price,
             'location_address': self.location_address,
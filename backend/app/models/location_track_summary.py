@@ -0,0 +1,36 @@
+from extensions import db
+from datetime import datetime
+
+
+class LocationTrackSummary(db.Model):
+    """Compacted provider track (encoded polyline) replacing raw LocationUpdate rows past retention"""
+    __tablename__ = 'location_track_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), nullable=False, index=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=True, index=True)  # Null for tracks outside a booking
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    ended_at = db.Column(db.DateTime, nullable=False)
+    point_count = db.Column(db.Integer, nullable=False)
+    distance_km = db.Column(db.Float, default=0.0, nullable=False)
+    polyline = db.Column(db.Text, nullable=False)  # Google encoded polyline, 1e-5 degree precision
+    first_location_id = db.Column(db.Integer, nullable=False)  # Range of compacted location_updates ids
+    last_location_id = db.Column(db.Integer, nullable=False)
+    archive_path = db.Column(db.String(500), nullable=True)  # Compressed raw points, when archived
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<LocationTrackSummary {self.provider_id} {self.started_at}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'provider_id': self.provider_id,
+            'booking_id': self.booking_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'point_count': self.point_count,
+            'distance_km': self.distance_km,
+            'polyline': self.polyline,
+            'archive_path': self.archive_path
+        }
@@ -5,6 +5,10 @@ from datetime import datetime
 class Message(db.Model):
     """Message model for chat messages"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Thread history is keyset-paginated on (created_at, id)
+        db.Index('ix_messages_conversation_created_at_id', 'conversation_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False, index=True)
@@ -21,6 +25,19 @@ class Message(db.Model):
     def __repr__(self):
         return f'<Message {self.id}>'
     
+    @classmethod
+    def mark_read_up_to(cls, conversation_id, receiver_id, up_to_message_id):
+        """
+        Mark every unread message to receiver_id up to up_to_message_id as read
+        with a single UPDATE. Runs in the caller's transaction; returns the row count.
+        """
+        return cls.query.filter(
+            cls.conversation_id == conversation_id,
+            cls.receiver_id == receiver_id,
+            cls.is_read.is_(False),
+            cls.id <= up_to_message_id
+        ).update({cls.is_read: True}, synchronize_session=False)
+    
     def to_dict(self):
         return {
             'id': self.id,
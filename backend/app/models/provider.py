@@ -13,12 +13,23 @@ class Provider(db.Model):
     category = db.Column(db.String(50), nullable=False, index=True)  # e.g., 'plumber', 'electrician', 'carpenter'
     description = db.Column(db.Text, nullable=True)
     service_area = db.Column(db.String(200), nullable=True)  # Service area description
+    latitude = db.Column(db.Float, nullable=True)  # Home/base location
+    longitude = db.Column(db.Float, nullable=True)
     hourly_rate = db.Column(db.Float, nullable=True)
     documents = db.Column(db.Text, nullable=True)  # JSON string of document URLs
     verified = db.Column(db.Boolean, default=False, nullable=False, index=True)
     rating_avg = db.Column(db.Float, default=0.0, nullable=False)
     rating_count = db.Column(db.Integer, default=0, nullable=False)
+    # Incrementally maintained rating aggregates (see record_rating)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_1_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_2_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_3_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_4_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_5_count = db.Column(db.Integer, default=0, nullable=False)
     is_available = db.Column(db.Boolean, default=True, nullable=False, index=True)
+    emergency_active = db.Column(db.Boolean, default=False, nullable=False, index=True)  # Receives emergency jobs
+    credits = db.Column(db.Float, default=20.0, nullable=False)  # Earned from emergency service fees
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -31,16 +42,63 @@ class Provider(db.Model):
     def __repr__(self):
         return f'<Provider {self.name}>'
     
+    @classmethod
+    def record_rating(cls, provider_id, value):
+        """
+        Add one rating to the provider's aggregates with a single atomic UPDATE.
+        Runs in the caller's transaction; the caller commits.
+        """
+        star_column = getattr(cls, f'rating_{value}_count')
+        return cls.query.filter_by(id=provider_id).update({
+            cls.rating_sum: cls.rating_sum + value,
+            cls.rating_count: cls.rating_count + 1,
+            star_column: star_column + 1,
+            cls.rating_avg: db.cast(cls.rating_sum + value, db.Float) / (cls.rating_count + 1)
+        }, synchronize_session=False)
+    
+    @classmethod
+    def add_credits(cls, provider_id, amount):
+        """
+        Add credits with a single atomic UPDATE (no read-modify-write).
+        Runs in the caller's transaction; the caller commits.
+        """
+        return cls.query.filter_by(id=provider_id).update({
+            cls.credits: cls.credits + amount
+        }, synchronize_session=False)
+    
+    @staticmethod
+    def star_counts_for_average(average, count):
+        """
+        Per-star counts for `count` ratings averaging `average` (rounded), used
+        for seeded providers that have aggregates but no review rows
+        """
+        total = min(max(int(round((average or 0) * count)), count), 5 * count)
+        counts = {star: 0 for star in range(1, 6)}
+        if count:
+            base, extra = divmod(total, count)
+            counts[base] += count - extra
+            if extra:
+                counts[base + 1] += extra
+        return counts
+    
+    def rating_breakdown(self):
+        """Get {'1'..'5': count} from the stored aggregates"""
+        return {str(star): getattr(self, f'rating_{star}_count') or 0 for star in range(1, 6)}
+    
     def update_rating(self):
-        """Update average rating from all reviews"""
+        """Rebuild rating aggregates from all reviews (one GROUP BY query)"""
         from app.models.rating import Rating
-        ratings = Rating.query.filter_by(provider_id=self.id).all()
-        if ratings:
-            self.rating_avg = sum(r.rating for r in ratings) / len(ratings)
-            self.rating_count = len(ratings)
-        else:
-            self.rating_avg = 0.0
-            self.rating_count = 0
+        counts = dict(
+            db.session.query(Rating.rating, db.func.count(Rating.id))
+            .filter_by(provider_id=self.id)
+            .group_by(Rating.rating)
+            .all()
+        )
+        for star in range(1, 6):
+            setattr(self, f'rating_{star}_count', counts.get(star, 0))
+        self.rating_count = sum(counts.values())
+        self.rating_sum = sum(star * count for star, count in counts.items())
+        self.rating_avg = self.rating_sum / self.rating_count if self.rating_count else 0.0
         db.session.commit()
     
     def to_dict(self, include_contact=False):
@@ -56,9 +114,12 @@ class Provider(db.Model):
             'rating_avg': self.rating_avg,
             'rating_count': self.rating_count,
             'is_available': self.is_available,
+            'emergency_active': self.emergency_active,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
         if include_contact:
             data['phone'] = self.phone
+            data['latitude'] = self.latitude
+            data['longitude'] = self.longitude
         return data
 
@@ -0,0 +1,29 @@
+from extensions import db
+from datetime import datetime
+
+
+class RevokedToken(db.Model):
+    """Revoked JWT by jti, or (jti NULL) every token of a user issued up to revoked_at"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=True, index=True)
+    token_type = db.Column(db.String(10), nullable=True)  # 'access' or 'refresh'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    reason = db.Column(db.String(20), nullable=False, default='logout')  # 'logout' or 'suspended'
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # row can be purged after this
+    
+    def __repr__(self):
+        return f'<RevokedToken {self.jti or "user " + str(self.user_id)}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jti': self.jti,
+            'token_type': self.token_type,
+            'user_id': self.user_id,
+            'reason': self.reason,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
@@ -0,0 +1,223 @@
+"""
+Provider Geo Index
+In-process spatial grid over provider positions used for radius queries
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from extensions import db
+from app.providers.scoring import batch_haversine
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points using Haversine formula"""
+    R = EARTH_RADIUS_KM  # Earth radius in km
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    return R * c
+
+
+def parse_coordinate(value, name, bound):
+    """A float in [-bound, bound] (None stays None); ValueError naming the field otherwise"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f'{name} must be a number')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(number) or not -bound <= number <= bound:
+        raise ValueError(f'{name} must be between -{bound} and {bound}')
+    return number
+
+
+class ProviderGeoIndex:
+    """
+    Uniform latitude/longitude grid of provider positions.
+
+    Each cell spans `cell_size` degrees in both directions. A radius query only
+    visits the cells overlapping the search bounding box, so its cost depends on
+    how many providers are nearby rather than on the size of the providers table.
+    """
+
+    def __init__(self, cell_size=0.1):
+        self.cell_size = cell_size
+        self._columns = int(math.ceil(360 / cell_size))
+        self._cells = {}  # (row, col) -> set of provider ids
+        self._positions = {}  # provider id -> (lat, lng)
+        self._moved_during_rebuild = None  # provider id -> (lat, lng) or None, while a rebuild reads
+        self._lock = threading.RLock()
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell_for(self, lat, lng):
+        row = int(math.floor((lat + 90) / self.cell_size))
+        col = int(math.floor((lng + 180) / self.cell_size)) % self._columns
+        return row, col
+
+    def _insert(self, provider_id, lat, lng):
+        self._remove(provider_id)
+        self._positions[provider_id] = (lat, lng)
+        self._cells.setdefault(self._cell_for(lat, lng), set()).add(provider_id)
+
+    def _remove(self, provider_id):
+        position = self._positions.pop(provider_id, None)
+        if position is None:
+            return
+        cell = self._cell_for(*position)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(provider_id)
+            if not members:
+                self._cells.pop(cell, None)
+
+    def update(self, provider_id, lat, lng):
+        """Insert or move a provider in the index"""
+        position = None if lat is None or lng is None else (float(lat), float(lng))
+        with self._lock:
+            if position is None:
+                self._remove(provider_id)
+            else:
+                self._insert(provider_id, *position)
+            if self._moved_during_rebuild is not None:
+                self._moved_during_rebuild[provider_id] = position
+
+    def remove(self, provider_id):
+        """Drop a provider from the index"""
+        self.update(provider_id, None, None)
+
+    def get_position(self, provider_id):
+        """Get the indexed (lat, lng) of a provider, or None"""
+        with self._lock:
+            return self._positions.get(provider_id)
+
+    def rebuild(self, live_max_age=None):
+        """
+        Rebuild the index from the database
+
+        Provider home locations are loaded first; the latest LocationUpdate of
+        each provider overrides it when newer than `live_max_age`.
+        """
+        from app.models.provider import Provider
+        from app.models.location_update import LocationUpdate
+
+        with self._lock:
+            self._moved_during_rebuild = {}
+        positions = {}
+        home_rows = db.session.query(Provider.id, Provider.latitude, Provider.longitude).filter(
+            Provider.latitude.isnot(None),
+            Provider.longitude.isnot(None)
+        )
+        for provider_id, lat, lng in home_rows:
+            positions[provider_id] = (lat, lng)
+
+        # Location ids grow with time, so MAX(id) picks the latest ping per provider
+        latest = db.session.query(
+            func.max(LocationUpdate.id).label('location_id')
+        ).group_by(LocationUpdate.provider_id).subquery()
+        live_rows = db.session.query(
+            LocationUpdate.provider_id, LocationUpdate.latitude, LocationUpdate.longitude
+        ).join(latest, LocationUpdate.id == latest.c.location_id)
+        if live_max_age is not None:
+            live_rows = live_rows.filter(LocationUpdate.timestamp >= datetime.utcnow() - live_max_age)
+        for provider_id, lat, lng in live_rows:
+            positions[provider_id] = (lat, lng)
+
+        with self._lock:
+            # Moves made while the rows were read are newer than the rows
+            for provider_id, position in self._moved_during_rebuild.items():
+                if position is None:
+                    positions.pop(provider_id, None)
+                else:
+                    positions[provider_id] = position
+            self._moved_during_rebuild = None
+            self._cells = {}
+            self._positions = {}
+            for provider_id, (lat, lng) in positions.items():
+                self._insert(provider_id, lat, lng)
+            self.built_at = time.monotonic()
+
+    def _candidate_cells(self, lat, lng, radius_km):
+        """Cells overlapping the bounding box of the search circle"""
+        dlat = radius_km / KM_PER_DEGREE
+        min_row = int(math.floor((max(lat - dlat, -90) + 90) / self.cell_size))
+        max_row = int(math.floor((min(lat + dlat, 90) + 90) / self.cell_size))
+
+        widest_lat = min(abs(lat) + dlat, 90)
+        cos_lat = math.cos(math.radians(widest_lat))
+        if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            columns = range(self._columns)
+        else:
+            dlng = radius_km / (KM_PER_DEGREE * cos_lat)
+            min_col = int(math.floor((lng - dlng + 180) / self.cell_size))
+            max_col = int(math.floor((lng + dlng + 180) / self.cell_size))
+            columns = [col % self._columns for col in range(min_col, max_col + 1)]
+
+        if (max_row - min_row + 1) * len(columns) > len(self._cells):
+            # Searching wider than the populated area: scanning occupied cells is cheaper
+            return [cell for cell in self._cells if min_row <= cell[0] <= max_row]
+        return [(row, col) for row in range(min_row, max_row + 1) for col in columns]
+
+    def candidates(self, lat, lng, radius_km):
+        """Get (provider_id, lat, lng) for providers in cells overlapping the radius"""
+        with self._lock:
+            found = []
+            for cell in self._candidate_cells(lat, lng, radius_km):
+                for provider_id in self._cells.get(cell, ()):
+                    p_lat, p_lng = self._positions[provider_id]
+                    found.append((provider_id, p_lat, p_lng))
+            return found
+
+    def query_radius(self, lat, lng, radius_km):
+        """Get [(provider_id, distance_km)] within radius, nearest first"""
+        found = self.candidates(lat, lng, radius_km)
+        if not found:
+            return []
+        ids, lats, lngs = (np.array(column) for column in zip(*found))
+        distances = batch_haversine(lat, lng, lats, lngs)
+        inside = np.flatnonzero(distances <= radius_km)
+        ranked = inside[np.lexsort((ids[inside], distances[inside]))]
+        return list(zip(ids[ranked].tolist(), distances[ranked].tolist()))
+
+
+# Initialize a global index instance
+_provider_geo_index = None
+_index_lock = threading.Lock()
+
+
+def get_provider_geo_index():
+    """Get the provider geo index, rebuilding it when missing or stale"""
+    global _provider_geo_index
+    config = current_app.config
+    refresh_seconds = config.get('GEO_INDEX_REFRESH_SECONDS', 300)
+
+    with _index_lock:
+        if _provider_geo_index is None:
+            _provider_geo_index = ProviderGeoIndex(config.get('GEO_INDEX_CELL_SIZE_DEG', 0.1))
+        index = _provider_geo_index
+        stale = (
+            index.built_at is None or
+            (refresh_seconds and time.monotonic() - index.built_at > refresh_seconds)
+        )
+        if stale:
+            live_max_age = timedelta(minutes=config.get('GEO_INDEX_LIVE_MAX_AGE_MINUTES', 30))
+            index.rebuild(live_max_age=live_max_age)
+    return index
+
+
+def update_provider_position(provider_id, lat, lng):
+    """Keep an already built index current after a provider moves"""
+    if _provider_geo_index is not None:
+        _provider_geo_index.update(provider_id, lat, lng)
@@ -1,8 +1,7 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from app.providers import providers_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
-from app.models.user import User
 from app.models.provider import Provider
 from app.models.customer import Customer
 from app.models.rating import Rating
@@ -10,17 +9,14 @@ from app.models.job import Job
 from app.models.offer import Offer
 from app.models.credit_transaction import CreditTransaction
 from app.utils.decorators import provider_required, customer_required
-import math
-
-
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth radius in km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    return R * c
+from app.utils.pagination import encode_cursor, decode_cursor, check_cursor_numbers, get_page_size, InvalidCursor
+from app.utils.current_user import load_current_user
+from sqlalchemy import and_, or_
+from datetime import datetime
+from app.providers.geo_index import get_provider_geo_index, update_provider_position, parse_coordinate
+from app.providers.scoring import ProviderCandidates, get_ranking_weights
+from app.providers.search_index import get_provider_search_index, update_provider_document
+from app.admin.stats import get_provider_booking_counts
 
 
 def calculate_credits_per_text(rating):
@@ -51,10 +47,68 @@ def calculate_credits_for_call(rating):
         return 5
 
 
+def rank_providers(providers, index, lat, lng, radius, sort_by='distance'):
+    """Score providers in one vectorized pass and return [(position, distance_km, score)]"""
+    if not providers:
+        return []
+    candidates = ProviderCandidates.from_providers(providers, index.get_position)
+    return candidates.rank(lat, lng, radius, sort_by=sort_by, weights=get_ranking_weights(current_app.config))
+
+
+# Columns that can be requested with ?fields= on /search
+SEARCH_FIELDS = {
+    'id': Provider.id,
+    'user_id': Provider.user_id,
+    'name': Provider.name,
+    'category': Provider.category,
+    'description': Provider.description,
+    'service_area': Provider.service_area,
+    'hourly_rate': Provider.hourly_rate,
+    'verified': Provider.verified,
+    'rating_avg': Provider.rating_avg,
+    'rating_count': Provider.rating_count,
+    'is_available': Provider.is_available,
+    'created_at': Provider.created_at,
+    'phone': Provider.phone,
+    'latitude': Provider.latitude,
+    'longitude': Provider.longitude
+}
+
+# Columns always selected: needed for cursors, scoring and credits_per_text
+SEARCH_KEY_FIELDS = ['id', 'rating_avg', 'hourly_rate']
+
+
+def parse_search_fields(fields_param):
+    """Resolve ?fields= into the list of output fields (default: full public profile)"""
+    if not fields_param:
+        return list(SEARCH_FIELDS)
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in SEARCH_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def serialize_search_row(row, fields):
+    """Build the response dict for a projected provider row"""
+    data = {}
+    for field in fields:
+        value = getattr(row, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    data['credits_per_text'] = calculate_credits_per_text(row.rating_avg)
+    return data
+
+
 @providers_bp.route('/search', methods=['GET'])
 @jwt_required()
 def search_providers():
-    """Search providers with filters"""
+    """
+    Search providers with filters or full-text (keyset paginated, optional field projection)
+
+    Filter-only searches page in SQL. Text and lat/lng searches still load every
+    candidate row (all text matches / everything in the radius) and slice the
+    page in Python; their cursors are tied to the ordering that issued them.
+    """
     category = request.args.get('category')
     min_rating = request.args.get('min_rating', type=float)
     max_price = request.args.get('max_price', type=float)
@@ -65,13 +119,34 @@ def search_providers():
     radius = request.args.get('radius', type=float, default=50)  # km
     name = request.args.get('name', '').strip()
     location = request.args.get('location', '').strip()
+    sort_by = request.args.get('sort', 'distance')  # distance or relevance (with lat/lng)
+    mode = request.args.get('mode', 'filter')  # filter or text (full-text ranked)
+    text_query = request.args.get('q', '').strip()
+    limit = get_page_size()
+    
+    if mode == 'text':
+        # Free text replaces the name/location substring filters
+        text_query = text_query or ' '.join(part for part in (name, location) if part)
+        if not text_query:
+            return jsonify({'error': 'q is required for text search'}), 400
+        name = location = ''
+    elif mode != 'filter':
+        return jsonify({'error': 'Invalid mode. Must be filter or text'}), 400
     
-    # Start with all providers (not just verified)
-    query = Provider.query
+    try:
+        fields = parse_search_fields(request.args.get('fields'))
+        cursor = decode_cursor(request.args.get('cursor'))
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Start with all providers (not just verified), selecting only the
+    # requested columns instead of hydrating full ORM objects
+    selected = list(dict.fromkeys(SEARCH_KEY_FIELDS + fields))
+    query = db.session.query(*[SEARCH_FIELDS[field].label(field) for field in selected])
     
     # Only filter by verified if explicitly requested
     if verified_only:
-        query = query.filter_by(verified=True)
+        query = query.filter(Provider.verified.is_(True))
     
     # Name search (case-insensitive partial match)
     if name:
@@ -82,34 +157,95 @@ def search_providers():
         query = query.filter(Provider.service_area.ilike(f'%{location}%'))
     
     if category:
-        query = query.filter_by(category=category)
+        query = query.filter(Provider.category == category)
     if min_rating:
         query = query.filter(Provider.rating_avg >= min_rating)
     if max_price:
         query = query.filter(Provider.hourly_rate <= max_price)
     if available_only:
-        query = query.filter_by(is_available=True)
-    
-    providers = query.all()
-    
-    # Calculate distance if location provided and add credits_per_text
-    if lat and lng:
-        providers_with_distance = []
-        for provider in providers:
-            provider_data = provider.to_dict(include_contact=True)
-            provider_data['credits_per_text'] = calculate_credits_per_text(provider.rating_avg)
-            providers_with_distance.append(provider_data)
-        providers_list = providers_with_distance
-    else:
+        query = query.filter(Provider.is_available.is_(True))
+    
+    if mode == 'text' or (lat is not None and lng is not None):
+        # Candidates come from the in-process indexes; every matching row is
+        # loaded and the page is cut in Python from their ranking by (sort key, id)
+        ordering = 'text' if mode == 'text' else ('relevance' if sort_by == 'relevance' else 'distance')
+        if cursor is not None:
+            try:
+                cursor = check_cursor_numbers(cursor, kind=ordering)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+            if len(cursor) != (3 if ordering == 'relevance' else 2):
+                return jsonify({'error': 'Invalid cursor'}), 400
+        candidate_ids = None
+        text_scores = {}
+        if mode == 'text':
+            text_scores = dict(get_provider_search_index().search(text_query))
+            candidate_ids = set(text_scores)
+        if lat is not None and lng is not None:
+            index = get_provider_geo_index()
+            nearby_ids = {provider_id for provider_id, _ in index.query_radius(lat, lng, radius)}
+            candidate_ids = nearby_ids if candidate_ids is None else candidate_ids & nearby_ids
+        rows = query.filter(Provider.id.in_(list(candidate_ids))).all() if candidate_ids else []
+        
+        extras = {row.id: {} for row in rows}
+        geo_keys = {}
+        if lat is not None and lng is not None:
+            for position, distance, score in rank_providers(rows, index, lat, lng, radius, sort_by):
+                provider_id = rows[position].id
+                extras[provider_id]['distance_km'] = round(distance, 2)
+                extras[provider_id]['relevance_score'] = round(score, 4)
+                if sort_by == 'relevance':
+                    geo_keys[provider_id] = [round(-score, 6), round(distance, 6)]
+                else:
+                    geo_keys[provider_id] = [round(distance, 6)]
+        
+        ranked = []
+        for row in rows:
+            if mode == 'text':
+                extras[row.id]['text_score'] = round(text_scores[row.id], 4)
+                key = [round(-text_scores[row.id], 6), row.id]
+            else:
+                key = geo_keys[row.id] + [row.id]
+            ranked.append((key, row))
+        ranked.sort(key=lambda entry: entry[0])
+        if cursor is not None:
+            ranked = [entry for entry in ranked if entry[0] > cursor]
+        
+        page = ranked[:limit]
+        has_more = len(ranked) > limit
+        next_cursor = encode_cursor(ordering, *page[-1][0]) if has_more else None
+        
         providers_list = []
-        for provider in providers:
-            provider_data = provider.to_dict(include_contact=True)
-            provider_data['credits_per_text'] = calculate_credits_per_text(provider.rating_avg)
+        for _, row in page:
+            provider_data = serialize_search_row(row, fields)
+            provider_data.update(extras[row.id])
             providers_list.append(provider_data)
+    else:
+        # Keyset on (rating_avg, id), best rated first
+        if cursor is not None:
+            try:
+                cursor = check_cursor_numbers(cursor)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+            if len(cursor) != 2:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            last_rating, last_id = cursor
+            query = query.filter(or_(
+                Provider.rating_avg < last_rating,
+                and_(Provider.rating_avg == last_rating, Provider.id < last_id)
+            ))
+        rows = query.order_by(Provider.rating_avg.desc(), Provider.id.desc()).limit(limit + 1).all()
+        
+        page = rows[:limit]
+        has_more = len(rows) > limit
+        next_cursor = encode_cursor(page[-1].rating_avg, page[-1].id) if has_more else None
+        providers_list = [serialize_search_row(row, fields) for row in page]
     
     return jsonify({
         'providers': providers_list,
-        'count': len(providers_list)
+        'count': len(providers_list),
+        'next_cursor': next_cursor,
+        'has_more': has_more
     }), 200
 
 
@@ -127,14 +263,11 @@ def get_provider_details(provider_id):
     provider_data['reviews'] = [review.to_dict(include_customer_name=True) for review in reviews]
     
     # Get rating statistics
-    all_ratings = Rating.query.filter_by(provider_id=provider_id).all()
     rating_stats = {
-        'total': len(all_ratings),
+        'total': provider.rating_count,
         'average': provider.rating_avg,
-        'breakdown': {str(i): 0 for i in range(1, 6)}
+        'breakdown': provider.rating_breakdown()
     }
-    for rating in all_ratings:
-        rating_stats['breakdown'][str(rating.rating)] += 1
     
     provider_data['rating_stats'] = rating_stats
     
@@ -149,25 +282,29 @@ def get_nearby_providers():
     lng = request.args.get('lng', type=float)
     radius = request.args.get('radius', type=float, default=50)  # km
     category = request.args.get('category')
+    sort_by = request.args.get('sort', 'distance')  # distance or relevance
     
-    if not lat or not lng:
+    if lat is None or lng is None:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
     
-    query = Provider.query.filter_by(verified=True, is_available=True)
+    # Only providers in grid cells around the point are considered
+    index = get_provider_geo_index()
+    candidate_ids = [provider_id for provider_id, _ in index.query_radius(lat, lng, radius)]
+    if not candidate_ids:
+        return jsonify({'providers': [], 'count': 0}), 200
+    
+    query = Provider.query.filter_by(verified=True, is_available=True).filter(Provider.id.in_(candidate_ids))
     
     if category:
         query = query.filter_by(category=category)
     
     providers = query.all()
     
-    # Calculate distance for each provider
-    # Note: In a real app, you'd use geospatial queries or store provider locations
     nearby_providers = []
-    for provider in providers:
-        # For now, we'll include all providers since we don't have provider locations stored
-        # In production, you'd calculate actual distance
-        provider_data = provider.to_dict(include_contact=False)
-        provider_data['distance_km'] = None  # Would calculate from provider location
+    for position, distance, score in rank_providers(providers, index, lat, lng, radius, sort_by):
+        provider_data = providers[position].to_dict(include_contact=False)
+        provider_data['distance_km'] = round(distance, 2)
+        provider_data['relevance_score'] = round(score, 4)
         nearby_providers.append(provider_data)
     
     return jsonify({
@@ -182,8 +319,7 @@ def get_nearby_providers():
 @provider_required
 def get_my_profile():
     """Get provider's own profile"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -197,8 +333,7 @@ def get_my_profile():
 @provider_required
 def update_my_profile():
     """Update provider's own profile"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -206,6 +341,12 @@ def update_my_profile():
     data = request.get_json()
     provider = user.provider
     
+    try:
+        latitude = parse_coordinate(data.get('latitude'), 'latitude', 90)
+        longitude = parse_coordinate(data.get('longitude'), 'longitude', 180)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         if 'name' in data:
             provider.name = data['name']
@@ -219,8 +360,17 @@ def update_my_profile():
             provider.hourly_rate = data['hourly_rate']
         if 'category' in data:
             provider.category = data['category']
+        if 'latitude' in data:
+            provider.latitude = latitude
+        if 'longitude' in data:
+            provider.longitude = longitude
         
         db.session.commit()
+        
+        update_provider_document(provider)
+        if 'latitude' in data or 'longitude' in data:
+            update_provider_position(provider.id, provider.latitude, provider.longitude)
+        
         return jsonify({'message': 'Profile updated', 'profile': provider.to_dict(include_contact=True)}), 200
     
     except Exception as e:
@@ -233,8 +383,7 @@ def update_my_profile():
 @provider_required
 def update_availability():
     """Update provider availability status"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -260,8 +409,7 @@ def update_availability():
 @provider_required
 def get_stats():
     """Get provider statistics"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -269,18 +417,14 @@ def get_stats():
     provider = user.provider
     
     # Get booking statistics
-    total_bookings = Booking.query.filter_by(provider_id=provider.id).count()
-    pending_bookings = Booking.query.filter_by(provider_id=provider.id, status='pending').count()
-    confirmed_bookings = Booking.query.filter_by(provider_id=provider.id, status='confirmed').count()
-    in_progress_bookings = Booking.query.filter_by(provider_id=provider.id, status='in_progress').count()
-    completed_bookings = Booking.query.filter_by(provider_id=provider.id, status='completed').count()
+    bookings = get_provider_booking_counts(provider.id)
     
     stats = {
-        'total_bookings': total_bookings,
-        'pending': pending_bookings,
-        'confirmed': confirmed_bookings,
-        'in_progress': in_progress_bookings,
-        'completed': completed_bookings,
+        'total_bookings': sum(bookings.values()),
+        'pending': bookings.get('pending', 0),
+        'confirmed': bookings.get('confirmed', 0),
+        'in_progress': bookings.get('in_progress', 0),
+        'completed': bookings.get('completed', 0),
         'rating_avg': provider.rating_avg,
         'rating_count': provider.rating_count,
         'is_available': provider.is_available,
@@ -295,8 +439,7 @@ def get_stats():
 @provider_required
 def get_requests():
     """Get open service requests for provider's category"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -332,8 +475,7 @@ def get_requests():
 @provider_required
 def submit_offer(request_id):
     """Submit an offer on a service request"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.provider:
         return jsonify({'error': 'Provider profile not found'}), 404
@@ -389,8 +531,7 @@ def submit_offer(request_id):
 @customer_required
 def reveal_contact(provider_id):
     """Reveal provider contact number after credit deduction"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user.customer:
         return jsonify({'error': 'Customer profile not found'}), 404
@@ -0,0 +1,136 @@
+"""
+Provider Scoring Engine
+Vectorized distance and relevance scoring for batches of provider candidates
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+DEFAULT_WEIGHTS = {
+    'distance': 0.5,
+    'rating': 0.35,
+    'price': 0.15
+}
+
+
+def batch_haversine(lat, lng, lats, lngs):
+    """
+    Distance in km from one point to many points in a single vectorized pass
+
+    Args:
+        lat, lng (float): Origin point
+        lats, lngs (np.ndarray): Candidate coordinates
+
+    Returns:
+        np.ndarray: Distances in km, aligned with the inputs
+    """
+    lat1 = np.radians(lat)
+    lats2 = np.radians(lats)
+    dlat = lats2 - lat1
+    dlng = np.radians(lngs) - np.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lats2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class ProviderCandidates:
+    """Provider ids, coordinates, ratings and rates held in contiguous arrays"""
+
+    def __init__(self, ids, lats, lngs, ratings, hourly_rates):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+        self.ratings = np.ascontiguousarray(ratings, dtype=np.float64)
+        self.hourly_rates = np.ascontiguousarray(hourly_rates, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_providers(cls, providers, positions):
+        """
+        Build candidates from Provider rows
+
+        Args:
+            providers (list): Provider models (or rows with id, rating_avg, hourly_rate)
+            positions (callable): provider id -> (lat, lng)
+        """
+        count = len(providers)
+        ids = np.empty(count, dtype=np.int64)
+        lats = np.empty(count, dtype=np.float64)
+        lngs = np.empty(count, dtype=np.float64)
+        ratings = np.empty(count, dtype=np.float64)
+        rates = np.empty(count, dtype=np.float64)
+        for i, provider in enumerate(providers):
+            ids[i] = provider.id
+            lats[i], lngs[i] = positions(provider.id)
+            ratings[i] = provider.rating_avg or 0.0
+            rates[i] = np.nan if provider.hourly_rate is None else provider.hourly_rate
+        return cls(ids, lats, lngs, ratings, rates)
+
+    def distances(self, lat, lng):
+        """Distance in km from (lat, lng) to every candidate"""
+        return batch_haversine(lat, lng, self.lats, self.lngs)
+
+    def score(self, lat, lng, radius_km, weights=None):
+        """
+        Compute distances and a composite relevance score in [0, 1]
+
+        Closer, better rated and cheaper providers score higher. Unrated
+        providers and providers without an hourly rate get a neutral 0.5 for
+        that component.
+
+        Returns:
+            tuple: (distances, scores) arrays aligned with the candidates
+        """
+        weights = weights or DEFAULT_WEIGHTS
+        distances = self.distances(lat, lng)
+
+        if radius_km and radius_km > 0:
+            distance_score = np.clip(1.0 - distances / radius_km, 0.0, 1.0)
+        else:
+            distance_score = np.ones_like(distances)
+
+        rating_score = np.where(self.ratings > 0, self.ratings / 5.0, 0.5)
+
+        known_rates = ~np.isnan(self.hourly_rates)
+        price_score = np.full(len(self), 0.5)
+        if known_rates.any():
+            max_rate = self.hourly_rates[known_rates].max()
+            if max_rate > 0:
+                price_score[known_rates] = 1.0 - self.hourly_rates[known_rates] / max_rate
+
+        total_weight = sum(weights.values()) or 1.0
+        scores = (
+            weights.get('distance', 0) * distance_score +
+            weights.get('rating', 0) * rating_score +
+            weights.get('price', 0) * price_score
+        ) / total_weight
+        return distances, scores
+
+    def rank(self, lat, lng, radius_km, sort_by='distance', weights=None):
+        """
+        Rank candidates inside the radius
+
+        Args:
+            sort_by (str): 'distance' (nearest first) or 'relevance' (best score first)
+
+        Returns:
+            list: [(candidate_index, distance_km, score)] in ranked order
+        """
+        distances, scores = self.score(lat, lng, radius_km, weights)
+        inside = np.flatnonzero(distances <= radius_km)
+        if sort_by == 'relevance':
+            order = np.lexsort((self.ids[inside], distances[inside], -scores[inside]))
+        else:
+            order = np.lexsort((self.ids[inside], distances[inside]))
+        ranked = inside[order]
+        return list(zip(ranked.tolist(), distances[ranked].tolist(), scores[ranked].tolist()))
+
+
+def get_ranking_weights(config):
+    """Read ranking weights from app config"""
+    return {
+        'distance': config.get('RANKING_WEIGHT_DISTANCE', DEFAULT_WEIGHTS['distance']),
+        'rating': config.get('RANKING_WEIGHT_RATING', DEFAULT_WEIGHTS['rating']),
+        'price': config.get('RANKING_WEIGHT_PRICE', DEFAULT_WEIGHTS['price'])
+    }
@@ -0,0 +1,246 @@
+"""
+Provider Search Index
+In-process inverted index over provider profiles with prefix matching and BM25 ranking
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from flask import current_app
+from extensions import db
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Matches in the name count more than matches in the free-text description
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'service_area': 1.5,
+    'description': 1.0
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 50  # most common terms sharing the prefix
+MIN_PREFIX_LENGTH = 2  # shorter prefixes only match the exact term
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a string"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class ProviderSearchIndex:
+    """
+    Inverted index of provider name, category, service_area and description.
+
+    Each term maps to {provider_id: weighted term frequency}. Queries match
+    every query term (the last one, or all of them, as a prefix) and rank
+    providers with BM25 over the field-weighted frequencies.
+    """
+
+    def __init__(self):
+        self._postings = {}  # term -> {provider_id: weighted tf}
+        self._doc_terms = {}  # provider_id -> set of terms
+        self._doc_lengths = {}  # provider_id -> weighted token count
+        self._total_length = 0.0
+        self._sorted_terms = []
+        self._terms_dirty = False
+        self._changed_during_rebuild = None  # provider_id -> fields or None, while a rebuild reads
+        self._lock = threading.RLock()
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def _add(self, provider_id, fields):
+        self._remove(provider_id)
+        frequencies = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(field)):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+                length += weight
+        if not frequencies:
+            return
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._terms_dirty = True
+            postings[provider_id] = frequency
+        self._doc_terms[provider_id] = set(frequencies)
+        self._doc_lengths[provider_id] = length
+        self._total_length += length
+
+    def _remove(self, provider_id):
+        terms = self._doc_terms.pop(provider_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(provider_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(provider_id, None)
+            if not postings:
+                self._postings.pop(term, None)
+                self._terms_dirty = True
+
+    def update(self, provider_id, name=None, description=None, category=None, service_area=None):
+        """Index (or re-index) one provider profile"""
+        fields = {
+            'name': name,
+            'description': description,
+            'category': category,
+            'service_area': service_area
+        }
+        with self._lock:
+            self._add(provider_id, fields)
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[provider_id] = fields
+
+    def remove(self, provider_id):
+        """Drop a provider from the index"""
+        with self._lock:
+            self._remove(provider_id)
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[provider_id] = None
+
+    def rebuild(self):
+        """Rebuild the index from the providers table"""
+        from app.models.provider import Provider
+
+        with self._lock:
+            self._changed_during_rebuild = {}
+        documents = {
+            provider_id: {
+                'name': name,
+                'description': description,
+                'category': category,
+                'service_area': service_area
+            }
+            for provider_id, name, description, category, service_area in db.session.query(
+                Provider.id, Provider.name, Provider.description, Provider.category, Provider.service_area
+            )
+        }
+        with self._lock:
+            # Profile changes made while the rows were read are newer than the rows
+            for provider_id, fields in self._changed_during_rebuild.items():
+                if fields is None:
+                    documents.pop(provider_id, None)
+                else:
+                    documents[provider_id] = fields
+            self._changed_during_rebuild = None
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._total_length = 0.0
+            for provider_id, fields in documents.items():
+                self._add(provider_id, fields)
+            self._terms_dirty = True
+            self.built_at = time.monotonic()
+
+    def _expand(self, token, prefix):
+        """Index terms matched by a query token"""
+        if not prefix or len(token) < MIN_PREFIX_LENGTH:
+            return [token] if token in self._postings else []
+        if self._terms_dirty:
+            self._sorted_terms = sorted(self._postings)
+            self._terms_dirty = False
+        start = bisect.bisect_left(self._sorted_terms, token)
+        end = bisect.bisect_left(self._sorted_terms, token[:-1] + chr(ord(token[-1]) + 1))
+        expansions = self._sorted_terms[start:end]
+        if len(expansions) > MAX_PREFIX_EXPANSIONS:
+            # Keep the terms most providers use rather than the alphabetically first ones
+            expansions = heapq.nlargest(MAX_PREFIX_EXPANSIONS, expansions,
+                                        key=lambda term: len(self._postings[term]))
+        return expansions
+
+    def _bm25(self, term, provider_id, frequency, doc_count, avg_length):
+        doc_frequency = len(self._postings[term])
+        idf = math.log(1 + (doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+        length_norm = 1 - BM25_B + BM25_B * self._doc_lengths[provider_id] / avg_length
+        return idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+
+    def search(self, query, prefix='last'):
+        """
+        Find providers matching every query term
+
+        Args:
+            query (str): Free text typed by the user
+            prefix (str): 'last' (only the last term is a prefix, as typed),
+                'all' or 'none'
+
+        Returns:
+            list: [(provider_id, score)], best match first
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+
+            scores = None
+            for position, token in enumerate(tokens):
+                is_prefix = prefix == 'all' or (prefix == 'last' and position == len(tokens) - 1)
+                token_scores = {}
+                for term in self._expand(token, is_prefix):
+                    for provider_id, frequency in self._postings[term].items():
+                        score = self._bm25(term, provider_id, frequency, doc_count, avg_length)
+                        # Several expansions of one prefix count once, best one wins
+                        if score > token_scores.get(provider_id, 0.0):
+                            token_scores[provider_id] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        provider_id: score + token_scores[provider_id]
+                        for provider_id, score in scores.items()
+                        if provider_id in token_scores
+                    }
+                if not scores:
+                    return []
+
+        return sorted(scores.items(), key=lambda match: (-match[1], match[0]))
+
+
+# Initialize a global index instance
+_provider_search_index = None
+_index_lock = threading.Lock()
+
+
+def get_provider_search_index():
+    """Get the provider search index, rebuilding it when missing or stale"""
+    global _provider_search_index
+    refresh_seconds = current_app.config.get('SEARCH_INDEX_REFRESH_SECONDS', 300)
+
+    with _index_lock:
+        if _provider_search_index is None:
+            _provider_search_index = ProviderSearchIndex()
+        index = _provider_search_index
+        stale = (
+            index.built_at is None or
+            (refresh_seconds and time.monotonic() - index.built_at > refresh_seconds)
+        )
+        if stale:
+            index.rebuild()
+    return index
+
+
+def update_provider_document(provider):
+    """Keep an already built index current after a profile change"""
+    if _provider_search_index is not None:
+        _provider_search_index.update(
+            provider.id,
+            name=provider.name,
+            description=provider.description,
+            category=provider.category,
+            service_area=provider.service_area
+        )
@@ -1,13 +1,13 @@
 from flask import request, jsonify
 from app.ratings import ratings_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
 from datetime import datetime
-from app.models.user import User
 from app.models.booking import Booking
 from app.models.rating import Rating
 from app.models.provider import Provider
 from app.utils.decorators import customer_required
+from app.utils.current_user import load_current_user
 
 
 @ratings_bp.route('/bookings/<int:booking_id>', methods=['POST'], endpoint='submit_review')
@@ -17,8 +17,7 @@ def submit_review(booking_id):
     """Submit a review for a completed booking"""
     booking = Booking.query.get_or_404(booking_id)
     
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     # Check if booking belongs to customer
     if booking.customer_id != user.customer.id:
@@ -40,7 +39,8 @@ def submit_review(booking_id):
     if not rating_value:
         return jsonify({'error': 'Rating is required'}), 400
     
-    if not isinstance(rating_value, int) or rating_value < 1 or rating_value > 5:
+    # bool is an int subclass: True would count as a 1-star rating
+    if not isinstance(rating_value, int) or isinstance(rating_value, bool) or rating_value < 1 or rating_value > 5:
         return jsonify({'error': 'Rating must be between 1 and 5'}), 400
     
     try:
@@ -53,12 +53,10 @@ def submit_review(booking_id):
             review_text=review_text
         )
         db.session.add(review)
-        db.session.commit()
         
-        # Update provider rating
-        provider = Provider.query.get(booking.provider_id)
-        if provider:
-            provider.update_rating()
+        # Update provider rating aggregates in the same transaction
+        Provider.record_rating(booking.provider_id, rating_value)
+        db.session.commit()
         
         return jsonify({
             'message': 'Review submitted successfully',
@@ -92,16 +90,11 @@ def get_rating_stats(provider_id):
     """Get rating statistics for a provider"""
     provider = Provider.query.get_or_404(provider_id)
     
-    all_ratings = Rating.query.filter_by(provider_id=provider_id).all()
-    
     rating_stats = {
-        'total': len(all_ratings),
+        'total': provider.rating_count,
         'average': provider.rating_avg,
-        'breakdown': {str(i): 0 for i in range(1, 6)}
+        'breakdown': provider.rating_breakdown()
     }
     
-    for rating in all_ratings:
-        rating_stats['breakdown'][str(rating.rating)] += 1
-    
     return jsonify(rating_stats), 200
 
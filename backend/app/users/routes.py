@@ -1,6 +1,6 @@
 from flask import request, jsonify
 from app.users import users_bp
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
 from app.models.user import User
 from app.models.customer import Customer
@@ -8,14 +8,16 @@ from app.models.provider import Provider
 from app.models.job import Job
 from app.models.booking import Booking
 from app.models.rating import Rating
+from app.utils.current_user import load_current_user
+from app.providers.geo_index import update_provider_position, parse_coordinate
+from app.providers.search_index import update_provider_document
 
 
 @users_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
     """Get current user's profile"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -35,8 +37,7 @@ def get_profile():
 @jwt_required()
 def update_profile():
     """Update current user's profile"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -57,6 +58,11 @@ def update_profile():
         
         elif user.role == 'provider' and user.provider:
             provider = user.provider
+            try:
+                latitude = parse_coordinate(data.get('latitude'), 'latitude', 90)
+                longitude = parse_coordinate(data.get('longitude'), 'longitude', 180)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             if 'name' in data:
                 provider.name = data['name']
             if 'phone' in data:
@@ -69,7 +75,14 @@ def update_profile():
                 provider.hourly_rate = data['hourly_rate']
             if 'category' in data:
                 provider.category = data['category']
+            if 'latitude' in data:
+                provider.latitude = latitude
+            if 'longitude' in data:
+                provider.longitude = longitude
             db.session.commit()
+            update_provider_document(provider)
+            if 'latitude' in data or 'longitude' in data:
+                update_provider_position(provider.id, provider.latitude, provider.longitude)
             return jsonify({'message': 'Profile updated', 'profile': provider.to_dict()}), 200
         
         return jsonify({'error': 'Profile not found'}), 404
@@ -83,8 +96,7 @@ def update_profile():
 @jwt_required()
 def get_job_history():
     """Get customer's job history"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user or user.role != 'customer':
         return jsonify({'error': 'Customer access required'}), 403
@@ -103,8 +115,7 @@ def get_job_history():
 @jwt_required()
 def get_ratings():
     """Get user's ratings (given or received)"""
-    current_user = get_jwt_identity()
-    user = User.query.get(current_user['id'])
+    user = load_current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -0,0 +1,73 @@
+"""
+Current User Loader
+The authenticated user and its role profile, loaded once per request with a joined
+load, plus an optional short-TTL cache of the ids hot endpoints need
+"""
+from collections import namedtuple
+from flask import g, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.orm import joinedload
+from app.utils.cache import TTLCache
+
+CurrentIdentity = namedtuple('CurrentIdentity', 'user_id role customer_id provider_id is_active')
+
+_identity_cache = TTLCache(maxsize=10000, ttl=30)
+
+
+def load_current_user():
+    """
+    Get the authenticated User with its customer/provider profile joined in
+
+    The first call in a request runs one query; later calls (and user.customer /
+    user.provider) reuse it. Returns None if the user no longer exists.
+    """
+    if 'current_user' not in g:
+        from app.models.user import User
+
+        identity = get_jwt_identity() or {}
+        user = None
+        if identity.get('id') is not None:
+            query = User.query
+            if identity.get('role') == 'customer':
+                query = query.options(joinedload(User.customer))
+            elif identity.get('role') == 'provider':
+                query = query.options(joinedload(User.provider))
+            user = query.filter(User.id == identity['id']).first()
+        g.current_user = user
+    return g.current_user
+
+
+def get_current_identity():
+    """
+    Get (user_id, role, customer_id, provider_id, is_active) of the authenticated user
+
+    Cached across requests for CURRENT_USER_CACHE_SECONDS (0 disables), so hot
+    endpoints that only need the profile ids skip the users table entirely.
+    Returns None if the user no longer exists.
+    """
+    if 'current_identity' not in g:
+        user_id = (get_jwt_identity() or {}).get('id')
+        identity = _identity_cache.get(user_id) if user_id is not None else None
+        if identity is None:
+            user = load_current_user()
+            if user is not None:
+                # Only the role's own profile is joined in; don't lazy-load the other one
+                customer = user.customer if user.role == 'customer' else None
+                provider = user.provider if user.role == 'provider' else None
+                identity = CurrentIdentity(
+                    user_id=user.id,
+                    role=user.role,
+                    customer_id=customer.id if customer else None,
+                    provider_id=provider.id if provider else None,
+                    is_active=user.is_active
+                )
+                ttl = current_app.config.get('CURRENT_USER_CACHE_SECONDS', 30)
+                if ttl:
+                    _identity_cache.set(user_id, identity, ttl)
+        g.current_identity = identity
+    return g.current_identity
+
+
+def invalidate_current_identity(user_id):
+    """Forget a user's cached identity after its role, status or profile changes"""
+    _identity_cache.pop(user_id)
@@ -0,0 +1,54 @@
+"""
+Database offloading for cooperative Socket.IO servers
+Under eventlet/gevent a blocking database call stalls every connection of the process,
+so handlers run their DB work on a bounded pool of OS threads instead
+"""
+from flask import current_app
+from extensions import socketio
+
+COOPERATIVE_MODES = ('eventlet', 'gevent')
+
+
+def configure_db_offload(app):
+    """Size the thread pool used by run_db_task (call after socketio.init_app)"""
+    pool_size = app.config.get('DB_OFFLOAD_POOL_SIZE', 10)
+    if socketio.async_mode == 'eventlet':
+        from eventlet import tpool
+        tpool.set_num_threads(pool_size)
+    elif socketio.async_mode == 'gevent':
+        from gevent import get_hub
+        get_hub().threadpool.maxsize = pool_size
+
+
+def offload_enabled():
+    """Whether DB work is moved off the event loop"""
+    return socketio.async_mode in COOPERATIVE_MODES
+
+
+def run_db_task(func, *args, **kwargs):
+    """
+    Run blocking database work and return its result
+
+    In eventlet/gevent mode func runs on the bounded thread pool inside its own
+    app context (and so its own SQLAlchemy session, removed when it returns);
+    the calling greenlet yields until it finishes. In threading mode each
+    connection already has its own thread, so func runs inline.
+
+    func must commit its own writes and return plain data, not ORM objects.
+    Emit from the caller, after run_db_task returns.
+    """
+    if not offload_enabled():
+        return func(*args, **kwargs)
+
+    app = current_app._get_current_object()
+
+    def task():
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    if socketio.async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(task)
+
+    from gevent import get_hub
+    return get_hub().threadpool.apply(task)
@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import get_jwt_identity
+from app.utils.current_user import load_current_user
 
 
 def customer_required(f):
@@ -10,6 +11,9 @@ def customer_required(f):
         current_user = get_jwt_identity()
         if current_user.get('role') != 'customer':
             return jsonify({'error': 'Customer access required'}), 403
+        # Load the user and customer profile once for the whole request (g.current_user)
+        if load_current_user() is None:
+            return jsonify({'error': 'User not found'}), 404
         return f(*args, **kwargs)
     return decorated_function
 
@@ -21,6 +25,9 @@ def provider_required(f):
         current_user = get_jwt_identity()
         if current_user.get('role') != 'provider':
             return jsonify({'error': 'Provider access required'}), 403
+        # Load the user and provider profile once for the whole request (g.current_user)
+        if load_current_user() is None:
+            return jsonify({'error': 'User not found'}), 404
         return f(*args, **kwargs)
     return decorated_function
 
@@ -0,0 +1,80 @@
+"""
+Cursor (keyset) pagination helpers
+Cursors are opaque URL-safe tokens wrapping the sort key of the last row on a page
+"""
+import base64
+import json
+from datetime import datetime
+from flask import request
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(*values):
+    """Encode sort key values (datetimes become ISO strings) into a cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size=None):
+    """
+    Decode a cursor back into its list of sort key values
+
+    Args:
+        cursor (str): Cursor from a previous page, or None
+        size (int, optional): Expected number of values
+
+    Returns:
+        list or None: Sort key values, None when no cursor was given
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def check_cursor_numbers(values, kind=None):
+    """
+    Validate a decoded cursor of numeric sort keys ending in an integer id
+
+    Args:
+        values (list): Decoded cursor, [kind, *keys, id] when kind is given
+        kind (str, optional): Ordering the cursor must have been issued for
+
+    Returns:
+        list: The sort keys and id (kind stripped)
+    """
+    if kind is not None:
+        if not values or values[0] != kind:
+            raise InvalidCursor('Cursor does not match the requested sort')
+        values = values[1:]
+    numbers_ok = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+    if not values or not numbers_ok or not isinstance(values[-1], int):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def parse_cursor_datetime(value):
+    """Parse an ISO datetime stored in a cursor"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor timestamp')
+
+
+def get_page_size(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read ?limit= from the request, clamped to [1, maximum]"""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
@@ -0,0 +1,128 @@
+"""
+Socket.IO connection authentication
+The JWT is verified once per connection and the resolved identity is cached per sid
+"""
+import threading
+import time
+from flask import request
+from flask_jwt_extended import decode_token
+from app.models.user import User
+from app.auth.revocation import token_revocations
+from app.utils.db_offload import run_db_task
+
+
+class SocketIdentity:
+    """Verified user, role and profile ids of one Socket.IO connection"""
+
+    def __init__(self, user_id, role, customer_id=None, provider_id=None, name=None, expires_at=None,
+                 jti=None, issued_at=None):
+        self.user_id = user_id
+        self.role = role
+        self.customer_id = customer_id
+        self.provider_id = provider_id
+        self.name = name
+        self.expires_at = expires_at
+        self.jti = jti
+        self.issued_at = issued_at
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    @property
+    def revoked(self):
+        return token_revocations.is_revoked(self.jti, self.user_id, self.issued_at)
+
+    def can_access_conversation(self, conversation):
+        """Same participant check as the REST routes"""
+        if self.role == 'customer':
+            return conversation.customer_id == self.customer_id
+        if self.role == 'provider':
+            return conversation.provider_id == self.provider_id
+        return True
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'role': self.role,
+            'customer_id': self.customer_id,
+            'provider_id': self.provider_id
+        }
+
+
+# sid -> SocketIdentity, entries live until disconnect or token expiry
+_identities = {}
+_identities_lock = threading.Lock()
+
+
+def authenticate_token(token):
+    """
+    Verify a JWT and resolve its user with one lookup
+
+    Returns:
+        SocketIdentity or None: None when the user no longer exists or the token was revoked
+
+    Raises:
+        Any flask_jwt_extended / PyJWT error for an invalid or expired token
+    """
+    decoded = decode_token(token)
+    user = User.query.get(decoded['sub']['id'])
+    if not user:
+        return None
+
+    identity = SocketIdentity(user.id, user.role, expires_at=decoded.get('exp'),
+                              jti=decoded.get('jti'), issued_at=decoded.get('iat'))
+    if identity.revoked:
+        return None
+    if user.role == 'customer' and user.customer:
+        identity.customer_id = user.customer.id
+        identity.name = user.customer.name
+    elif user.role == 'provider' and user.provider:
+        identity.provider_id = user.provider.id
+        identity.name = user.provider.name
+    return identity
+
+
+def connect_socket(sid, token):
+    """Authenticate a connection and cache its identity under sid"""
+    identity = run_db_task(authenticate_token, token)
+    if identity is not None:
+        with _identities_lock:
+            _identities[sid] = identity
+    return identity
+
+
+def disconnect_socket(sid):
+    """Forget a connection's cached identity"""
+    with _identities_lock:
+        _identities.pop(sid, None)
+
+
+def get_socket_identity(data=None):
+    """
+    Get the identity of the current Socket.IO connection
+
+    Uses the identity cached at connect time. Clients that did not send a
+    token on connect (or whose token expired or was revoked) can still pass
+    one in the event payload; it is verified once and cached for the
+    following events.
+
+    Returns:
+        SocketIdentity or None
+    """
+    sid = request.sid
+    identity = _identities.get(sid)
+    if identity is not None and (identity.expired or identity.revoked):
+        disconnect_socket(sid)
+        identity = None
+
+    if identity is None:
+        token = (data or {}).get('token') if isinstance(data, dict) else None
+        if token:
+            identity = connect_socket(sid, token)
+    return identity
+
+
+def active_socket_count():
+    """Number of connections with a cached identity"""
+    return len(_identities)
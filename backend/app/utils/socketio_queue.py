@@ -0,0 +1,232 @@
+"""
+Socket.IO message queue backends
+Lets rooms and emits span several worker processes by relaying them through a pub/sub channel
+"""
+import pickle
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from urllib.parse import urlparse
+from socketio import PubSubManager
+
+DEFAULT_BROKER_HOST = '127.0.0.1'
+DEFAULT_BROKER_PORT = 6390
+
+
+def parse_broker_url(url):
+    """Get the (host, port) address of a local://host:port broker URL"""
+    parsed = urlparse(url)
+    return parsed.hostname or DEFAULT_BROKER_HOST, parsed.port or DEFAULT_BROKER_PORT
+
+
+def _authkey_bytes(authkey):
+    if authkey is None or isinstance(authkey, bytes):
+        return authkey
+    return authkey.encode('utf-8')
+
+
+class SocketIOBroker:
+    """
+    Minimal pub/sub broker over multiprocessing.connection.
+
+    Stands in for Redis when running several workers on one box or in tests.
+    Every client says ('subscribe', channel) or ('publish', channel) when it
+    connects; each payload a publisher sends is relayed to every subscriber of
+    its channel.
+    """
+
+    def __init__(self, address=(DEFAULT_BROKER_HOST, DEFAULT_BROKER_PORT), authkey=None):
+        self._listener = Listener(address, authkey=_authkey_bytes(authkey))
+        self._subscribers = {}  # channel -> list of (connection, send lock)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.published = 0
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    def serve_forever(self):
+        """Accept clients until close() is called"""
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed:
+                    break
+                continue
+            except Exception:
+                # Failed authentication handshake
+                continue
+            threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+
+    def start(self):
+        """Serve from a daemon thread, returning the thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+
+    def _handle_client(self, conn):
+        try:
+            role, channel = conn.recv()
+        except (EOFError, OSError, ValueError, TypeError):
+            conn.close()
+            return
+
+        if role == 'subscribe':
+            with self._lock:
+                self._subscribers.setdefault(channel, []).append((conn, threading.Lock()))
+            return
+
+        try:
+            while True:
+                self._fan_out(channel, conn.recv_bytes())
+        except (EOFError, OSError):
+            conn.close()
+
+    def _fan_out(self, channel, payload):
+        self.published += 1
+        dead = []
+        for subscriber in list(self._subscribers.get(channel, ())):
+            conn, send_lock = subscriber
+            try:
+                with send_lock:
+                    conn.send_bytes(payload)
+            except (OSError, ValueError):
+                dead.append(subscriber)
+        if dead:
+            with self._lock:
+                subscribers = self._subscribers.get(channel, [])
+                for subscriber in dead:
+                    if subscriber in subscribers:
+                        subscribers.remove(subscriber)
+                    subscriber[0].close()
+
+
+class LocalPubSubManager(PubSubManager):
+    """
+    Client manager backed by a SocketIOBroker (local://host:port).
+
+    Same role as python-socketio's RedisManager: each worker publishes its
+    emits to the broker and a background task applies the emits published
+    by the other workers to its own clients.
+    """
+    name = 'local'
+
+    def __init__(self, url='local://', channel='flask-socketio', write_only=False, logger=None, authkey=None):
+        self.address = parse_broker_url(url)
+        self.authkey = _authkey_bytes(authkey)
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _connect(self, role):
+        conn = Client(self.address, authkey=self.authkey)
+        conn.send((role, self.channel))
+        return conn
+
+    def _publish(self, data):
+        payload = pickle.dumps(data)
+        with self._publish_lock:
+            # One reconnect attempt if the broker was restarted
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect('publish')
+                    self._publisher.send_bytes(payload)
+                    return
+                except (OSError, EOFError):
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                conn = self._connect('subscribe')
+                retry_sleep = 1
+                while True:
+                    yield conn.recv_bytes()
+            except (OSError, EOFError):
+                self._get_logger().error(
+                    'Cannot receive from Socket.IO broker %s:%s, retrying in %ss',
+                    self.address[0], self.address[1], retry_sleep
+                )
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+# channel -> list of subscriber queues, shared by every memory:// manager in this process
+_memory_channels = {}
+_memory_lock = threading.Lock()
+
+
+class InProcessPubSubManager(PubSubManager):
+    """
+    Client manager relaying through in-process queues (memory://).
+
+    Lets tests run several Socket.IO servers in one process and check that
+    emits reach clients on any of them, without a broker.
+    """
+    name = 'memory'
+
+    def __init__(self, url='memory://', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue = queue.Queue()
+        if not write_only:
+            with _memory_lock:
+                _memory_channels.setdefault(channel, []).append(self._queue)
+
+    def _publish(self, data):
+        # Pickle so subscribers never share mutable payloads with the sender
+        payload = pickle.dumps(data)
+        for subscriber in list(_memory_channels.get(self.channel, ())):
+            subscriber.put(payload)
+
+    def _listen(self):
+        while True:
+            yield self._queue.get()
+
+
+def get_socketio_queue_options(config):
+    """
+    Get SocketIO.init_app() keyword arguments for the configured message queue
+
+    Returns:
+        dict: {} for a single worker, {'client_manager': ...} for local:// and
+            memory://, {'message_queue': url, 'channel': ...} otherwise
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': LocalPubSubManager(
+            url, channel=channel, authkey=config.get('SOCKETIO_BROKER_AUTHKEY')
+        )}
+    if url.startswith('memory://'):
+        return {'client_manager': InProcessPubSubManager(url, channel=channel)}
+    return {'message_queue': url, 'channel': channel}
+
+
+def create_queue_emitter(config):
+    """
+    Get a write-only manager that emits to clients on every worker from
+    outside a server process (scripts, background jobs)
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if url.startswith('local://'):
+        return LocalPubSubManager(
+            url, channel=channel, write_only=True, authkey=config.get('SOCKETIO_BROKER_AUTHKEY')
+        )
+    if url.startswith('memory://'):
+        return InProcessPubSubManager(url, channel=channel, write_only=True)
+    from flask_socketio import SocketIO
+    return SocketIO(message_queue=url, channel=channel)
@@ -0,0 +1,170 @@
+"""
+Stress test: hundreds of providers accepting the same job at the same moment
+Exactly one accept must win; the emergency fee must move exactly once (app/jobs/claims.py)
+Runs against a throwaway SQLite file database
+Run: python benchmark_accept_concurrency.py [providers] [rounds]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix='quickfix-accept-'), 'accept.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_FILE}'
+os.environ['RATELIMIT_ENABLED'] = 'false'
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from extensions import db
+from app.models import User, Customer, Provider, Job, Booking, CreditTransaction
+
+CATEGORY = 'plumber'
+OFFERED_PRICE = 100.0
+CUSTOMER_CREDITS = 35
+PROVIDER_CREDITS = 20.0
+
+
+def setup(app, provider_count):
+    """Create one customer and provider_count providers; returns (customer_id, tokens)"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        customer_user = User(email='customer@stress.test', password_hash='x', role='customer')
+        db.session.add(customer_user)
+        db.session.flush()
+        customer = Customer(user_id=customer_user.id, name='Stress Customer', credits=CUSTOMER_CREDITS)
+        db.session.add(customer)
+
+        provider_users = []
+        for index in range(provider_count):
+            user = User(email=f'provider{index}@stress.test', password_hash='x', role='provider')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Provider(
+                user_id=user.id, name=f'Provider {index}', category=CATEGORY,
+                is_available=True, emergency_active=True, credits=PROVIDER_CREDITS
+            ))
+            provider_users.append(user)
+        db.session.commit()
+
+        tokens = [
+            create_access_token(identity={'id': user.id, 'email': user.email, 'role': 'provider'})
+            for user in provider_users
+        ]
+        return customer.id, tokens
+
+
+def create_job(app, customer_id, emergency):
+    with app.app_context():
+        job = Job(
+            customer_id=customer_id, title='Burst pipe', description='Water everywhere',
+            category=CATEGORY, status='OPEN', is_emergency=emergency, offered_price=OFFERED_PRICE
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def fire(app, url, tokens):
+    """POST url once per token, all released at the same instant; returns (status counts, seconds)"""
+    barrier = threading.Barrier(len(tokens))
+    statuses = []
+    statuses_lock = threading.Lock()
+
+    def accept(token):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post(url, headers={'Authorization': f'Bearer {token}'})
+        with statuses_lock:
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=accept, args=(token,)) for token in tokens]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return Counter(statuses), time.perf_counter() - started
+
+
+def check(app, job_id, customer_id, emergency, credits_before):
+    """Verify the job, booking and customer fee after a burst; returns a list of problems"""
+    problems = []
+    with app.app_context():
+        job = Job.query.get(job_id)
+        bookings = Booking.query.filter_by(job_id=job_id).count()
+        if job.status != 'ACCEPTED' or job.provider_id is None:
+            problems.append(f'job is {job.status} with provider {job.provider_id}')
+        if bookings != 1:
+            problems.append(f'{bookings} bookings')
+        if emergency:
+            fee = OFFERED_PRICE * 0.05
+            customer_credits = Customer.query.get(customer_id).credits
+            fee_rows = CreditTransaction.query.filter_by(job_id=job_id).count()
+            if customer_credits != credits_before - int(round(fee)):
+                problems.append(f'customer credits {credits_before} -> {customer_credits}')
+            if fee_rows != 1:
+                problems.append(f'{fee_rows} fee transactions')
+    return problems
+
+
+def provider_credit_problems(app, provider_count, emergency_jobs):
+    """Providers together must have earned exactly one fee per accepted emergency job"""
+    with app.app_context():
+        total = db.session.query(db.func.sum(Provider.credits)).scalar()
+    expected = PROVIDER_CREDITS * provider_count + OFFERED_PRICE * 0.05 * emergency_jobs
+    return [] if abs(total - expected) < 1e-6 else [f'provider credits total {total}, expected {expected}']
+
+
+def run(app, provider_count, rounds):
+    customer_id, tokens = setup(app, provider_count)
+    ok = True
+    emergency_jobs = 0
+    for emergency in (False, True):
+        for _ in range(rounds):
+            with app.app_context():
+                credits_before = Customer.query.get(customer_id).credits
+            if emergency and credits_before < OFFERED_PRICE * 0.05:
+                with app.app_context():
+                    Customer.query.filter_by(id=customer_id).update({'credits': CUSTOMER_CREDITS})
+                    db.session.commit()
+                credits_before = CUSTOMER_CREDITS
+
+            job_id = create_job(app, customer_id, emergency)
+            url = f'/api/provider/emergency/jobs/{job_id}/accept' if emergency else f'/api/jobs/{job_id}/accept'
+            statuses, seconds = fire(app, url, tokens)
+            emergency_jobs += emergency
+
+            problems = []
+            if statuses[200] != 1:
+                problems.append(f'{statuses[200]} winners')
+            unexpected = {code: count for code, count in statuses.items() if code not in (200, 400, 409)}
+            if unexpected:
+                problems.append(f'unexpected responses {unexpected}')
+            problems += check(app, job_id, customer_id, emergency, credits_before)
+            problems += provider_credit_problems(app, provider_count, emergency_jobs)
+
+            label = 'emergency' if emergency else 'open'
+            print(f"{label:>9} job {job_id:>4} | {len(tokens):>4} accepts | {seconds * 1000:8.1f} ms | "
+                  f"200: {statuses[200]}  409: {statuses[409]}  400: {statuses[400]} | "
+                  f"{'OK' if not problems else 'FAIL ' + '; '.join(problems)}")
+            ok = ok and not problems
+    return ok
+
+
+if __name__ == '__main__':
+    provider_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    app = create_app('production')
+
+    print("=" * 100)
+    print(f"Concurrent accept stress test: {provider_count} providers per job, {rounds} rounds, {DB_FILE}")
+    print("=" * 100)
+    ok = run(app, provider_count, rounds)
+    if not ok:
+        print("\n❌ Concurrent accepts produced more or fewer than one winner, or credits moved incorrectly")
+        exit(1)
+    print("\n✅ Every job had exactly one winner and the emergency fee moved exactly once")
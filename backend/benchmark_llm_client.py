@@ -0,0 +1,70 @@
+"""
+Benchmark: the chatbot LLM client against the local fake model server
+(coalescing of identical prompts, bounded concurrency, deadlines)
+Run: python benchmark_llm_client.py [callers] [max_concurrency]
+"""
+import sys
+import threading
+import time
+
+from fake_llm_server import FakeModelServer
+from app.bot.llm_client import LLMClient, GeminiRestBackend, LLMTimeout
+from app.bot.rate_limiter import RateLimiter
+
+
+def run_callers(count, work):
+    results = [None] * count
+    seconds = [0.0] * count
+
+    def caller(index):
+        started = time.perf_counter()
+        try:
+            results[index] = work(index)
+        except Exception as e:
+            results[index] = e
+        seconds[index] = time.perf_counter() - started
+
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, seconds, time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = FakeModelServer(delay=0.5)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = LLMClient(GeminiRestBackend('fake', base_url=server.base_url),
+                       max_concurrency=concurrency, timeout=10,
+                       rate_limiter=RateLimiter(rpm=100000))  # rate budget: see benchmark_rate_limiter.py
+
+    print("=" * 90)
+    print(f"LLM client: {callers} callers, max_concurrency={concurrency}, fake model server answers in 0.5 s")
+    print("=" * 90)
+
+    results, seconds, wall = run_callers(callers, lambda i: client.generate('Why is my sink leaking?'))
+    ok = sum(isinstance(result, str) for result in results)
+    print(f"Identical prompt     | {ok:>3}/{callers} answered | upstream calls {server.requests:>3} | "
+          f"wall {wall:5.2f} s | coalesced {client.stats()['coalesced']}")
+
+    server.reset(delay=0.2)
+    client.reset_stats()
+    distinct = concurrency * 4
+    results, seconds, wall = run_callers(distinct, lambda i: client.generate(f'Problem number {i}'))
+    ok = sum(isinstance(result, str) for result in results)
+    print(f"Distinct prompts     | {ok:>3}/{distinct} answered | upstream calls {server.requests:>3} | "
+          f"wall {wall:5.2f} s | peak upstream concurrency {server.peak_active} (limit {concurrency})")
+
+    server.reset(delay=5)
+    client.reset_stats()
+    results, seconds, wall = run_callers(8, lambda i: client.generate(f'Slow question {i}', timeout=0.5))
+    timeouts = sum(isinstance(result, LLMTimeout) for result in results)
+    print(f"Slow model, 0.5 s deadline | {timeouts}/8 timed out | slowest caller waited {max(seconds):4.2f} s "
+          f"(model needs 5 s) | connections opened {server.requests}, all closed at the deadline")
+    client.shutdown()
+    server.shutdown()
@@ -0,0 +1,87 @@
+"""
+Benchmark: SQL statements and stored rows per provider location ping
+Stationary providers jitter in place, moving providers drive in a straight line
+(app/location/tracker.py downsamples, batches and caches subscribers)
+Run: python benchmark_location_updates.py [providers] [pings_per_provider]
+"""
+import os
+import random
+import sys
+import time
+
+os.environ['LOCATION_FLUSH_SECONDS'] = '3600'  # flush explicitly at the end
+
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from app import create_app
+from extensions import db, socketio
+from app.models import User, Customer, Provider, Job, Booking, LocationUpdate
+from app.location.tracker import location_tracker
+
+STATEMENTS_PER_PING_BEFORE = 3  # INSERT, reload of the committed row for to_dict(), in-progress booking lookup
+
+
+def setup(app, provider_count):
+    """Providers, each with one customer following an in-progress booking"""
+    with app.app_context():
+        tokens = []
+        for index in range(provider_count):
+            customer_user = User(email=f'customer{index}@bench.test', password_hash='x', role='customer')
+            provider_user = User(email=f'provider{index}@bench.test', password_hash='x', role='provider')
+            db.session.add_all([customer_user, provider_user])
+            db.session.flush()
+            customer = Customer(user_id=customer_user.id, name=f'Customer {index}')
+            provider = Provider(user_id=provider_user.id, name=f'Provider {index}', category='plumber')
+            db.session.add_all([customer, provider])
+            db.session.flush()
+            job = Job(customer_id=customer.id, provider_id=provider.id, title='Repair', description='Fix it',
+                      category='plumber', status='in_progress')
+            db.session.add(job)
+            db.session.flush()
+            db.session.add(Booking(job_id=job.id, customer_id=customer.id, provider_id=provider.id,
+                                   price=50.0, status='in_progress'))
+            tokens.append(create_access_token(
+                identity={'id': provider_user.id, 'email': provider_user.email, 'role': 'provider'}
+            ))
+        db.session.commit()
+        return tokens
+
+
+if __name__ == '__main__':
+    provider_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    pings = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    app = create_app('testing')
+    tokens = setup(app, provider_count)
+    with app.app_context():
+        engine = db.engine
+
+    statements = [0]
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+    http = app.test_client()
+    clients = [socketio.test_client(app, flask_test_client=http, auth={'token': token}) for token in tokens]
+    random.seed(7)
+    started = time.perf_counter()
+    for step in range(pings):
+        for index, client in enumerate(clients):
+            moving = index % 2 == 0
+            lat = 52.0 + index * 0.01 + (step * 0.0003 if moving else 0)  # ~33 m per ping while moving
+            lat += random.uniform(-0.00003, 0.00003)  # GPS jitter of a few meters
+            client.emit('update_location', {'latitude': lat, 'longitude': 4.9}, callback=True)
+    seconds = time.perf_counter() - started
+    with app.app_context():
+        location_tracker.flush()
+        rows = LocationUpdate.query.count()
+
+    total_pings = provider_count * pings
+    stats = location_tracker.stats()
+    print("=" * 90)
+    print(f"Location pings: {provider_count} providers x {pings} pings (half stationary, half moving)")
+    print("=" * 90)
+    print(f"Pings handled            {total_pings:>10}   ({total_pings / seconds:,.0f} pings/s through the test client)")
+    print(f"LocationUpdate rows      {rows:>10}   ({rows / total_pings:.3f} per ping, before: 1.000)")
+    print(f"SQL statements           {statements[0]:>10}   ({statements[0] / total_pings:.3f} per ping, "
+          f"before: ~{STATEMENTS_PER_PING_BEFORE}.000)")
+    print(f"Batched flushes          {stats['flushes']:>10}")
+    print(f"Subscriber cache hit rate {stats['subscriber_cache']['hit_rate']:>9.1%}")
@@ -0,0 +1,97 @@
+"""
+Benchmark: login throughput and latency of other requests during a login storm,
+for several bcrypt pool sizes (BCRYPT_POOL_SIZE=0 hashes on the request thread)
+Run: python benchmark_password_hashing.py [concurrent_logins] [logins_per_client] [pool_size ...]
+"""
+import os
+import sys
+import threading
+import time
+
+os.environ['RATELIMIT_ENABLED'] = 'false'
+
+from app import create_app
+from config import TestingConfig, config
+from extensions import db
+from app.models import User
+from app.auth.hashing import password_hasher, _hashpw
+
+ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '10'))
+PASSWORD = 'benchmark-password'
+
+
+class BenchmarkConfig(TestingConfig):
+    BCRYPT_LOG_ROUNDS = ROUNDS
+    BCRYPT_MAX_PENDING = 10000
+    BCRYPT_QUEUE_TIMEOUT_SECONDS = 600
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run(app, pool_size, clients, logins_per_client):
+    password_hasher.configure(ROUNDS, pool_size, 10000, 600)
+    if pool_size:
+        password_hasher.check(PASSWORD, _hashpw(PASSWORD, 4))  # start the worker processes
+
+    statuses = []
+    probe_ms = []
+    storm_over = threading.Event()
+
+    def login_client(index):
+        client = app.test_client()
+        for _ in range(logins_per_client):
+            response = client.post('/api/auth/login', json={'email': f'user{index}@bench.test', 'password': PASSWORD})
+            statuses.append(response.status_code)
+
+    def probe():
+        # A cheap request that needs no hashing: how long does it wait behind the logins?
+        client = app.test_client()
+        while not storm_over.is_set():
+            started = time.perf_counter()
+            client.get('/api/not-a-route')
+            probe_ms.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_client, args=(index,)) for index in range(clients)]
+    prober = threading.Thread(target=probe)
+    started = time.perf_counter()
+    prober.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    storm_over.set()
+    prober.join()
+
+    ok = statuses.count(200)
+    stats = password_hasher.stats()
+    label = 'inline' if not pool_size else f'{pool_size} process{"es" if pool_size > 1 else ""}'
+    print(f"{label:>12} | {ok:>5}/{len(statuses):<5} logins | {ok / seconds:8.1f} logins/s | "
+          f"other requests p50 {percentile(probe_ms, 0.5):7.1f} ms  p95 {percentile(probe_ms, 0.95):7.1f} ms | "
+          f"peak queue {stats['peak_queue_depth']:>4}")
+
+
+if __name__ == '__main__':
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    logins_per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    pool_sizes = [int(arg) for arg in sys.argv[3:]] or [0, 1, 2, 4]
+
+    config['benchmark'] = BenchmarkConfig
+    app = create_app('benchmark')
+    with app.app_context():
+        password_hash = _hashpw(PASSWORD, ROUNDS)
+        for index in range(clients):
+            db.session.add(User(email=f'user{index}@bench.test', password_hash=password_hash, role='customer'))
+        db.session.commit()
+
+    print("=" * 110)
+    print(f"Login storm: {clients} concurrent clients x {logins_per_client} logins, bcrypt cost {ROUNDS}, "
+          f"{os.cpu_count()} CPU(s)")
+    print("=" * 110)
+    for pool_size in pool_sizes:
+        run(app, pool_size, clients, logins_per_client)
+    password_hasher.shutdown()
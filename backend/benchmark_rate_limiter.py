@@ -0,0 +1,54 @@
+"""
+Benchmark: the chatbot rate limiter against the local fake model server
+(RPM budget enforced locally, diagnosis calls ahead of quick responses, fail fast)
+Run: python benchmark_rate_limiter.py [rpm] [diagnosis_callers] [quick_callers]
+"""
+import sys
+import threading
+import time
+
+from fake_llm_server import FakeModelServer
+from app.bot.llm_client import LLMClient, GeminiRestBackend, LLMRateLimited
+from app.bot.rate_limiter import RateLimiter, PRIORITY_DIAGNOSIS, PRIORITY_QUICK
+from benchmark_llm_client import run_callers
+
+
+if __name__ == '__main__':
+    rpm = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    diagnosis_callers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    quick_callers = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    server = FakeModelServer(delay=0.1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    limiter = RateLimiter(rpm=rpm, max_wait={PRIORITY_DIAGNOSIS: 5.0, PRIORITY_QUICK: 1.0}, reserved_share=0.2)
+    client = LLMClient(GeminiRestBackend('fake', base_url=server.base_url),
+                       max_concurrency=8, timeout=10, rate_limiter=limiter)
+
+    print("=" * 100)
+    print(f"Rate limiter: {rpm} RPM (burst {rpm}, then one every {60 / rpm:.2f} s, 20% kept for diagnosis), "
+          f"{diagnosis_callers} diagnosis + {quick_callers} quick callers at once")
+    print("=" * 100)
+
+    def work(index):
+        if index < quick_callers:
+            return client.generate(f'Quick question {index}', priority=PRIORITY_QUICK)
+        return client.generate(f'Diagnosis {index}', priority=PRIORITY_DIAGNOSIS)
+
+    # Quick callers arrive first and would take the whole burst without the diagnosis reserve
+    results, seconds, wall = run_callers(quick_callers + diagnosis_callers, work)
+    for name, part, part_seconds in (('quick', results[:quick_callers], seconds[:quick_callers]),
+                                     ('diagnosis', results[quick_callers:], seconds[quick_callers:])):
+        ok = sum(isinstance(result, str) for result in part)
+        refused = sum(isinstance(result, LLMRateLimited) for result in part)
+        print(f"{name:>10} | {ok:>3}/{len(part)} answered | {refused:>3} refused (fallback) | "
+              f"slowest caller {max(part_seconds):5.2f} s")
+
+    stats = limiter.stats()
+    print(f"Upstream calls {server.requests} in {wall:.2f} s (budget allowed {rpm + wall * rpm / 60:.0f}) | "
+          f"upstream 429s {stats['upstream_rate_limited']}")
+    for name, values in stats['priorities'].items():
+        print(f"{name:>10} | granted {values['granted']:>3} | rejected {values['rejected']:>3} | "
+              f"avg wait {values['avg_wait_ms']:7.1f} ms | max wait {values['max_wait_ms']:7.1f} ms | "
+              f"peak queue {values['peak_queued']}")
+    client.shutdown()
+    server.shutdown()
@@ -0,0 +1,126 @@
+"""
+Benchmark: memory and OS threads per idle Socket.IO connection for each server mode
+Compares threading (Werkzeug) with the cooperative eventlet/gevent modes (SOCKETIO_ASYNC_MODE)
+Requires the Socket.IO client extras: pip install "python-socketio[client]"
+Run: python benchmark_socketio_connections.py [connections] [mode ...]
+"""
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+
+DEFAULT_MODES = ['threading', 'eventlet', 'gevent']
+
+
+def serve(mode, port):
+    """Server process: patch first, exactly like run.py does"""
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+    import logging
+    os.environ['SOCKETIO_ASYNC_MODE'] = mode
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    os.environ['RATELIMIT_ENABLED'] = 'false'
+    os.environ['CORS_ORIGINS'] = f'http://127.0.0.1:{port}'
+    from app import create_app
+    from extensions import socketio
+
+    logging.getLogger('werkzeug').disabled = True
+    app = create_app('production')
+    options = {'allow_unsafe_werkzeug': True} if mode == 'threading' else {}
+    socketio.run(app, host='127.0.0.1', port=port, log_output=False, **options)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def process_status(pid):
+    """(RSS in MB, OS thread count) of a process (Linux only)"""
+    rss = threads = None
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, threads
+
+
+def mode_available(mode):
+    return mode == 'threading' or importlib.util.find_spec(mode) is not None
+
+
+def run(mode, connections):
+    import socketio
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, '--serve', mode, str(port)])
+    clients = []
+    try:
+        wait_for_port(port)
+        time.sleep(1)
+        idle_rss, idle_threads = process_status(server.pid)
+
+        started = time.perf_counter()
+        for _ in range(connections):
+            client = socketio.Client(reconnection=False)
+            client.connect(f'http://127.0.0.1:{port}', transports=['websocket'])
+            clients.append(client)
+        connect_seconds = time.perf_counter() - started
+        time.sleep(1)
+        loaded_rss, loaded_threads = process_status(server.pid)
+    finally:
+        # Stop the server first: a client-side close waits for the server's close frame
+        server.terminate()
+        server.wait()
+        for client in clients:
+            client.disconnect()
+
+    if idle_rss is None or loaded_rss is None:
+        print(f"{mode:>10} | {connections:>5} connections | connect {connect_seconds:6.2f} s | memory n/a")
+        return
+    per_connection_kb = (loaded_rss - idle_rss) * 1024 / connections
+    print(f"{mode:>10} | {connections:>5} connections | connect {connect_seconds:6.2f} s | "
+          f"RSS {idle_rss:7.1f} -> {loaded_rss:7.1f} MB | {per_connection_kb:7.1f} KB/connection | "
+          f"OS threads {idle_threads:>4} -> {loaded_threads:>5}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--serve':
+        serve(sys.argv[2], int(sys.argv[3]))
+        exit(0)
+
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    modes = sys.argv[2:] or DEFAULT_MODES
+
+    print("=" * 110)
+    print(f"Socket.IO idle connection cost per server mode ({connections} websocket clients)")
+    print("=" * 110)
+    for mode in modes:
+        if not mode_available(mode):
+            print(f"{mode:>10} | skipped ({mode} is not installed)")
+            continue
+        run(mode, connections)
@@ -0,0 +1,145 @@
+"""
+Load test: Socket.IO connections and broadcast fan-out across worker processes
+Workers share rooms and emits through the local:// message queue (app/utils/socketio_queue.py)
+Requires the Socket.IO client extras: pip install "python-socketio[client]"
+Run: python benchmark_socketio_workers.py [clients_per_worker] [worker_count ...]
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+import socketio
+
+BROADCASTS = 20
+AUTHKEY = 'benchmark-broker-key'
+CHANNEL = 'quickfix-benchmark'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+
+def run_worker(port, queue_url):
+    """One server process; configuration is read from the environment at import"""
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = queue_url
+    os.environ['SOCKETIO_CHANNEL'] = CHANNEL
+    os.environ['SOCKETIO_BROKER_AUTHKEY'] = AUTHKEY
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    os.environ['RATELIMIT_ENABLED'] = 'false'
+    os.environ['CORS_ORIGINS'] = f'http://127.0.0.1:{port}'
+    from app import create_app
+    from extensions import socketio as server
+
+    # Werkzeug logs every websocket close frame as a bad request
+    logging.getLogger('werkzeug').disabled = True
+    app = create_app('production')
+    server.run(app, host='127.0.0.1', port=port, allow_unsafe_werkzeug=True, log_output=False)
+
+
+def rss_mb(pid):
+    """Resident memory of a process (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def run(worker_count, clients_per_worker, queue_url):
+    from app.utils.socketio_queue import LocalPubSubManager
+
+    context = multiprocessing.get_context('spawn')
+    ports = [free_port() for _ in range(worker_count)]
+    workers = [context.Process(target=run_worker, args=(port, queue_url), daemon=True) for port in ports]
+    for worker in workers:
+        worker.start()
+    for port in ports:
+        wait_for_port(port)
+    idle_rss = [rss_mb(worker.pid) for worker in workers]
+
+    received = [0]
+    received_lock = threading.Lock()
+
+    def on_ping(data):
+        with received_lock:
+            received[0] += 1
+
+    # Spread clients evenly over the workers, as a load balancer would
+    clients = []
+    started = time.perf_counter()
+    for index in range(worker_count * clients_per_worker):
+        client = socketio.Client(reconnection=False)
+        client.on('benchmark_ping', on_ping)
+        client.connect(f'http://127.0.0.1:{ports[index % worker_count]}', transports=['websocket'])
+        clients.append(client)
+    connect_seconds = time.perf_counter() - started
+    loaded_rss = [rss_mb(worker.pid) for worker in workers]
+
+    # Broadcast from outside any worker: every client must get every ping
+    emitter = LocalPubSubManager(queue_url, channel=CHANNEL, write_only=True, authkey=AUTHKEY)
+    expected = len(clients) * BROADCASTS
+    started = time.perf_counter()
+    for seq in range(BROADCASTS):
+        emitter.emit('benchmark_ping', {'seq': seq}, namespace='/')
+    deadline = time.time() + 30
+    while received[0] < expected and time.time() < deadline:
+        time.sleep(0.01)
+    fan_out_seconds = time.perf_counter() - started
+
+    # Stop the servers first: a client-side close waits for the server's close frame
+    for worker in workers:
+        worker.terminate()
+        worker.join()
+    for client in clients:
+        client.disconnect()
+
+    per_connection_kb = None
+    if None not in idle_rss and None not in loaded_rss:
+        per_connection_kb = (sum(loaded_rss) - sum(idle_rss)) * 1024 / len(clients)
+    print(f"{worker_count:>3} workers | {len(clients):>5} connections | connect {connect_seconds:6.2f} s | "
+          f"delivered {received[0]:>6}/{expected:<6} | fan-out {fan_out_seconds * 1000:8.1f} ms | "
+          f"{received[0] / fan_out_seconds:10.0f} msg/s | "
+          f"{'n/a' if per_connection_kb is None else f'{per_connection_kb:6.1f} KB'}/connection")
+    return received[0] == expected
+
+
+if __name__ == '__main__':
+    from app.utils.socketio_queue import SocketIOBroker
+
+    clients_per_worker = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4]
+
+    broker = SocketIOBroker(('127.0.0.1', free_port()), authkey=AUTHKEY)
+    broker.start()
+    host, port = broker.address
+    queue_url = f'local://{host}:{port}'
+
+    print("=" * 100)
+    print(f"Socket.IO worker fan-out: {clients_per_worker} clients per worker, {BROADCASTS} broadcasts, broker {queue_url}")
+    print("=" * 100)
+    ok = all([run(count, clients_per_worker, queue_url) for count in worker_counts])
+    broker.close()
+    if not ok:
+        print("\n❌ Some broadcasts were not delivered to every worker's clients")
+        exit(1)
+    print("\n✅ Every client received every broadcast on every worker")
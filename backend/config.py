@@ -24,6 +24,119 @@ class Config:
     RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
     RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
     
+    # Password hashing: bcrypt work factor, and the worker process pool it runs on
+    # (BCRYPT_POOL_SIZE=0 hashes on the request thread). Logins rehash stored hashes
+    # whose work factor differs from BCRYPT_LOG_ROUNDS.
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+    BCRYPT_POOL_SIZE = int(os.getenv('BCRYPT_POOL_SIZE', str(min(os.cpu_count() or 1, 4))))
+    BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', '64'))  # callers waiting before 503s
+    BCRYPT_QUEUE_TIMEOUT_SECONDS = float(os.getenv('BCRYPT_QUEUE_TIMEOUT_SECONDS', '5'))
+    
+    # Provider geo index
+    GEO_INDEX_CELL_SIZE_DEG = float(os.getenv('GEO_INDEX_CELL_SIZE_DEG', '0.1'))  # ~11 km cells
+    GEO_INDEX_REFRESH_SECONDS = int(os.getenv('GEO_INDEX_REFRESH_SECONDS', '300'))
+    GEO_INDEX_LIVE_MAX_AGE_MINUTES = int(os.getenv('GEO_INDEX_LIVE_MAX_AGE_MINUTES', '30'))
+    
+    # Provider full-text search index
+    SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv('SEARCH_INDEX_REFRESH_SECONDS', '300'))
+    
+    # Dashboard / provider stats counters cache
+    STATS_CACHE_SECONDS = int(os.getenv('STATS_CACHE_SECONDS', '30'))
+    
+    # Token revocation (logout, suspended users): revoked jtis are kept in memory and other
+    # workers' revocations are loaded every TOKEN_REVOCATION_SYNC_SECONDS; lapsed rows are purged
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', '5'))
+    TOKEN_REVOCATION_PURGE_SECONDS = int(os.getenv('TOKEN_REVOCATION_PURGE_SECONDS', '3600'))
+    
+    # Cached (user id -> role and profile ids) for hot endpoints that skip the users table; 0 disables
+    CURRENT_USER_CACHE_SECONDS = int(os.getenv('CURRENT_USER_CACHE_SECONDS', '30'))
+    
+    # Socket.IO server mode: 'threading' (Werkzeug, one OS thread per connection, development)
+    # or 'gevent' / 'eventlet' (cooperative, one greenlet per connection; both in requirements.txt).
+    # Set it in the real environment, run.py reads it before loading .env to monkey patch first.
+    # In cooperative mode every Socket.IO handler (connect, messaging, location, emergency) runs its
+    # DB work on the offload pool; REST routes still run their queries on the hub and block it.
+    SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+    # OS threads available for blocking DB work in eventlet/gevent mode
+    DB_OFFLOAD_POOL_SIZE = int(os.getenv('DB_OFFLOAD_POOL_SIZE', '10'))
+    
+    # Socket.IO message queue, shares rooms and emits across worker processes
+    # redis://host:6379/0, kafka://... or amqp://... use python-socketio's managers,
+    # local://127.0.0.1:6390 uses run_socketio_broker.py, memory:// is single-process only.
+    # Leave empty to run a single worker.
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'quickfix-socketio')
+    SOCKETIO_BROKER_AUTHKEY = os.getenv('SOCKETIO_BROKER_AUTHKEY', 'dev-broker-key-change-in-production')
+    
+    # Job accept (compare-and-swap): retries when SQLite reports the database as locked
+    JOB_CLAIM_RETRIES = int(os.getenv('JOB_CLAIM_RETRIES', '5'))
+    JOB_CLAIM_RETRY_DELAY = float(os.getenv('JOB_CLAIM_RETRY_DELAY', '0.05'))  # seconds, doubled per retry
+    
+    # Provider location tracking: a ping is stored only after moving LOCATION_MIN_DISTANCE_METERS
+    # or every LOCATION_HEARTBEAT_SECONDS; stored points are inserted in batches
+    LOCATION_MIN_DISTANCE_METERS = float(os.getenv('LOCATION_MIN_DISTANCE_METERS', '25'))
+    LOCATION_HEARTBEAT_SECONDS = int(os.getenv('LOCATION_HEARTBEAT_SECONDS', '300'))
+    LOCATION_FLUSH_SECONDS = float(os.getenv('LOCATION_FLUSH_SECONDS', '5'))
+    LOCATION_FLUSH_BATCH_SIZE = int(os.getenv('LOCATION_FLUSH_BATCH_SIZE', '500'))
+    LOCATION_SUBSCRIBER_CACHE_SECONDS = int(os.getenv('LOCATION_SUBSCRIBER_CACHE_SECONDS', '30'))
+    
+    # Location retention (location_maintenance.py): points older than LOCATION_RETENTION_DAYS are
+    # compacted into per-track polyline summaries and deleted in batches; set LOCATION_ARCHIVE_DIR
+    # to also keep the raw points as gzip'd CSV files
+    LOCATION_RETENTION_DAYS = int(os.getenv('LOCATION_RETENTION_DAYS', '14'))
+    LOCATION_MAINTENANCE_BATCH_SIZE = int(os.getenv('LOCATION_MAINTENANCE_BATCH_SIZE', '500'))
+    LOCATION_ARCHIVE_DIR = os.getenv('LOCATION_ARCHIVE_DIR', '')
+    LOCATION_COMPACT_TRACKS = os.getenv('LOCATION_COMPACT_TRACKS', 'true').lower() == 'true'
+    LOCATION_MAINTENANCE_INTERVAL_HOURS = float(os.getenv('LOCATION_MAINTENANCE_INTERVAL_HOURS', '24'))
+    
+    # Emergency dispatch: nearest EMERGENCY_WAVE_SIZE providers first, the wave doubles
+    # every EMERGENCY_WAVE_TIMEOUT_SECONDS without an accept; the last wave reaches everyone
+    EMERGENCY_WAVE_SIZE = int(os.getenv('EMERGENCY_WAVE_SIZE', '5'))
+    EMERGENCY_WAVE_TIMEOUT_SECONDS = float(os.getenv('EMERGENCY_WAVE_TIMEOUT_SECONDS', '20'))
+    EMERGENCY_MAX_WAVES = int(os.getenv('EMERGENCY_MAX_WAVES', '3'))
+    
+    # Provider ranking weights (sort=relevance)
+    RANKING_WEIGHT_DISTANCE = float(os.getenv('RANKING_WEIGHT_DISTANCE', '0.5'))
+    RANKING_WEIGHT_RATING = float(os.getenv('RANKING_WEIGHT_RATING', '0.35'))
+    RANKING_WEIGHT_PRICE = float(os.getenv('RANKING_WEIGHT_PRICE', '0.15'))
+    
+    # Chatbot diagnosis flows: kept in the chat_flow_states table ('database') or as JSON files
+    # under FLOW_STORE_DIR ('file', single host); at most FLOW_STORE_MAX_SESSIONS stay in memory
+    FLOW_STORE_BACKEND = os.getenv('FLOW_STORE_BACKEND', 'database')
+    FLOW_STORE_DIR = os.getenv('FLOW_STORE_DIR', '')
+    FLOW_STORE_MAX_SESSIONS = int(os.getenv('FLOW_STORE_MAX_SESSIONS', '1000'))
+    FLOW_STORE_TTL_SECONDS = int(os.getenv('FLOW_STORE_TTL_SECONDS', '1800'))
+    
+    # Gemini chatbot: calls run on a background event loop, LLM_MAX_CONCURRENCY at a time, each
+    # with a LLM_TIMEOUT_SECONDS deadline; LLM_BASE_URL can point at fake_llm_server.py
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gemini-2.5-flash')
+    LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://generativelanguage.googleapis.com')
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '20'))
+    LLM_MAX_PENDING = int(os.getenv('LLM_MAX_PENDING', '100'))
+    # Client-side model budget (free tier: 15 RPM, 1M TPM). Diagnosis calls are granted before
+    # quick responses; a call that cannot get budget within its max wait fails fast.
+    # The budget is tracked per process: set LLM_RATE_LIMIT_WORKERS to the number of worker
+    # processes sharing the API key and each one keeps to RPM/TPM divided by that number
+    LLM_RATE_LIMIT_RPM = int(os.getenv('LLM_RATE_LIMIT_RPM', '15'))
+    LLM_RATE_LIMIT_TPM = int(os.getenv('LLM_RATE_LIMIT_TPM', '1000000'))
+    LLM_RATE_LIMIT_WORKERS = int(os.getenv('LLM_RATE_LIMIT_WORKERS', '1'))
+    LLM_RATE_LIMIT_OUTPUT_TOKENS = int(os.getenv('LLM_RATE_LIMIT_OUTPUT_TOKENS', '512'))  # reserved per call
+    LLM_DIAGNOSIS_MAX_WAIT_SECONDS = float(os.getenv('LLM_DIAGNOSIS_MAX_WAIT_SECONDS', '5'))
+    LLM_QUICK_MAX_WAIT_SECONDS = float(os.getenv('LLM_QUICK_MAX_WAIT_SECONDS', '1'))
+    LLM_DIAGNOSIS_RESERVED_SHARE = float(os.getenv('LLM_DIAGNOSIS_RESERVED_SHARE', '0.2'))  # quick calls leave this
+    
+    # Chatbot diagnosis answers cached by category + normalized problem text; near-duplicate
+    # descriptions (token-set Jaccard >= RESPONSE_CACHE_SIMILARITY, same negations and safety
+    # terms) reuse follow-up questions. Empty path: memory only; set e.g.
+    # instance/bot_response_cache.json to share the cache between workers on one host
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', '')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '2000'))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', str(7 * 86400)))
+    RESPONSE_CACHE_SIMILARITY = float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.8'))
+    RESPONSE_CACHE_SAVE_SECONDS = int(os.getenv('RESPONSE_CACHE_SAVE_SECONDS', '60'))
+    
     # OpenAI (Optional)
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 
@@ -45,6 +158,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
+    SOCKETIO_MESSAGE_QUEUE = ''  # the Socket.IO test client does not support message queues
+    SOCKETIO_ASYNC_MODE = 'threading'
+    BCRYPT_LOG_ROUNDS = 4  # bcrypt's minimum, keeps test logins fast
+    BCRYPT_POOL_SIZE = 0
+    RESPONSE_CACHE_PATH = ''  # keep tests from writing a cache file
 
 
 config = {
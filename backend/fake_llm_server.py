@@ -0,0 +1,90 @@
+"""
+Fake Gemini model server for local testing of the chatbot LLM client
+Answers POST /v1beta/models/<model>:generateContent after a fixed delay
+Run: python fake_llm_server.py [port] [delay_seconds]
+Then start the backend with LLM_BASE_URL=http://127.0.0.1:<port> GEMINI_API_KEY=fake
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeModelServer(ThreadingHTTPServer):
+    """Counts requests and the peak number answered at once"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=1.0):
+        super().__init__(('127.0.0.1', port), FakeModelHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def reset(self, delay=None):
+        with self.lock:
+            if delay is not None:
+                self.delay = delay
+            self.requests = self.peak_active = 0
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            self._reply(200, {'requests': server.requests, 'active': server.active, 'peak_active': server.peak_active})
+
+    def do_POST(self):
+        server = self.server
+        if ':generateContent' not in self.path:
+            return self._reply(404, {'error': {'code': 404, 'message': 'Not found'}})
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt = payload['contents'][-1]['parts'][0]['text']
+
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak_active = max(server.peak_active, server.active)
+        try:
+            time.sleep(server.delay)
+            self._reply(200, {'candidates': [{'content': {
+                'role': 'model',
+                'parts': [{'text': f'Fake answer to: {prompt[:80]}'}]
+            }}]})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (deadline or cancellation)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    server = FakeModelServer(port, delay)
+    print("=" * 60)
+    print(f"Fake model server on {server.base_url} ({delay}s per answer)")
+    print("=" * 60)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,51 @@
+"""
+Location retention: compact location_updates past the retention window into per-track
+polyline summaries (location_track_summaries), optionally archive the raw points to
+gzip'd CSV files, and delete them in bounded batches.
+Run once:      python location_maintenance.py [--retention-days N] [--archive-dir PATH] [--no-compact]
+Run scheduled: python location_maintenance.py --every HOURS   (default LOCATION_MAINTENANCE_INTERVAL_HOURS)
+"""
+import argparse
+import time
+from datetime import datetime
+from app import create_app
+from app.location.maintenance import run_location_maintenance
+
+
+def run_once(app, args):
+    with app.app_context():
+        result = run_location_maintenance(
+            retention_days=args.retention_days,
+            batch_size=args.batch_size,
+            archive_dir=args.archive_dir,
+            compact=False if args.no_compact else None
+        )
+    print(f"[{datetime.utcnow():%Y-%m-%d %H:%M:%S}] points before {result['cutoff']}: "
+          f"{result['providers']} provider(s), {result['summaries']} track summaries, "
+          f"{result['deleted']} rows deleted, {result['archived_files']} archive file(s), "
+          f"{result['remaining']} rows left, {result['seconds']} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact and expire provider location history')
+    parser.add_argument('--retention-days', type=int, help='keep raw points this many days')
+    parser.add_argument('--batch-size', type=int, help='rows per SELECT/DELETE batch')
+    parser.add_argument('--archive-dir', help='write raw points to gzip\'d CSV files here before deleting')
+    parser.add_argument('--no-compact', action='store_true', help='delete expired points without summaries')
+    parser.add_argument('--every', type=float, nargs='?', const=-1, metavar='HOURS',
+                        help='keep running, once every HOURS')
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.every is None:
+        run_once(app, args)
+        exit(0)
+
+    interval_hours = args.every if args.every > 0 else app.config['LOCATION_MAINTENANCE_INTERVAL_HOURS']
+    print(f"Location maintenance every {interval_hours} hour(s)")
+    while True:
+        try:
+            run_once(app, args)
+        except Exception as e:
+            print(f"[ERROR] Location maintenance failed: {e}")
+        time.sleep(interval_hours * 3600)
@@ -0,0 +1,107 @@
+"""
+Migration script to add the denormalized inbox summary to conversations table
+Adds last-message columns and per-participant unread counters and backfills them from messages
+"""
+import sqlite3
+from pathlib import Path
+
+SUMMARY_COLUMNS = [
+    ('last_message_id', 'INTEGER'),
+    ('last_message_sender_id', 'INTEGER'),
+    ('last_message_preview', 'VARCHAR(200)'),
+    ('customer_unread_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('provider_unread_count', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+INBOX_INDEXES = [
+    ('ix_conversations_customer_inbox', 'customer_id, last_message_at, id'),
+    ('ix_conversations_provider_inbox', 'provider_id, last_message_at, id'),
+]
+
+def migrate_add_conversation_summary():
+    """Add inbox summary columns to conversations and backfill them"""
+    
+    # Get database path
+    base_dir = Path(__file__).parent
+    db_path = base_dir / 'instance' / 'quickfix.db'
+    
+    # Also check if database is in current directory (some setups)
+    if not db_path.exists():
+        db_path = base_dir / 'quickfix.db'
+    
+    if not db_path.exists():
+        print(f"Error: Database not found at {db_path}")
+        print("Please ensure the database exists before running migration.")
+        return False
+    
+    try:
+        conn = sqlite3.connect(str(db_path))
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(conversations)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        for column, column_type in SUMMARY_COLUMNS:
+            if column in columns:
+                print(f"[OK] {column} column already exists in conversations table")
+                continue
+            print(f"Adding {column} column to conversations table...")
+            cursor.execute(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}")
+        
+        for index_name, index_columns in INBOX_INDEXES:
+            print(f"Creating index {index_name}...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON conversations ({index_columns})")
+        
+        # Backfill last message (highest id) and unread counters from existing messages
+        print("Backfilling inbox summary from messages table...")
+        cursor.execute("""
+            UPDATE conversations SET
+                last_message_id = (SELECT MAX(m.id) FROM messages m WHERE m.conversation_id = conversations.id)
+        """)
+        cursor.execute("""
+            UPDATE conversations SET
+                last_message_sender_id = (SELECT m.sender_id FROM messages m WHERE m.id = conversations.last_message_id),
+                last_message_preview = (SELECT SUBSTR(m.content, 1, 200) FROM messages m WHERE m.id = conversations.last_message_id),
+                last_message_at = COALESCE(
+                    (SELECT m.created_at FROM messages m WHERE m.id = conversations.last_message_id),
+                    last_message_at
+                )
+            WHERE last_message_id IS NOT NULL
+        """)
+        cursor.execute("""
+            UPDATE conversations SET
+                customer_unread_count = (
+                    SELECT COUNT(*) FROM messages m JOIN customers c ON c.user_id = m.receiver_id
+                    WHERE m.conversation_id = conversations.id AND c.id = conversations.customer_id AND m.is_read = 0
+                ),
+                provider_unread_count = (
+                    SELECT COUNT(*) FROM messages m JOIN providers p ON p.user_id = m.receiver_id
+                    WHERE m.conversation_id = conversations.id AND p.id = conversations.provider_id AND m.is_read = 0
+                )
+        """)
+        
+        conn.commit()
+        
+        cursor.execute("SELECT COUNT(*) FROM conversations")
+        count = cursor.fetchone()[0]
+        print(f"[OK] Inbox summary backfilled for {count} conversation(s)")
+        conn.close()
+        return True
+    
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add inbox summary to conversations")
+    print("=" * 60)
+    success = migrate_add_conversation_summary()
+    if success:
+        print("\n✅ Migration completed successfully!")
+    else:
+        print("\n❌ Migration failed. Please check the error messages above.")
+        exit(1)
@@ -0,0 +1,27 @@
+"""
+Migration: Add composite (status, created_at, id) index to jobs table
+Used by the keyset-paginated provider job board
+Run: python migrate_add_job_board_index.py
+"""
+
+import sqlite3
+import os
+
+def migrate():
+    db_path = os.path.join(os.path.dirname(__file__), 'instance', 'quickfix.db')
+    
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS ix_jobs_status_created_at_id
+        ON jobs(status, created_at, id)
+    """)
+    print("[OK] Index 'ix_jobs_status_created_at_id' is in place")
+    
+    conn.commit()
+    conn.close()
+    print("[OK] Migration complete!")
+
+if __name__ == '__main__':
+    migrate()
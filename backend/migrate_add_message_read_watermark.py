@@ -0,0 +1,85 @@
+"""
+Migration script to add per-participant read watermarks to conversations table
+Adds customer/provider last-read message ids, backfills them from read messages
+and indexes messages for cursor-paginated history
+"""
+import sqlite3
+from pathlib import Path
+
+WATERMARK_COLUMNS = ['customer_last_read_message_id', 'provider_last_read_message_id']
+
+def migrate_add_message_read_watermark():
+    """Add read watermark columns to conversations and the message history index"""
+    
+    # Get database path
+    base_dir = Path(__file__).parent
+    db_path = base_dir / 'instance' / 'quickfix.db'
+    
+    # Also check if database is in current directory (some setups)
+    if not db_path.exists():
+        db_path = base_dir / 'quickfix.db'
+    
+    if not db_path.exists():
+        print(f"Error: Database not found at {db_path}")
+        print("Please ensure the database exists before running migration.")
+        return False
+    
+    try:
+        conn = sqlite3.connect(str(db_path))
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(conversations)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        for column in WATERMARK_COLUMNS:
+            if column in columns:
+                print(f"[OK] {column} column already exists in conversations table")
+                continue
+            print(f"Adding {column} column to conversations table...")
+            cursor.execute(f"ALTER TABLE conversations ADD COLUMN {column} INTEGER")
+        
+        print("Creating index ix_messages_conversation_created_at_id...")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS ix_messages_conversation_created_at_id
+            ON messages (conversation_id, created_at, id)
+        """)
+        
+        # Backfill watermarks from the newest message each participant has already read
+        print("Backfilling read watermarks from messages table...")
+        cursor.execute("""
+            UPDATE conversations SET
+                customer_last_read_message_id = (
+                    SELECT MAX(m.id) FROM messages m JOIN customers c ON c.user_id = m.receiver_id
+                    WHERE m.conversation_id = conversations.id AND c.id = conversations.customer_id AND m.is_read = 1
+                ),
+                provider_last_read_message_id = (
+                    SELECT MAX(m.id) FROM messages m JOIN providers p ON p.user_id = m.receiver_id
+                    WHERE m.conversation_id = conversations.id AND p.id = conversations.provider_id AND m.is_read = 1
+                )
+        """)
+        
+        conn.commit()
+        
+        cursor.execute("SELECT COUNT(*) FROM conversations")
+        count = cursor.fetchone()[0]
+        print(f"[OK] Read watermarks backfilled for {count} conversation(s)")
+        conn.close()
+        return True
+    
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add message read watermarks to conversations")
+    print("=" * 60)
+    success = migrate_add_message_read_watermark()
+    if success:
+        print("\n✅ Migration completed successfully!")
+    else:
+        print("\n❌ Migration failed. Please check the error messages above.")
+        exit(1)
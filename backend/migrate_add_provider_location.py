@@ -0,0 +1,68 @@
+"""
+Migration script to add latitude/longitude (home location) to providers table
+Run this script to add the new columns used by the provider geo index
+"""
+import sqlite3
+from pathlib import Path
+
+def migrate_add_provider_location():
+    """Add latitude and longitude columns to providers table"""
+    
+    # Get database path
+    base_dir = Path(__file__).parent
+    db_path = base_dir / 'instance' / 'quickfix.db'
+    
+    # Also check if database is in current directory (some setups)
+    if not db_path.exists():
+        db_path = base_dir / 'quickfix.db'
+    
+    if not db_path.exists():
+        print(f"Error: Database not found at {db_path}")
+        print("Please ensure the database exists before running migration.")
+        return False
+    
+    try:
+        conn = sqlite3.connect(str(db_path))
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(providers)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        for column in ('latitude', 'longitude'):
+            if column in columns:
+                print(f"[OK] {column} column already exists in providers table")
+                continue
+            print(f"Adding {column} column to providers table...")
+            cursor.execute(f"ALTER TABLE providers ADD COLUMN {column} REAL")
+            print(f"[OK] Successfully added {column} column to providers table")
+        
+        conn.commit()
+        
+        # Verify the columns were added
+        cursor.execute("PRAGMA table_info(providers)")
+        columns_after = [column[1] for column in cursor.fetchall()]
+        conn.close()
+        
+        if 'latitude' not in columns_after or 'longitude' not in columns_after:
+            print("[ERROR] Failed to add location columns")
+            return False
+        return True
+    
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add home location to providers")
+    print("=" * 60)
+    success = migrate_add_provider_location()
+    if success:
+        print("\n✅ Migration completed successfully!")
+        print("Providers can now set latitude/longitude via PUT /api/provider/profile")
+    else:
+        print("\n❌ Migration failed. Please check the error messages above.")
+        exit(1)
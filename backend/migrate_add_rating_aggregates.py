@@ -0,0 +1,113 @@
+"""
+Migration script to add incremental rating aggregates to providers table
+Adds rating_sum and per-star counters and backfills them from the ratings table
+for providers without a rating_count yet; existing rating_avg/rating_count values are kept
+"""
+import sqlite3
+from pathlib import Path
+
+AGGREGATE_COLUMNS = ['rating_sum'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+def star_counts_for_average(average, count):
+    """Per-star counts for `count` ratings averaging `average` (same as Provider.star_counts_for_average)"""
+    total = min(max(int(round((average or 0) * count)), count), 5 * count)
+    counts = {star: 0 for star in range(1, 6)}
+    if count:
+        base, extra = divmod(total, count)
+        counts[base] += count - extra
+        if extra:
+            counts[base + 1] += extra
+    return counts
+
+def migrate_add_rating_aggregates():
+    """Add rating aggregate columns to providers and backfill them"""
+    
+    # Get database path
+    base_dir = Path(__file__).parent
+    db_path = base_dir / 'instance' / 'quickfix.db'
+    
+    # Also check if database is in current directory (some setups)
+    if not db_path.exists():
+        db_path = base_dir / 'quickfix.db'
+    
+    if not db_path.exists():
+        print(f"Error: Database not found at {db_path}")
+        print("Please ensure the database exists before running migration.")
+        return False
+    
+    try:
+        conn = sqlite3.connect(str(db_path))
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(providers)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        for column in AGGREGATE_COLUMNS:
+            if column in columns:
+                print(f"[OK] {column} column already exists in providers table")
+                continue
+            print(f"Adding {column} column to providers table...")
+            cursor.execute(f"ALTER TABLE providers ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        
+        # Backfill from existing reviews, only where no rating_count was recorded yet
+        print("Backfilling aggregates from ratings table...")
+        star_updates = ', '.join(
+            f"rating_{star}_count = (SELECT COUNT(*) FROM ratings r WHERE r.provider_id = providers.id AND r.rating = {star})"
+            for star in range(1, 6)
+        )
+        cursor.execute(f"""
+            UPDATE providers SET
+                rating_sum = (SELECT COALESCE(SUM(r.rating), 0) FROM ratings r WHERE r.provider_id = providers.id),
+                {star_updates}
+            WHERE rating_count IS NULL OR rating_count = 0
+        """)
+        cursor.execute("""
+            UPDATE providers SET
+                rating_count = rating_1_count + rating_2_count + rating_3_count + rating_4_count + rating_5_count,
+                rating_avg = CAST(rating_sum AS REAL) / (rating_1_count + rating_2_count + rating_3_count + rating_4_count + rating_5_count)
+            WHERE (rating_count IS NULL OR rating_count = 0)
+              AND rating_1_count + rating_2_count + rating_3_count + rating_4_count + rating_5_count > 0
+        """)
+        # Providers that already carry a rating_avg/rating_count (seeded, or kept by older code)
+        # keep both; they get a star breakdown that adds up to the same count and average
+        cursor.execute("""
+            SELECT id, rating_avg, rating_count FROM providers
+            WHERE rating_count > 0
+              AND rating_1_count + rating_2_count + rating_3_count + rating_4_count + rating_5_count = 0
+        """)
+        for provider_id, rating_avg, rating_count in cursor.fetchall():
+            counts = star_counts_for_average(rating_avg, rating_count)
+            rating_sum = sum(star * count for star, count in counts.items())
+            cursor.execute(
+                "UPDATE providers SET rating_sum = ?, "
+                + ', '.join(f"rating_{star}_count = ?" for star in range(1, 6))
+                + " WHERE id = ?",
+                [rating_sum] + [counts[star] for star in range(1, 6)] + [provider_id]
+            )
+        
+        conn.commit()
+        
+        cursor.execute("SELECT COUNT(*) FROM providers")
+        count = cursor.fetchone()[0]
+        print(f"[OK] Rating aggregates backfilled for {count} provider(s)")
+        conn.close()
+        return True
+    
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        return False
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Migration: Add rating aggregates to providers")
+    print("=" * 60)
+    success = migrate_add_rating_aggregates()
+    if success:
+        print("\n✅ Migration completed successfully!")
+    else:
+        print("\n❌ Migration failed. Please check the error messages above.")
+        exit(1)
@@ -0,0 +1,35 @@
+"""
+Rebuild provider rating aggregates (rating_sum, per-star counts, rating_avg)
+from the ratings table. Run after manual data fixes or if counters drift.
+Seeded aggregates without review rows are replaced by the real reviews, so
+seeded providers are only rebuilt when listed explicitly or once reviewed.
+Run: python rebuild_rating_aggregates.py [provider_id ...]
+"""
+import sys
+from app import create_app
+from app.models.provider import Provider
+from app.models.rating import Rating
+from extensions import db
+
+
+def rebuild_rating_aggregates(provider_ids=None):
+    """Recompute aggregates for the given providers (default: all with reviews)"""
+    app = create_app()
+    
+    with app.app_context():
+        if provider_ids:
+            providers = Provider.query.filter(Provider.id.in_(provider_ids)).all()
+        else:
+            reviewed_ids = db.session.query(Rating.provider_id).distinct()
+            providers = Provider.query.filter(Provider.id.in_(reviewed_ids)).all()
+        
+        for provider in providers:
+            provider.update_rating()
+            print(f"✓ {provider.name}: {provider.rating_count} rating(s), avg {provider.rating_avg:.2f}, "
+                  f"breakdown {provider.rating_breakdown()}")
+        
+        print(f"\nRebuilt rating aggregates for {len(providers)} provider(s)")
+
+
+if __name__ == '__main__':
+    rebuild_rating_aggregates([int(arg) for arg in sys.argv[1:]])
@@ -1,15 +1,33 @@
+import os
+
+# Cooperative servers must patch the standard library before anything else is imported
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 from app import create_app
 from extensions import socketio
-import os
 
 app = create_app(os.getenv('FLASK_ENV', 'default'))
 
 if __name__ == '__main__':
-    socketio.run(
-        app,
-        host='0.0.0.0',
-        port=5000,
-        debug=True,
-        allow_unsafe_werkzeug=True
-    )
-
+    if ASYNC_MODE == 'threading':
+        socketio.run(
+            app,
+            host='0.0.0.0',
+            port=5000,
+            debug=True,
+            allow_unsafe_werkzeug=True
+        )
+    else:
+        # eventlet/gevent serve websockets with their own WSGI server
+        socketio.run(
+            app,
+            host='0.0.0.0',
+            port=int(os.getenv('PORT', '5000')),
+            debug=False
+        )
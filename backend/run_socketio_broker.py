@@ -0,0 +1,23 @@
+"""
+Local Socket.IO message broker for running several workers on one box
+Run: python run_socketio_broker.py
+Then start each worker with SOCKETIO_MESSAGE_QUEUE=local://127.0.0.1:6390
+"""
+from config import Config
+from app.utils.socketio_queue import SocketIOBroker, parse_broker_url
+
+if __name__ == '__main__':
+    url = Config.SOCKETIO_MESSAGE_QUEUE or 'local://'
+    if not url.startswith('local://'):
+        print(f"SOCKETIO_MESSAGE_QUEUE is {url}; this broker only serves local:// URLs")
+        exit(1)
+    
+    broker = SocketIOBroker(parse_broker_url(url), authkey=Config.SOCKETIO_BROKER_AUTHKEY)
+    host, port = broker.address
+    print("=" * 60)
+    print(f"Socket.IO broker listening on local://{host}:{port}")
+    print("=" * 60)
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        broker.close()
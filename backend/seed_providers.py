@@ -190,7 +190,10 @@ def seed_providers():
                 db.session.add(user)
                 db.session.flush()  # Get user.id
                 
-                # Create provider profile
+                # Create provider profile (seeded aggregates get a matching star breakdown)
+                rating_avg = provider_data.get('rating_avg', 0.0)
+                rating_count = provider_data.get('rating_count', 0)
+                star_counts = Provider.star_counts_for_average(rating_avg, rating_count)
                 provider = Provider(
                     user_id=user.id,
                     name=provider_data['name'],
@@ -200,10 +203,12 @@ def seed_providers():
                     service_area=provider_data['service_area'],
                     hourly_rate=provider_data['hourly_rate'],
                     verified=True,  # Auto-verify for testing
-                    rating_avg=provider_data.get('rating_avg', 0.0),
-                    rating_count=provider_data.get('rating_count', 0),
-                    is_available=True
+                    rating_count=rating_count,
+                    rating_sum=sum(star * count for star, count in star_counts.items()),
+                    is_available=True,
+                    **{f'rating_{star}_count': count for star, count in star_counts.items()}
                 )
+                provider.rating_avg = provider.rating_sum / rating_count if rating_count else 0.0
                 db.session.add(provider)
                 db.session.commit()
                 
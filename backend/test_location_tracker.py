@@ -0,0 +1,47 @@
+"""Test Location Tracker: bad pings are refused and never block later writes"""
+from app import create_app
+from extensions import db
+from app.models.location_update import LocationUpdate
+from app.location.tracker import LocationTracker
+
+
+def test_bad_ping_then_good_ping():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        tracker = LocationTracker(flush_seconds=3600)
+        tracker._flusher_started = True  # flushed by hand below
+
+        for latitude, longitude in (('abc', 77.59), (12.97, None), (91, 77.59), (True, 77.59)):
+            try:
+                tracker.record(1, latitude, longitude)
+                raise AssertionError(f'({latitude!r}, {longitude!r}) was accepted')
+            except ValueError as e:
+                print(f"   ✅ ({latitude!r}, {longitude!r}) refused: {e}")
+        assert tracker.stats()['pending'] == 0
+
+        # The same provider's next ping is compared against its last stored point
+        tracker.record(1, 12.9716, 77.5946)
+        location, stored = tracker.record(1, '12.9900', '77.6100')
+        assert stored and location['latitude'] == 12.99
+        assert tracker.flush() == 2
+        print("   ✅ Good pings after bad ones are stored")
+
+        # A row the database rejects is dropped instead of blocking every later flush
+        tracker.record(2, 13.0, 77.0)
+        tracker._pending.append({'provider_id': None, 'latitude': 1.0, 'longitude': 1.0,
+                                 'timestamp': tracker._pending[0]['timestamp']})
+        tracker.record(3, 14.0, 78.0)
+        assert tracker.flush() == 2
+        assert tracker.flush() == 0
+        stats = tracker.stats()
+        assert stats['pending'] == 0 and stats['dropped'] == 1
+        assert LocationUpdate.query.count() == 4
+        print("   ✅ Rejected row dropped, the rest of the batch written")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("📍 Testing Location Tracker")
+    print("=" * 60)
+    test_bad_ping_then_good_ping()